@@ -16,6 +16,79 @@ const generationConfig = {
   responseMimeType: 'application/json',
 };
 
+// Python query engine service (scripts/service.py), e.g. http://127.0.0.1:8765. When unset or
+// unreachable, the route falls back to the Gemini-structured mock response below.
+const ENGINE_URL = process.env.HOOPSENSE_ENGINE_URL;
+const ENGINE_TIMEOUT_MS = Number(process.env.HOOPSENSE_ENGINE_TIMEOUT_MS ?? 90000);
+
+interface EngineResult {
+  natural_query: string;
+  sql_query: string | null;
+  query_explanation: string | null;
+  explanation: string | null;
+  error: string | null;
+  row_count: number | null;
+  truncated: boolean;
+  data_preview: Record<string, any>[] | null;
+  chart_info: { chart_spec: Record<string, any> | null; chart_type: string; message: string | null } | null;
+}
+
+// Thrown when the engine is reachable but refuses the question; its status is passed on.
+class EngineRejected extends Error {
+  constructor(public status: number, message: string, public retryAfter: string | null) {
+    super(message);
+  }
+}
+
+// Asks the query engine service; returns null when it is not configured or cannot be reached.
+async function queryEngine(userQuery: string): Promise<EngineResult | null> {
+  if (!ENGINE_URL) {
+    return null;
+  }
+  let response: Response;
+  try {
+    response = await fetch(`${ENGINE_URL.replace(/\/$/, '')}/query`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ query: userQuery }),
+      signal: AbortSignal.timeout(ENGINE_TIMEOUT_MS),
+      cache: 'no-store',
+    });
+  } catch (engineError: any) {
+    console.error("Query engine unreachable, using fallback:", engineError);
+    return null;
+  }
+  if (!response.ok) {
+    const body = await response.json().catch(() => ({}));
+    throw new EngineRejected(response.status, body.error || `Query engine error (status ${response.status}).`, response.headers.get('Retry-After'));
+  }
+  return (await response.json()) as EngineResult;
+}
+
+// Maps the engine's pipeline output onto the page's statCards/chartData/insight shape.
+const toApiResponse = (result: EngineResult) => {
+  const rows = result.data_preview ?? [];
+  const columns = rows.length > 0 ? Object.keys(rows[0]) : [];
+  const labelColumn = columns.find(column => rows.some(row => typeof row[column] === 'string'));
+  const valueColumns = columns.filter(column => column !== labelColumn && rows.some(row => typeof row[column] === 'number'));
+  const statCards = rows.length === 1
+    ? valueColumns.map(column => ({ title: labelColumn ? String(rows[0][labelColumn]) : 'Result', stat: column, value: String(rows[0][column]) }))
+    : rows.slice(0, 6).map((row, index) => ({
+        title: labelColumn ? String(row[labelColumn]) : `Row ${index + 1}`,
+        stat: valueColumns[0] ?? columns[0] ?? '',
+        value: String(row[valueColumns[0] ?? columns[0]] ?? 'N/A'),
+      }));
+  const rowNote = result.row_count !== null ? ` (${result.row_count}${result.truncated ? '+' : ''} rows)` : '';
+  return {
+    statCards,
+    chartData: rows,
+    insight: `${result.query_explanation || result.explanation || 'Query processed.'}${rowNote}`,
+    sql: result.sql_query,
+    chartSpec: result.chart_info?.chart_spec ?? null,
+    chartType: result.chart_info?.chart_type ?? 'none',
+  };
+};
+
 interface GeminiStructuredResponse {
   players?: string[];
   stat?: string;
@@ -44,6 +117,22 @@ export async function POST(request: Request) {
       return NextResponse.json({ error: 'Query string is required.' }, { status: 400 });
     }
 
+    try {
+      const engineResult = await queryEngine(userQuery);
+      if (engineResult) {
+        if (engineResult.error && !engineResult.data_preview?.length) {
+          return NextResponse.json({ error: `${engineResult.error} ${engineResult.explanation ?? ''}`.trim() }, { status: 422 });
+        }
+        return NextResponse.json(toApiResponse(engineResult));
+      }
+    } catch (engineError: any) {
+      if (engineError instanceof EngineRejected) {
+        const headers: Record<string, string> = engineError.retryAfter ? { 'Retry-After': engineError.retryAfter } : {};
+        return NextResponse.json({ error: engineError.message }, { status: engineError.status, headers });
+      }
+      throw engineError;
+    }
+
     const prompt = `
       Analyze the following user query about basketball player statistics: "${userQuery}"
 
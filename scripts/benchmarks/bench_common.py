@@ -0,0 +1,116 @@
+"""Helpers shared by the benchmarks: timing, latency summaries and JSON result files that compare_results.py reads."""
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+import numpy as np
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.dirname(BENCHMARKS_DIR)
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+
+
+def best_of(func, repeat: int) -> float:
+    """Fastest of ``repeat`` calls, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def timings_ms(func, repeat: int, warmup: int = 1) -> list[float]:
+    """Wall time of ``repeat`` calls after ``warmup`` untimed ones, in milliseconds."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def summarize(samples_ms: list[float]) -> dict:
+    """count/mean/min/p50/p95/p99/max of latency samples in milliseconds."""
+    if not samples_ms:
+        return {"count": 0}
+    values = np.asarray(samples_ms, dtype=float)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean_ms": round(float(values.mean()), 3),
+        "min_ms": round(float(values.min()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def environment() -> dict:
+    """What a result depends on besides the code: interpreter, libraries, machine and commit."""
+    import pandas as pd
+    import pyarrow
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS_DIR, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "pyarrow": pyarrow.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit,
+    }
+
+
+def write_results(benchmark: str, args, results: dict, path: str | None = None) -> str:
+    """Writes {"benchmark", "created_at", "environment", "parameters", "results"} as JSON; returns the path.
+
+    Without ``path`` the file goes to benchmarks/results/<benchmark>-<UTC timestamp>.json.
+    """
+    created_at = datetime.now(timezone.utc)
+    if path is None:
+        path = os.path.join(RESULTS_DIR, f"{benchmark}-{created_at.strftime('%Y%m%dT%H%M%SZ')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    document = {
+        "benchmark": benchmark,
+        "created_at": created_at.isoformat(),
+        "environment": environment(),
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2, default=str)
+    print(f"Results written to {path}")
+    return path
+
+
+def prepare_query_engine(parquet_root: str, cache_dir: str, caches: bool = False, templates: bool = False):
+    """Imports query_engine configured for offline runs: DuckDB over ``parquet_root``, no Gemini key needed.
+
+    Translation and result caches are disabled unless ``caches`` is set, and SQL templates
+    unless ``templates`` is set, so repeated questions exercise the whole pipeline. Install
+    an LLM with stub_llm.install().
+    """
+    os.environ["EXECUTION_BACKEND"] = "duckdb"
+    os.environ["DUCKDB_PARQUET_ROOT"] = parquet_root
+    os.environ["HOOPSENSE_CACHE_DIR"] = cache_dir
+    if not caches:
+        os.environ["NL_CACHE_BACKEND"] = "none"
+        os.environ["RESULT_CACHE_MAX_BYTES"] = "0"
+    os.environ["INTENT_TEMPLATES_ENABLED"] = "true" if templates else "false"
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+    import query_engine
+
+    return query_engine
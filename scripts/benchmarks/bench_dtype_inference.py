@@ -0,0 +1,111 @@
+"""Micro-benchmark: DtypeInferenceEngine vs. the original exception-driven sanitize_and_coerce_dtypes.
+
+Run from the repository root:  python scripts/benchmarks/bench_dtype_inference.py [--rows N] [--columns N]
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dtype_inference import TYPE_OIDS_ATTR, DtypeInferenceEngine  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+
+def legacy_sanitize_and_coerce_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """The previous implementation from query_engine.py, kept verbatim for comparison."""
+    if df is None or df.empty:
+        return df
+    df_copy = df.copy()
+    for col in df_copy.columns:
+        try:
+            df_copy[col] = pd.to_numeric(df_copy[col])
+            logger.debug(f"Column '{col}' coerced to numeric.")
+            continue
+        except (ValueError, TypeError):
+            pass
+
+        try:
+            df_copy[col] = pd.to_datetime(df_copy[col])
+            logger.debug(f"Column '{col}' coerced to datetime.")
+            continue
+        except (ValueError, TypeError):
+            pass
+
+        if df_copy[col].dtype == 'object':
+             try:
+                df_copy[col] = df_copy[col].astype(str).str.strip()
+             except AttributeError:
+                pass
+    return df_copy
+
+
+def make_wide_frame(rows: int, columns: int, seed: int = 0) -> pd.DataFrame:
+    """A result shaped like an Advanced-measure stats table: mostly numeric stats plus a few labels and dates."""
+    rng = np.random.default_rng(seed)
+    teams = ["BOS", "LAL", "DEN", "MIA", "NYK"]
+    data = {
+        "player_name": [f" Player {i % 500} " for i in range(rows)],
+        "nickname": [f"P{i % 500}" for i in range(rows)],
+        "team_abbreviation": rng.choice(teams, size=rows),
+        "matchup": [f"{teams[i % 5]} vs. {teams[(i + 1) % 5]}" for i in range(rows)],
+        "position": rng.choice(["G", "F", "C", "G-F", "F-C"], size=rows),
+        "game_date": pd.date_range("2023-10-24", periods=rows, freq="h").strftime("%Y-%m-%d").tolist(),
+    }
+    for i in range(columns - len(data)):
+        values = rng.normal(50, 15, size=rows).round(3)
+        # Half the stat columns arrive as Python objects (e.g. NUMERIC -> Decimal-like values).
+        data[f"stat_{i}"] = values.astype(object) if i % 2 else values
+    df = pd.DataFrame(data)
+    # What the executor records from cursor.description: text for labels, varchar dates, float8 stats.
+    df.attrs[TYPE_OIDS_ATTR] = {col: 25 if not col.startswith("stat_") else 701 for col in df.columns}
+    df.attrs[TYPE_OIDS_ATTR]["game_date"] = 1043
+    return df
+
+
+def _time(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--columns", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    df = make_wide_frame(args.rows, args.columns)
+    sql_query = "SELECT * FROM player_advanced_stats WHERE season = '2023-24'"
+    print(f"Frame: {args.rows} rows x {args.columns} columns")
+
+    # create_altair_chart() used to copy the frame before the (copying) legacy function.
+    legacy = _time(lambda: legacy_sanitize_and_coerce_dtypes(df.copy()), args.repeat)
+    print(f"legacy sanitize_and_coerce_dtypes: {legacy * 1000:8.1f} ms")
+
+    cold = _time(lambda: DtypeInferenceEngine().coerce(df, sql_query=sql_query), args.repeat)
+    print(f"engine, cold schema cache:         {cold * 1000:8.1f} ms  ({legacy / cold:.1f}x)")
+
+    engine = DtypeInferenceEngine()
+    engine.coerce(df, sql_query=sql_query)
+    warm = _time(lambda: engine.coerce(df, sql_query=sql_query), args.repeat)
+    print(f"engine, warm schema cache:         {warm * 1000:8.1f} ms  ({legacy / warm:.1f}x)")
+
+    expected = legacy_sanitize_and_coerce_dtypes(df).dtypes
+    actual = engine.coerce(df, sql_query=sql_query).dtypes
+    kind = lambda dtype: "n" if dtype.kind in "iuf" else dtype.kind  # int vs float is irrelevant for charting
+    mismatched = [col for col in df.columns if kind(expected[col]) != kind(actual[col])]
+    print(f"dtype kinds differing from legacy: {mismatched or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
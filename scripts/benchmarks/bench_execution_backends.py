@@ -0,0 +1,115 @@
+"""Benchmark: query latency of the PostgreSQL and embedded DuckDB-over-Parquet execution backends.
+
+Both backends must hold the same data: the fetcher's Parquet output (--data-dir) and the
+PostgreSQL tables it was loaded into with stats_loader (DB_* settings from scripts/.env).
+With --synthetic, a temporary Parquet dataset is generated instead and only DuckDB is timed.
+
+Run from the repository root:  python scripts/benchmarks/bench_execution_backends.py [--backends duckdb postgres]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from execution_backends import DuckDBParquetBackend, PostgresBackend  # noqa: E402
+from fetch_nba_stats import DATA_DIR, DATASETS, PARQUET_SUBDIR  # noqa: E402
+from stats_storage import write_partition  # noqa: E402
+from bench_stats_storage import SEASON_TYPES, make_season  # noqa: E402
+
+
+def make_queries(backend) -> list[tuple[str, str]]:
+    """Representative questions' SQL, valid on both backends; the lookup targets a row that exists."""
+    player, season = backend.execute(
+        "SELECT player_name, season FROM player_stats WHERE per_mode = 'PerGame' ORDER BY season DESC, player_name LIMIT 1"
+    ).iloc[0]
+    player = player.replace("'", "''")
+    return [
+        ("player lookup",
+         f"SELECT season, season_type, gp, pts, reb, ast FROM player_stats WHERE player_name = '{player}' AND per_mode = 'PerGame'"),
+        ("season top 10",
+         f"SELECT player_name, pts FROM player_stats WHERE season = '{season}' AND season_type = 'Regular Season' "
+         "AND per_mode = 'PerGame' ORDER BY pts DESC LIMIT 10"),
+        ("per-season averages",
+         "SELECT season, season_type, AVG(pts) AS avg_pts, MAX(reb) AS max_reb, COUNT(*) AS players "
+         "FROM player_stats GROUP BY season, season_type ORDER BY season, season_type"),
+        ("career leaders",
+         "SELECT player_id, player_name, SUM(pts * gp) AS career_pts FROM player_stats WHERE per_mode = 'PerGame' "
+         "GROUP BY player_id, player_name ORDER BY career_pts DESC LIMIT 25"),
+        ("full scan", "SELECT * FROM player_stats"),
+    ]
+
+
+def time_query(backend, sql_query: str, repeat: int) -> tuple[float, float, float, int]:
+    """(first run, p50, p95) in milliseconds, plus the row count."""
+    timings = []
+    rows = 0
+    for _ in range(repeat + 1):
+        started = time.perf_counter()
+        rows = len(backend.execute(sql_query))
+        timings.append((time.perf_counter() - started) * 1000)
+    first, warm = timings[0], np.array(timings[1:])
+    return first, float(np.percentile(warm, 50)), float(np.percentile(warm, 95)), rows
+
+
+def write_synthetic_dataset(root: str, seasons: int, players: int):
+    rng = np.random.default_rng(0)
+    for year in range(2024 - seasons, 2024):
+        season = f"{year}-{(year + 1) % 100:02d}"
+        for season_type in SEASON_TYPES:
+            write_partition(make_season(season, players, rng), root, "player", season=season, season_type=season_type,
+                            measure_type="Base", per_mode="PerGame")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=["duckdb", "postgres"], default=["duckdb", "postgres"])
+    parser.add_argument("--data-dir", default=os.path.join(DATA_DIR, PARQUET_SUBDIR), help="Parquet root read by DuckDB.")
+    parser.add_argument("--synthetic", action="store_true", help="Benchmark DuckDB on a generated dataset.")
+    parser.add_argument("--seasons", type=int, default=20, help="Synthetic seasons.")
+    parser.add_argument("--players", type=int, default=600, help="Synthetic rows per season and season type.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = None
+    backends = {}
+    conn = None
+    try:
+        root = args.data_dir
+        if args.synthetic:
+            workdir = tempfile.mkdtemp(prefix="hoopsense_backend_bench_")
+            root = os.path.join(workdir, "parquet")
+            write_synthetic_dataset(root, args.seasons, args.players)
+            if "postgres" in args.backends:
+                print("--synthetic data is not loaded into PostgreSQL; timing DuckDB only.")
+            args.backends = ["duckdb"]
+        if "duckdb" in args.backends:
+            started = time.perf_counter()
+            backends["duckdb"] = DuckDBParquetBackend(root, {dataset: table for dataset, (_, table) in DATASETS.items()})
+            print(f"duckdb: views ready in {(time.perf_counter() - started) * 1000:.1f} ms over {root}")
+        if "postgres" in args.backends:
+            from stats_loader import connect_from_env
+            conn = connect_from_env()
+            backends["postgres"] = PostgresBackend(lambda: conn, lambda c, discard=False: None)
+
+        queries = make_queries(next(iter(backends.values())))
+        print(f"{'query':<22} {'backend':<9} {'rows':>7} {'first ms':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for name, sql_query in queries:
+            for backend_name, backend in backends.items():
+                first, p50, p95, rows = time_query(backend, sql_query, args.repeat)
+                print(f"{name:<22} {backend_name:<9} {rows:>7} {first:>9.1f} {p50:>8.1f} {p95:>8.1f}")
+    finally:
+        for backend in backends.values():
+            backend.close()
+        if conn is not None:
+            conn.close()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Micro-benchmarks for the post-SQL stages: dtype coercion, chart creation and result serialization.
+
+Results come from the recorded questions' SQL run on DuckDB over a synthetic dataset, so
+the frames have realistic shapes (top-N lists, per-season aggregates, large scatters, wide
+full scans). Every case is timed warm (after one untimed call), the way a long-running
+server sees it; coercion is also timed with a fresh inference engine.
+
+Run from the repository root:  python scripts/benchmarks/bench_pipeline_stages.py [--players 450] [--repeat 20]
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_common import prepare_query_engine, summarize, timings_ms, write_results  # noqa: E402
+from stub_llm import DEFAULT_RECORDINGS  # noqa: E402
+from synthetic_nba import generate_dataset  # noqa: E402
+
+
+def bench_question(query_engine, entry: dict, repeat: int) -> dict | None:
+    sql_query = entry["sql_query"]
+    df, error = query_engine.execute_sql_query(sql_query)
+    if error or df is None or df.empty:
+        print(f"Skipping '{entry['question']}': {error or 'no rows'}")
+        return None
+    sanitized = query_engine.sanitize_and_coerce_dtypes(df, sql_query)
+    chart = query_engine.create_altair_chart(df, entry["question"], sql_query=sql_query)
+    cases = {
+        "coerce_dtypes": lambda: query_engine.sanitize_and_coerce_dtypes(df, sql_query),
+        "coerce_dtypes_cold": lambda: query_engine.DtypeInferenceEngine().coerce(df, sql_query=sql_query),
+        "summary_stats": lambda: query_engine.compute_summary_stats(sanitized),
+        "chart_spec": lambda: query_engine.build_chart_spec(sanitized, entry["question"]),
+        "create_altair_chart": lambda: query_engine.create_altair_chart(df, entry["question"], sql_query=sql_query),
+        "serialize_records": lambda: query_engine._json_records(df),
+        "serialize_chart_info": lambda: json.dumps(chart, default=str),
+    }
+    return {
+        "rows": len(df),
+        "columns": len(df.columns),
+        "chart_type": chart["chart_type"],
+        "chart_info_bytes": len(json.dumps(chart, default=str)),
+        "cases": {name: summarize(timings_ms(func, repeat)) for name, func in cases.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", help="Existing Parquet root; a synthetic dataset is generated when omitted.")
+    parser.add_argument("--seasons", type=int, default=10, help="Synthetic seasons.")
+    parser.add_argument("--players", type=int, default=450, help="Synthetic active players per season.")
+    parser.add_argument("--games", type=int, default=82, help="Synthetic regular season games per team.")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS, help="Questions whose SQL produces the frames.")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/pipeline_stages-<timestamp>.json).")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="hoopsense_stages_")
+    try:
+        root = args.data_dir
+        if root is None:
+            root = os.path.join(workdir, "parquet")
+            generate_dataset(root, args.seasons, args.players, args.games)
+        query_engine = prepare_query_engine(root, os.path.join(workdir, "cache"))
+        with open(args.recordings, "r", encoding="utf-8") as f:
+            recordings = json.load(f)
+
+        results = {}
+        print(f"{'question':<48} {'rows':>6} {'case':<22} {'p50 ms':>8} {'p95 ms':>8}")
+        for entry in recordings:
+            result = bench_question(query_engine, entry, args.repeat)
+            if result is None:
+                continue
+            results[entry["question"]] = result
+            for case, summary in result["cases"].items():
+                print(f"{entry['question'][:48]:<48} {result['rows']:>6} {case:<22} {summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f}")
+        write_results("pipeline_stages", args, results, args.output)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
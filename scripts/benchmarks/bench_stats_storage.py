@@ -0,0 +1,104 @@
+"""Benchmark: partitioned Parquet (stats_storage) vs. one CSV per season for load time and disk footprint.
+
+Run from the repository root:  python scripts/benchmarks/bench_stats_storage.py [--seasons N] [--players N]
+"""
+import os
+import sys
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stats_storage import load_stats, write_partition  # noqa: E402
+
+SEASON_TYPES = ["Regular Season", "Playoffs"]
+STAT_COLUMNS = ["GP", "W", "L", "MIN", "FGM", "FGA", "FG_PCT", "FG3M", "FG3A", "FG3_PCT", "FTM", "FTA", "FT_PCT",
+                "OREB", "DREB", "REB", "AST", "TOV", "STL", "BLK", "BLKA", "PF", "PFD", "PTS", "PLUS_MINUS",
+                "NBA_FANTASY_PTS", "DD2", "TD3"]
+
+
+def make_season(season: str, players: int, rng: np.random.Generator) -> pd.DataFrame:
+    """A LeagueDashPlayerStats-shaped frame (Base measure, PerGame)."""
+    df = pd.DataFrame({
+        "PLAYER_ID": rng.integers(200000, 1700000, size=players),
+        "PLAYER_NAME": [f"Player {season} {i}" for i in range(players)],
+        "TEAM_ID": rng.integers(1610612737, 1610612767, size=players),
+        "TEAM_ABBREVIATION": rng.choice(["BOS", "LAL", "DEN", "MIA", "NYK", "GSW", "PHX", "MIL"], size=players),
+        "AGE": rng.integers(19, 40, size=players).astype(float),
+    })
+    for column in STAT_COLUMNS:
+        df[column] = rng.gamma(2.0, 3.0, size=players).round(1 if not column.endswith("_PCT") else 3)
+    return df
+
+
+def _dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, names in os.walk(path) for f in names)
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seasons", type=int, default=20)
+    parser.add_argument("--players", type=int, default=600, help="Rows per season and season type.")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    seasons = [f"{year}-{(year + 1) % 100:02d}" for year in range(2024 - args.seasons, 2024)]
+    workdir = tempfile.mkdtemp(prefix="hoopsense_storage_bench_")
+    csv_dir, parquet_dir = os.path.join(workdir, "csv"), os.path.join(workdir, "parquet")
+    os.makedirs(csv_dir)
+    try:
+        for season in seasons:
+            for season_type in SEASON_TYPES:
+                df = make_season(season, args.players, rng)
+                slug = f"{season.replace('-', '_')}_{season_type.replace(' ', '_').lower()}"
+                df.to_csv(os.path.join(csv_dir, f"nba_player_stats_{slug}.csv"), index=False)
+                write_partition(df, parquet_dir, "player", season=season, season_type=season_type,
+                                measure_type="Base", per_mode="PerGame")
+
+        csv_files = sorted(glob.glob(os.path.join(csv_dir, "*.csv")))
+        target = os.path.join(csv_dir, f"nba_player_stats_{seasons[-1].replace('-', '_')}_playoffs.csv")
+        cases = [
+            ("full load",
+             lambda: pd.concat([pd.read_csv(path) for path in csv_files], ignore_index=True),
+             lambda: load_stats(parquet_dir, "player")),
+            ("3 columns",
+             lambda: pd.concat([pd.read_csv(path, usecols=["PLAYER_NAME", "PTS", "AST"]) for path in csv_files], ignore_index=True),
+             lambda: load_stats(parquet_dir, "player", columns=["player_name", "pts", "ast"])),
+            ("1 season, playoffs",
+             lambda: pd.read_csv(target),
+             lambda: load_stats(parquet_dir, "player", filters={"season": seasons[-1], "season_type": "Playoffs"})),
+        ]
+
+        rows = args.seasons * len(SEASON_TYPES) * args.players
+        print(f"{len(csv_files)} partitions, {rows} rows, {len(STAT_COLUMNS) + 5} columns")
+        csv_bytes, parquet_bytes = _dir_size(csv_dir), _dir_size(parquet_dir)
+        print(f"disk footprint: CSV {csv_bytes / 1e6:.2f} MB, Parquet {parquet_bytes / 1e6:.2f} MB "
+              f"({csv_bytes / parquet_bytes:.1f}x smaller)")
+        print(f"{'case':<20} {'CSV ms':>9} {'Parquet ms':>11} {'speedup':>8}")
+        for name, read_csv, read_parquet in cases:
+            csv_time = _best_of(read_csv, args.repeat)
+            parquet_time = _best_of(read_parquet, args.repeat)
+            print(f"{name:<20} {csv_time * 1000:>9.1f} {parquet_time * 1000:>11.1f} {csv_time / parquet_time:>7.1f}x")
+        no_mmap = _best_of(lambda: load_stats(parquet_dir, "player", memory_map=False), args.repeat)
+        print(f"{'full, no mmap':<20} {'':>9} {no_mmap * 1000:>11.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
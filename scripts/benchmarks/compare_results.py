@@ -0,0 +1,79 @@
+"""Compares two benchmark result files (written by bench_common.write_results) metric by metric.
+
+Latency metrics (``*_ms``) regress when they grow; throughput metrics (``*_rps``) when they shrink.
+Changes beyond --threshold percent are flagged, and --fail-on-regression turns them into exit code 1.
+
+Run from the repository root:  python scripts/benchmarks/compare_results.py baseline.json candidate.json [--threshold 10]
+"""
+import sys
+import json
+import argparse
+
+
+def flatten(value, prefix: str = "") -> dict[str, float]:
+    """{"a": {"b_ms": 1}} -> {"a.b_ms": 1}; lists are indexed, e.g. "runs[0].latency.p50_ms"."""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = ((f"[{i}]", item) for i, item in enumerate(value))
+    else:
+        return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+    flat = {}
+    for key, item in items:
+        path = f"{prefix}{key}" if key.startswith("[") else f"{prefix}.{key}" if prefix else key
+        flat.update(flatten(item, path))
+    return flat
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list[tuple[str, float, float, float, str]]:
+    """(metric, baseline, candidate, change %, verdict) for every latency/throughput metric in both files."""
+    old, new = flatten(baseline["results"]), flatten(candidate["results"])
+    rows = []
+    for metric in sorted(old.keys() & new.keys()):
+        higher_is_better = metric.endswith("_rps")
+        if not (metric.endswith("_ms") or higher_is_better) or old[metric] == 0:
+            continue
+        change = (new[metric] - old[metric]) / old[metric] * 100
+        worse = -change if higher_is_better else change
+        verdict = "REGRESSION" if worse > threshold else "improved" if worse < -threshold else ""
+        rows.append((metric, old[metric], new[metric], change, verdict))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent change treated as significant.")
+    parser.add_argument("--only-changes", action="store_true", help="Hide metrics within the threshold.")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    documents = []
+    for path in (args.baseline, args.candidate):
+        with open(path, "r", encoding="utf-8") as f:
+            documents.append(json.load(f))
+    baseline, candidate = documents
+    if baseline["benchmark"] != candidate["benchmark"]:
+        sys.exit(f"Cannot compare a '{baseline['benchmark']}' run with a '{candidate['benchmark']}' run.")
+    for label, document in (("baseline", baseline), ("candidate", candidate)):
+        env = document["environment"]
+        print(f"{label}: {document['created_at']} commit {env.get('git_commit')} python {env.get('python')} "
+              f"pandas {env.get('pandas')} on {env.get('cpu_count')} CPUs")
+    if baseline["parameters"] != candidate["parameters"]:
+        print("Warning: the runs used different parameters; differences may not be due to the code.")
+
+    rows = compare(baseline, candidate, args.threshold)
+    regressions = 0
+    for metric, old, new, change, verdict in rows:
+        regressions += verdict == "REGRESSION"
+        if args.only_changes and not verdict:
+            continue
+        print(f"{metric:<90} {old:>10.2f} {new:>10.2f} {change:>+8.1f}% {verdict}")
+    print(f"{len(rows)} metrics compared, {regressions} regressions beyond {args.threshold:g}%.")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
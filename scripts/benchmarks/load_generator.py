@@ -0,0 +1,116 @@
+"""Load generator: concurrent process_nl_query calls against the stub LLM and DuckDB over synthetic data.
+
+Each worker thread sends questions from the recordings round-robin, like concurrent web
+requests, and the run reports end-to-end latency percentiles, throughput and per-stage
+latencies (from each result's ``timings``). Without --data-dir a synthetic dataset is
+generated first. Caches are off unless --caches is given, and SQL templates unless
+--templates is given (the per-template hit counts are then part of the results).
+
+Run from the repository root:  python scripts/benchmarks/load_generator.py [--requests 200] [--concurrency 8] [--llm-latency-ms 300]
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_common import prepare_query_engine, summarize, write_results  # noqa: E402
+from stub_llm import DEFAULT_RECORDINGS, install  # noqa: E402
+from synthetic_nba import generate_dataset  # noqa: E402
+
+
+def run_load(query_engine, questions: list[str], requests: int, concurrency: int) -> dict:
+    """Sends ``requests`` questions from ``concurrency`` threads; returns latency, throughput and stage summaries."""
+    latencies: list[float] = []
+    stage_samples: dict[str, list[float]] = {}
+    per_question: dict[str, list[float]] = {}
+    errors: dict[str, int] = {}
+    templates: dict[str, int] = {}
+    lock = threading.Lock()
+
+    def one_request(index: int):
+        question = questions[index % len(questions)]
+        started = time.perf_counter()
+        result = query_engine.process_nl_query(question)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed_ms)
+            per_question.setdefault(question, []).append(elapsed_ms)
+            for stage, duration_ms in (result.get("timings") or {}).get("stages", {}).items():
+                stage_samples.setdefault(stage, []).append(duration_ms)
+            template = result.get("template") or "none"
+            templates[template] = templates.get(template, 0) + 1
+            if result["error"]:
+                errors[result["error"]] = errors.get(result["error"], 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 3) if elapsed > 0 else 0.0,
+        "errors": errors,
+        "templates": templates,
+        "latency": summarize(latencies),
+        "stages": {stage: summarize(samples) for stage, samples in sorted(stage_samples.items())},
+        "per_question": {question: summarize(samples) for question, samples in per_question.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", help="Existing Parquet root; a synthetic dataset is generated when omitted.")
+    parser.add_argument("--seasons", type=int, default=10, help="Synthetic seasons.")
+    parser.add_argument("--players", type=int, default=450, help="Synthetic active players per season.")
+    parser.add_argument("--games", type=int, default=82, help="Synthetic regular season games per team.")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8], help="One run per level, e.g. 1 4 16.")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed passes over the questions first.")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated model response time.")
+    parser.add_argument("--llm-jitter-ms", type=float, default=0.0, help="Extra per-question response time, up to this much.")
+    parser.add_argument("--recordings", default=DEFAULT_RECORDINGS, help="Question -> SQL recordings to replay.")
+    parser.add_argument("--caches", action="store_true", help="Keep the translation and result caches enabled.")
+    parser.add_argument("--templates", action="store_true", help="Answer template-shaped questions without the LLM.")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/load-<timestamp>.json).")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="hoopsense_load_")
+    try:
+        root = args.data_dir
+        if root is None:
+            root = os.path.join(workdir, "parquet")
+            counts = generate_dataset(root, args.seasons, args.players, args.games)
+            print(f"Generated {counts['player']} player and {counts['team']} team rows.")
+        query_engine = prepare_query_engine(root, os.path.join(workdir, "cache"), caches=args.caches,
+                                            templates=args.templates)
+        stub = install(query_engine, args.recordings, latency_ms=args.llm_latency_ms, jitter_ms=args.llm_jitter_ms)
+        for _ in range(args.warmup):
+            for question in stub.questions:
+                result = query_engine.process_nl_query(question)
+                if result["error"]:
+                    print(f"Warm-up error for '{question}': {result['error']} {result['explanation']}")
+
+        runs = []
+        print(f"{'concurrency':>11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}")
+        for concurrency in args.concurrency:
+            run = run_load(query_engine, stub.questions, args.requests, concurrency)
+            runs.append(run)
+            latency = run["latency"]
+            print(f"{concurrency:>11} {run['throughput_rps']:>8.1f} {latency['p50_ms']:>8.1f} {latency['p95_ms']:>8.1f} "
+                  f"{latency['p99_ms']:>8.1f} {sum(run['errors'].values()):>6}")
+        print("Stage p50/p95 ms at the last level: " + ", ".join(
+            f"{stage} {summary['p50_ms']:.1f}/{summary['p95_ms']:.1f}" for stage, summary in runs[-1]["stages"].items()))
+        write_results("load", args, {"runs": runs}, args.output)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Offline stand-ins for the nba_api endpoints fetch_nba_stats.py calls, returning small canned DataFrames.
+
+Run from the repository root:  python scripts/fetch_nba_stats.py --endpoints-module benchmarks.stub_endpoints ...
+
+Frames are deterministic per (season, season type, per mode, measure type); non-Base measure
+types add their own columns, as the real endpoints do. ``fail_next(n)`` makes the next ``n``
+calls raise ConnectionError (only for one season, if given) to exercise retries, and ``calls``
+records the parameters of every call.
+"""
+import threading
+
+import pandas as pd
+
+TEAMS = [(1610612737, "ATL", "Atlanta Hawks"), (1610612738, "BOS", "Boston Celtics"),
+         (1610612744, "GSW", "Golden State Warriors"), (1610612747, "LAL", "Los Angeles Lakers")]
+PLAYERS = [(201939, "Stephen Curry", 2), (1629027, "Trae Young", 0), (1628369, "Jayson Tatum", 1),
+           (2544, "LeBron James", 3), (203076, "Anthony Davis", 3)]
+# Extra columns per non-Base measure type (anything else gets MEASURE_VALUE).
+MEASURE_COLUMNS = {"Advanced": ["OFF_RATING", "DEF_RATING", "NET_RATING"], "Misc": ["PTS_OFF_TOV", "PTS_PAINT"]}
+
+calls: list[dict] = []
+_failures: dict[str | None, int] = {}  # season (None: any season) -> calls left to fail
+_lock = threading.Lock()
+
+
+def fail_next(count: int, season: str | None = None):
+    """Makes the next ``count`` calls (for ``season`` only, if given) raise ConnectionError."""
+    with _lock:
+        _failures[season] = _failures.get(season, 0) + count
+
+
+def reset():
+    """Forgets recorded calls and pending failures."""
+    with _lock:
+        calls.clear()
+        _failures.clear()
+
+
+def _seed(*values: str) -> int:
+    return sum(ord(char) for char in "|".join(values))
+
+
+class _StubEndpoint:
+    def __init__(self, season: str, season_type_all_star: str = "Regular Season", per_mode_detailed: str = "PerGame",
+                 measure_type_detailed_defense: str = "Base", timeout: float | None = None):
+        params = {"endpoint": type(self).__name__, "season": season, "season_type": season_type_all_star,
+                  "per_mode": per_mode_detailed, "measure_type": measure_type_detailed_defense, "timeout": timeout}
+        with _lock:
+            calls.append(params)
+            key = season if _failures.get(season) else None
+            fail = _failures.get(key, 0) > 0
+            if fail:
+                _failures[key] -= 1
+        if fail:
+            raise ConnectionError(f"Simulated failure for {params['endpoint']} {season}")
+        self._frame = self._build(season, season_type_all_star, per_mode_detailed, measure_type_detailed_defense)
+
+    def _rows(self) -> list[dict]:
+        raise NotImplementedError
+
+    def _build(self, season: str, season_type: str, per_mode: str, measure_type: str) -> pd.DataFrame:
+        seed = _seed(season, season_type, per_mode, measure_type)
+        scale = 82 if per_mode == "Totals" else 1
+        rows = []
+        for index, row in enumerate(self._rows()):
+            value = (seed + 7 * index) % 20 + 5
+            row.update({"GP": 60 + index, "PTS": round(value * 1.1 * scale, 1), "REB": round(value * 0.4 * scale, 1),
+                        "AST": round(value * 0.3 * scale, 1)})
+            for offset, column in enumerate(MEASURE_COLUMNS.get(measure_type, [] if measure_type == "Base" else ["MEASURE_VALUE"])):
+                row[column] = round(100 + (value + offset) % 15 - 7.5, 1)
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def get_data_frames(self) -> list[pd.DataFrame]:
+        return [self._frame.copy()]
+
+
+class LeagueDashPlayerStats(_StubEndpoint):
+    def _rows(self) -> list[dict]:
+        return [{"PLAYER_ID": player_id, "PLAYER_NAME": name, "TEAM_ID": TEAMS[team][0], "TEAM_ABBREVIATION": TEAMS[team][1]}
+                for player_id, name, team in PLAYERS]
+
+
+class LeagueDashTeamStats(_StubEndpoint):
+    def _rows(self) -> list[dict]:
+        return [{"TEAM_ID": team_id, "TEAM_NAME": name} for team_id, _, name in TEAMS]
@@ -0,0 +1,71 @@
+"""Deterministic stand-in for the Gemini model used by query_engine: replays recorded SQL per question.
+
+Recordings are JSON lists of {"question", "sql_query", "query_explanation"}; recorded_sql.json
+holds answers for the synthetic_nba.py schema. Unknown questions get an answer without SQL,
+like a model that failed to translate. ``latency_ms`` simulates the model's response time,
+with a jitter derived from the question so repeated runs sleep identically.
+"""
+import re
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nl_cache import normalize_query_text  # noqa: E402
+
+DEFAULT_RECORDINGS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recorded_sql.json")
+_QUESTION_RE = re.compile(r'Natural Language Question: "(.*)"', re.S)
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubLLM:
+    """Exposes the two model methods query_engine calls (generate_content and generate_content_async)."""
+
+    def __init__(self, recordings_path: str = DEFAULT_RECORDINGS, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        with open(recordings_path, "r", encoding="utf-8") as f:
+            recordings = json.load(f)
+        self.answers = {normalize_query_text(entry["question"]): entry for entry in recordings}
+        self.questions = [entry["question"] for entry in recordings]
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt: str) -> tuple[StubResponse, float]:
+        match = _QUESTION_RE.search(prompt)
+        question = normalize_query_text(match.group(1)) if match else ""
+        with self._lock:
+            self.calls += 1
+        entry = self.answers.get(question)
+        payload = {"sql_query": entry["sql_query"], "query_explanation": entry.get("query_explanation")} if entry else \
+            {"sql_query": None, "query_explanation": "No recorded SQL for this question."}
+        digest = int(hashlib.md5(question.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+        delay = (self.latency_ms + self.jitter_ms * digest) / 1000
+        return StubResponse(json.dumps(payload)), delay
+
+    def generate_content(self, prompt: str, generation_config=None) -> StubResponse:
+        response, delay = self._answer(prompt)
+        if delay:
+            time.sleep(delay)
+        return response
+
+    async def generate_content_async(self, prompt: str, generation_config=None) -> StubResponse:
+        response, delay = self._answer(prompt)
+        if delay:
+            await asyncio.sleep(delay)
+        return response
+
+
+def install(query_engine, recordings_path: str = DEFAULT_RECORDINGS, latency_ms: float = 0.0, jitter_ms: float = 0.0) -> StubLLM:
+    """Replaces query_engine's Gemini model with a StubLLM and returns it."""
+    stub = StubLLM(recordings_path, latency_ms=latency_ms, jitter_ms=jitter_ms)
+    query_engine.model = stub
+    return stub
@@ -0,0 +1,192 @@
+"""Deterministic synthetic NBA stats in the fetcher's partitioned Parquet layout (player and team datasets).
+
+Players keep their id, name and underlying skill across seasons, change teams occasionally
+and age by a year per season, so career and season-over-season questions have real answers.
+Team stats and records are consistent with the players' numbers and the schedule length.
+
+Run from the repository root:  python scripts/benchmarks/synthetic_nba.py --output /tmp/nba_parquet [--seasons N] [--players N] [--games N]
+"""
+import os
+import sys
+import argparse
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stats_storage import write_partition  # noqa: E402
+
+TEAMS = [
+    ("ATL", "Atlanta Hawks"), ("BOS", "Boston Celtics"), ("BKN", "Brooklyn Nets"), ("CHA", "Charlotte Hornets"),
+    ("CHI", "Chicago Bulls"), ("CLE", "Cleveland Cavaliers"), ("DAL", "Dallas Mavericks"), ("DEN", "Denver Nuggets"),
+    ("DET", "Detroit Pistons"), ("GSW", "Golden State Warriors"), ("HOU", "Houston Rockets"), ("IND", "Indiana Pacers"),
+    ("LAC", "LA Clippers"), ("LAL", "Los Angeles Lakers"), ("MEM", "Memphis Grizzlies"), ("MIA", "Miami Heat"),
+    ("MIL", "Milwaukee Bucks"), ("MIN", "Minnesota Timberwolves"), ("NOP", "New Orleans Pelicans"), ("NYK", "New York Knicks"),
+    ("OKC", "Oklahoma City Thunder"), ("ORL", "Orlando Magic"), ("PHI", "Philadelphia 76ers"), ("PHX", "Phoenix Suns"),
+    ("POR", "Portland Trail Blazers"), ("SAC", "Sacramento Kings"), ("SAS", "San Antonio Spurs"), ("TOR", "Toronto Raptors"),
+    ("UTA", "Utah Jazz"), ("WAS", "Washington Wizards"),
+]
+FIRST_TEAM_ID = 1610612737
+FIRST_NAMES = ["James", "Luka", "Jayson", "Nikola", "Stephen", "Kevin", "Anthony", "Devin", "Trae", "Jalen", "Tyrese",
+               "Donovan", "Zion", "Ja", "Paolo", "Victor", "Shai", "Damian", "Jimmy", "Bam", "De'Aaron", "Karl-Anthony"]
+LAST_NAMES = ["Brown", "Johnson", "Williams", "Davis", "Smith", "Jones", "Miller", "Green", "Harris", "Walker", "Young",
+              "Murray", "Mitchell", "Allen", "Gordon", "Holiday", "O'Neal", "Thompson", "White", "Booker", "Adebayo", "Towns"]
+# Per-game averages of an average rotation player; a player's skill scales the counting stats.
+BASE_RATES = {"MIN": 22.0, "FGA": 8.5, "FG3A": 3.2, "FTA": 2.2, "OREB": 1.0, "DREB": 3.2, "AST": 2.4, "TOV": 1.3,
+              "STL": 0.7, "BLK": 0.5, "BLKA": 0.5, "PF": 1.9, "PFD": 1.9}
+PLAYOFF_TEAMS = 16
+
+
+def season_label(start_year: int) -> str:
+    return f"{start_year}-{(start_year + 1) % 100:02d}"
+
+
+def _player_pool(size: int, first_season: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Everyone who plays in the generated seasons, with a stable skill, debut season and career length."""
+    names = [f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+             + (f" {i // (len(FIRST_NAMES) * len(LAST_NAMES)) + 1}" if i >= len(FIRST_NAMES) * len(LAST_NAMES) else "")
+             for i in range(size)]
+    return pd.DataFrame({
+        "PLAYER_ID": np.arange(size) * 7 + 201_000,
+        "PLAYER_NAME": names,
+        "skill": rng.lognormal(0.0, 0.45, size=size),
+        "debut": first_season + rng.integers(-12, 0, size=size) + rng.integers(0, 14, size=size),
+        "career": rng.integers(3, 19, size=size),
+        "debut_age": rng.integers(19, 24, size=size),
+        "team": rng.integers(0, len(TEAMS), size=size),
+    })
+
+
+def _player_lines(active: pd.DataFrame, games: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Per-game stat lines (LeagueDashPlayerStats Base/PerGame columns) for the active players."""
+    n = len(active)
+    skill = active["skill"].to_numpy()
+    df = pd.DataFrame({
+        "PLAYER_ID": active["PLAYER_ID"].to_numpy(),
+        "PLAYER_NAME": active["PLAYER_NAME"].to_numpy(),
+        "TEAM_ID": FIRST_TEAM_ID + active["team"].to_numpy(),
+        "TEAM_ABBREVIATION": [TEAMS[t][0] for t in active["team"]],
+        "AGE": active["age"].to_numpy().astype(float),
+        "GP": np.minimum(games, rng.binomial(games, np.clip(0.55 + 0.1 * skill, 0.1, 0.98))).clip(1),
+    })
+    minutes = np.clip(BASE_RATES["MIN"] * np.sqrt(skill) * rng.normal(1, 0.1, size=n), 4, 40)
+    scale = minutes / BASE_RATES["MIN"]
+    for column, rate in BASE_RATES.items():
+        if column != "MIN":
+            df[column] = (rate * scale * rng.gamma(20, 1 / 20, size=n)).round(1)
+    df["MIN"] = minutes.round(1)
+    fg_pct = np.clip(rng.normal(0.455 + 0.02 * np.log(skill), 0.035, size=n), 0.3, 0.7)
+    fg3_pct = np.clip(rng.normal(0.355, 0.04, size=n), 0.0, 0.5)
+    ft_pct = np.clip(rng.normal(0.77, 0.07, size=n), 0.4, 0.95)
+    df["FG3A"] = np.minimum(df["FG3A"], df["FGA"])
+    df["FG3M"] = (df["FG3A"] * fg3_pct).round(1)
+    df["FGM"] = np.maximum(df["FGA"] * fg_pct, df["FG3M"]).round(1)
+    df["FTM"] = (df["FTA"] * ft_pct).round(1)
+    for made, attempted in (("FGM", "FGA"), ("FG3M", "FG3A"), ("FTM", "FTA")):
+        df[f"{made[:-1]}_PCT"] = np.where(df[attempted] > 0, df[made] / df[attempted].where(df[attempted] > 0, 1), 0).round(3)
+    df["REB"] = (df["OREB"] + df["DREB"]).round(1)
+    df["PTS"] = (2 * df["FGM"] + df["FG3M"] + df["FTM"]).round(1)
+    df["PLUS_MINUS"] = rng.normal(0, 2.5, size=n).round(1)
+    df["NBA_FANTASY_PTS"] = (df["PTS"] + 1.2 * df["REB"] + 1.5 * df["AST"] + 3 * (df["STL"] + df["BLK"]) - df["TOV"]).round(1)
+    df["DD2"] = rng.binomial(df["GP"], np.clip((df["REB"] + df["AST"]) / 40, 0, 0.9))
+    df["TD3"] = rng.binomial(df["GP"], np.clip((df["REB"] + df["AST"]) / 400, 0, 0.1))
+    return df
+
+
+def _team_lines(players: pd.DataFrame, games: int, team_ids: list[int], rng: np.random.Generator) -> pd.DataFrame:
+    """LeagueDashTeamStats Base/PerGame rows derived from the players' minutes-weighted production."""
+    weights = players["GP"] / games
+    totals = players.assign(**{column: players[column] * weights for column in
+                               ["MIN", "FGM", "FGA", "FG3M", "FG3A", "FTM", "FTA", "OREB", "DREB", "REB", "AST", "TOV",
+                                "STL", "BLK", "BLKA", "PF", "PFD", "PTS"]})
+    by_team = totals.groupby("TEAM_ID").sum(numeric_only=True).reindex(team_ids, fill_value=0)
+    # Normalize to 240 team minutes per game, then derive the record from the scoring margin.
+    factor = np.where(by_team["MIN"] > 0, 240 / by_team["MIN"].where(by_team["MIN"] > 0, 1), 0)
+    df = pd.DataFrame({"TEAM_ID": team_ids, "TEAM_NAME": [TEAMS[t - FIRST_TEAM_ID][1] for t in team_ids]})
+    for column in ["FGM", "FGA", "FG3M", "FG3A", "FTM", "FTA", "OREB", "DREB", "REB", "AST", "TOV", "STL", "BLK", "BLKA",
+                   "PF", "PFD", "PTS"]:
+        df[column] = (by_team[column].to_numpy() * factor).round(1)
+    df["MIN"] = 48.0
+    margin = df["PTS"] - df["PTS"].mean() + rng.normal(0, 2, size=len(df))
+    df["GP"] = games
+    df["W"] = rng.binomial(games, 1 / (1 + np.exp(-margin / 4)))
+    df["L"] = games - df["W"]
+    df["W_PCT"] = (df["W"] / games).round(3)
+    for made, attempted in (("FGM", "FGA"), ("FG3M", "FG3A"), ("FTM", "FTA")):
+        df[f"{made[:-1]}_PCT"] = np.where(df[attempted] > 0, df[made] / df[attempted].where(df[attempted] > 0, 1), 0).round(3)
+    df["PLUS_MINUS"] = margin.round(1)
+    return df
+
+
+def _totals(per_game: pd.DataFrame, label_columns: list[str]) -> pd.DataFrame:
+    """Totals per_mode: counting stats times games played; percentages, ages and records unchanged."""
+    df = per_game.copy()
+    keep = set(label_columns) | {"GP", "W", "L", "AGE"} | {column for column in df.columns if column.endswith("_PCT")}
+    for column in df.columns:
+        if column not in keep and pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = (df[column] * df["GP"]).round(0)
+    return df
+
+
+def generate_dataset(root: str, seasons: int = 10, players: int = 450, games: int = 82, last_season: int = 2023,
+                     per_modes: tuple = ("PerGame",), seed: int = 0) -> dict:
+    """Writes ``seasons`` regular seasons (ending with ``last_season``-``last_season+1``) plus playoffs under ``root``.
+
+    ``players`` is the number of active players per regular season; ``games`` is the regular
+    season length (playoff teams play up to a quarter of it). Returns row counts per dataset.
+    """
+    rng = np.random.default_rng(seed)
+    first_season = last_season - seasons + 1
+    pool = _player_pool(max(players * 3, players + 100), first_season, rng)
+    playoff_games = max(4, games // 4)
+    counts = {"player": 0, "team": 0}
+    for year in range(first_season, last_season + 1):
+        season = season_label(year)
+        years_in = year - pool["debut"]
+        active = pool[(years_in >= 0) & (years_in < pool["career"])].copy()
+        if len(active) < players:  # Fill the league with late-career veterans rather than leaving rosters short.
+            extra = pool.drop(active.index)
+            active = pd.concat([active, extra.iloc[:players - len(active)]])
+        active = active.sort_values("skill", ascending=False).iloc[:players].copy()
+        moves = rng.random(len(pool)) < 0.12  # Offseason trades and signings
+        pool.loc[moves, "team"] = rng.integers(0, len(TEAMS), size=int(moves.sum()))
+        active["team"] = pool.loc[active.index, "team"]
+        active["age"] = active["debut_age"] + (year - active["debut"]).clip(lower=0)
+        team_ids = [FIRST_TEAM_ID + t for t in range(len(TEAMS))]
+
+        regular = _player_lines(active, games, rng)
+        regular_teams = _team_lines(regular, games, team_ids, rng)
+        playoff_ids = regular_teams.nlargest(PLAYOFF_TEAMS, "W")["TEAM_ID"].tolist()
+        in_playoffs = regular["TEAM_ID"].isin(playoff_ids).to_numpy()
+        playoffs = _player_lines(active[in_playoffs], playoff_games, rng)
+        playoff_teams = _team_lines(playoffs, playoff_games, sorted(playoff_ids), rng)
+
+        for season_type, player_df, team_df in (("Regular Season", regular, regular_teams), ("Playoffs", playoffs, playoff_teams)):
+            for per_mode in per_modes:
+                frames = {"player": player_df, "team": team_df}
+                if per_mode == "Totals":
+                    frames = {"player": _totals(player_df, ["PLAYER_ID", "TEAM_ID"]), "team": _totals(team_df, ["TEAM_ID"])}
+                for dataset, frame in frames.items():
+                    write_partition(frame, root, dataset, season=season, season_type=season_type,
+                                    measure_type="Base", per_mode=per_mode)
+                    counts[dataset] += len(frame)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", required=True, help="Parquet root to write (e.g. /tmp/nba_parquet).")
+    parser.add_argument("--seasons", type=int, default=10)
+    parser.add_argument("--players", type=int, default=450, help="Active players per regular season.")
+    parser.add_argument("--games", type=int, default=82, help="Regular season games per team.")
+    parser.add_argument("--last-season", type=int, default=2023, help="Start year of the most recent season.")
+    parser.add_argument("--per-modes", nargs="+", default=["PerGame"], choices=["PerGame", "Totals"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    counts = generate_dataset(args.output, args.seasons, args.players, args.games, args.last_season,
+                              tuple(args.per_modes), args.seed)
+    print(f"Wrote {counts['player']} player rows and {counts['team']} team rows to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
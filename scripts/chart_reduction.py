@@ -0,0 +1,161 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+COUNT_COLUMN = "count"
+OTHER_LABEL = "Other"
+
+
+def _as_float(values: pd.Series) -> np.ndarray:
+    """Numeric view of a numeric or datetime column (datetimes as epoch nanoseconds)."""
+    if pd.api.types.is_datetime64_any_dtype(values.dtype):
+        return values.astype("int64").to_numpy(dtype="float64")
+    return values.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _reduction_info(method: str, input_rows: int, output_rows: int, max_points: int, **extra) -> dict:
+    return {"method": method, "input_rows": input_rows, "output_rows": output_rows, "max_points": max_points, **extra}
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: indices of ``threshold`` points preserving the visual shape of (x, y).
+
+    ``x`` must be sorted. The first and last points are always kept; every bucket in
+    between contributes the point forming the largest triangle with the previously kept
+    point and the average of the next bucket.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[anchor] - avg_x) * (y[start:end] - y[anchor])
+            - (x[anchor] - x[start:end]) * (avg_y - y[anchor])
+        )
+        anchor = start + int(np.argmax(areas))
+        selected[i + 1] = anchor
+    return selected
+
+
+def minmax_indices(y: np.ndarray, max_points: int) -> np.ndarray:
+    """Min/max bucketing: the lowest and highest point of each of ``max_points // 2`` equal-width buckets."""
+    n = len(y)
+    if max_points >= n:
+        return np.arange(n)
+    buckets = np.arange(n) * max(1, max_points // 2) // n
+    grouped = pd.Series(y).groupby(buckets)
+    return np.unique(np.concatenate([grouped.idxmin().to_numpy(), grouped.idxmax().to_numpy()]))
+
+
+def reduce_line(df: pd.DataFrame, x_col: str, y_col: str, max_points: int = 1000,
+                method: str = "lttb") -> tuple[pd.DataFrame, dict | None]:
+    """Downsamples a line series to at most ``max_points`` points ('lttb' or 'minmax')."""
+    data = df[[x_col, y_col]].dropna().sort_values(x_col, kind="stable").reset_index(drop=True)
+    if len(data) <= max_points:
+        return data, None
+    x, y = _as_float(data[x_col]), _as_float(data[y_col])
+    if method == "minmax":
+        indices = minmax_indices(y, max_points)
+    else:
+        method = "lttb"
+        indices = lttb_indices(x, y, max_points)
+    reduced = data.iloc[indices].reset_index(drop=True)
+    return reduced, _reduction_info(method, len(data), len(reduced), max_points)
+
+
+def _grid_cells(x: np.ndarray, y: np.ndarray, bins_per_axis: int) -> tuple[np.ndarray, np.ndarray]:
+    def cell(values):
+        low, high = np.nanmin(values), np.nanmax(values)
+        width = (high - low) / bins_per_axis or 1.0
+        return np.clip(((values - low) / width).astype(np.int64), 0, bins_per_axis - 1)
+    return cell(x), cell(y)
+
+
+def _unused_name(name: str, columns) -> str:
+    """``name``, prefixed with underscores until it matches none of ``columns``."""
+    while name in columns:
+        name = f"_{name}"
+    return name
+
+
+def bin_scatter(df: pd.DataFrame, x_col: str, y_col: str, max_points: int = 2000,
+                color_col: str | None = None) -> tuple[pd.DataFrame, dict | None]:
+    """2-D binning: one point per occupied grid cell (and colour), placed at the cell's centroid with a row count.
+
+    The row count column is COUNT_COLUMN unless an axis already uses that name (e.g. a
+    COUNT(*) result); its actual name is the reduction info's ``count_column``.
+    """
+    columns = [x_col, y_col] + ([color_col] if color_col else [])
+    data = df[columns].dropna(subset=[x_col, y_col])
+    if len(data) <= max_points:
+        return data.reset_index(drop=True), None
+    groups = data[color_col].nunique() if color_col else 1
+    bins_per_axis = max(1, int(np.sqrt(max_points / max(1, groups))))
+    cell_x, cell_y = _grid_cells(_as_float(data[x_col]), _as_float(data[y_col]), bins_per_axis)
+    keys = [cell_x, cell_y] + ([data[color_col].to_numpy()] if color_col else [])
+    count_column = _unused_name(COUNT_COLUMN, columns)
+    binned = data.groupby(keys, sort=False).agg(**{
+        x_col: (x_col, "mean"),
+        y_col: (y_col, "mean"),
+        count_column: (y_col, "size"),
+        **({color_col: (color_col, "first")} if color_col else {}),
+    }).reset_index(drop=True)
+    return binned, _reduction_info("bin2d", len(data), len(binned), max_points, bins_per_axis=bins_per_axis,
+                                   count_column=count_column)
+
+
+def stratified_sample_scatter(df: pd.DataFrame, x_col: str, y_col: str, max_points: int = 2000,
+                              color_col: str | None = None, seed: int = 0) -> tuple[pd.DataFrame, dict | None]:
+    """Random sample allocated proportionally over strata (colour groups, else a coarse 10x10 grid),
+    keeping at least one point per stratum so sparse regions and outliers stay visible."""
+    columns = [x_col, y_col] + ([color_col] if color_col else [])
+    data = df[columns].dropna(subset=[x_col, y_col])
+    if len(data) <= max_points:
+        return data.reset_index(drop=True), None
+    if color_col:
+        strata = pd.factorize(data[color_col])[0]
+    else:
+        cell_x, cell_y = _grid_cells(_as_float(data[x_col]), _as_float(data[y_col]), 10)
+        strata = cell_x * 10 + cell_y
+    shuffled = np.random.default_rng(seed).permutation(len(data))
+    strata = pd.Series(strata[shuffled])
+    sizes = strata.map(strata.value_counts())
+    quota = np.maximum(1, np.floor(sizes * max_points / len(data)))
+    keep = shuffled[(strata.groupby(strata).cumcount() < quota).to_numpy()][:max_points]
+    sampled = data.iloc[np.sort(keep)].reset_index(drop=True)
+    return sampled, _reduction_info("stratified_sample", len(data), len(sampled), max_points)
+
+
+def top_k_with_other(df: pd.DataFrame, label_col: str, value_col: str, top_k: int = 20,
+                     extra_cols: list[str] | None = None) -> tuple[pd.DataFrame, dict | None]:
+    """One bar per category for the ``top_k`` categories by ``value_col``, plus one "Other (n)" bar.
+
+    Repeated labels are summed first (which is what stacked Vega-Lite bars would show); the
+    "Other" bar carries the mean over the remaining categories.
+    """
+    columns = [label_col, value_col] + [c for c in (extra_cols or []) if c not in (label_col, value_col)]
+    data = df[columns]
+    per_category = data.groupby(label_col, sort=False).sum(numeric_only=True)
+    if len(per_category) <= top_k and len(per_category) == len(data):
+        return data.reset_index(drop=True), None
+    top_labels = per_category[value_col].nlargest(top_k).index
+    top = per_category.loc[top_labels]
+    rest = per_category.drop(index=top_labels)
+    extra = {"duplicates_aggregate": "sum"} if len(per_category) < len(data) else {}
+    if not rest.empty:
+        other = rest.mean().to_frame(f"{OTHER_LABEL} ({len(rest)})").T
+        top = pd.concat([top, other])
+        extra.update(other_categories=len(rest), other_aggregate="mean")
+    reduced = top.rename_axis(label_col).reset_index().reindex(columns=columns)
+    return reduced, _reduction_info("top_k_other", len(data), len(reduced), top_k, **extra)
@@ -0,0 +1,320 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable
+
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class _PooledConnection:
+    """Bookkeeping for a single physical connection owned by the pool."""
+    __slots__ = ("conn", "created_at", "last_used_at", "overflow", "info")
+
+    def __init__(self, conn, overflow: bool = False):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used_at = now
+        self.overflow = overflow
+        self.info = {}
+
+
+class ConnectionPool:
+    """Thread-safe pool of PostgreSQL connections.
+
+    Keeps between ``min_size`` and ``max_size`` warm connections, allows up to
+    ``max_overflow`` short-lived extra connections under bursts, pings idle
+    connections on checkout and recycles connections that have been idle or
+    alive for too long.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int = 1,
+        max_size: int = 10,
+        max_overflow: int = 0,
+        timeout: float = 30.0,
+        max_idle: float = 300.0,
+        max_lifetime: float = 3600.0,
+        ping_interval: float = 10.0,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1.")
+        if not 0 <= min_size <= max_size:
+            raise ValueError("min_size must be between 0 and max_size.")
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_overflow = max(0, max_overflow)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+
+        self._cond = threading.Condition()
+        self._idle: list[_PooledConnection] = []  # LIFO: most recently used at the end
+        self._in_use: dict[int, _PooledConnection] = {}
+        self._pooled_count = 0  # pooled (non-overflow) connections, idle + in use
+        self._overflow_count = 0
+        self._closed = False
+        self._metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_seconds": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "closed": 0,
+            "recycled": 0,
+            "failed_health_checks": 0,
+            "overflow_total": 0,
+        }
+
+    # --- Connection lifecycle helpers ---
+    def _open(self, overflow: bool = False) -> _PooledConnection:
+        conn = self._connect()
+        with self._cond:
+            self._metrics["created"] += 1
+        return _PooledConnection(conn, overflow=overflow)
+
+    def _close(self, record: _PooledConnection):
+        try:
+            if not record.conn.closed:
+                record.conn.close()
+        except Exception as e:
+            logger.debug(f"Ignoring error while closing pooled connection: {e}")
+        with self._cond:
+            self._metrics["closed"] += 1
+
+    def _is_expired(self, record: _PooledConnection, now: float) -> bool:
+        if self.max_lifetime and now - record.created_at > self.max_lifetime:
+            return True
+        return False
+
+    def _is_healthy(self, record: _PooledConnection, now: float) -> bool:
+        conn = record.conn
+        if conn.closed:
+            return False
+        if now - record.last_used_at < self.ping_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Pooled connection failed health check, discarding it: {e}")
+            return False
+
+    def _reset(self, record: _PooledConnection) -> bool:
+        """Returns the connection to a clean idle state. False if it is unusable."""
+        conn = record.conn
+        if conn.closed:
+            return False
+        try:
+            if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Could not reset pooled connection, discarding it: {e}")
+            return False
+
+    def _prune_idle_locked(self, now: float) -> list[_PooledConnection]:
+        """Removes idle connections past their idle/lifetime limits. Caller holds the lock."""
+        stale = []
+        keep = []
+        for record in self._idle:
+            too_idle = (
+                self.max_idle
+                and now - record.last_used_at > self.max_idle
+                and self._pooled_count - len(stale) > self.min_size
+            )
+            if too_idle or self._is_expired(record, now):
+                stale.append(record)
+            else:
+                keep.append(record)
+        if stale:
+            self._idle = keep
+            self._pooled_count -= len(stale)
+            self._metrics["recycled"] += len(stale)
+        return stale
+
+    # --- Public API ---
+    def open(self):
+        """Pre-fills the pool with ``min_size`` connections."""
+        while True:
+            with self._cond:
+                if self._closed or self._pooled_count >= self.min_size:
+                    return
+                self._pooled_count += 1
+            try:
+                record = self._open()
+            except Exception:
+                with self._cond:
+                    self._pooled_count -= 1
+                raise
+            with self._cond:
+                self._idle.append(record)
+                self._cond.notify()
+
+    def getconn(self, timeout: float | None = None):
+        """Checks out a healthy connection, waiting up to ``timeout`` seconds if the pool is exhausted."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        wait_started = None
+
+        while True:
+            record = None
+            create_overflow = False
+            create_pooled = False
+            with self._cond:
+                if self._closed:
+                    raise psycopg2.InterfaceError("Connection pool is closed.")
+                stale = self._prune_idle_locked(time.monotonic())
+                if self._idle:
+                    record = self._idle.pop()
+                elif self._pooled_count < self.max_size:
+                    self._pooled_count += 1
+                    create_pooled = True
+                elif self._overflow_count < self.max_overflow:
+                    self._overflow_count += 1
+                    self._metrics["overflow_total"] += 1
+                    create_overflow = True
+                else:
+                    if not waited:
+                        waited = True
+                        wait_started = time.monotonic()
+                        self._metrics["waits"] += 1
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics["timeouts"] += 1
+                        self._metrics["wait_time_seconds"] += time.monotonic() - wait_started
+                        raise PoolTimeout(
+                            f"Timed out after {timeout:.1f}s waiting for a database connection "
+                            f"(max_size={self.max_size}, max_overflow={self.max_overflow})."
+                        )
+                    self._cond.wait(remaining)
+            for stale_record in stale:
+                self._close(stale_record)
+
+            if create_pooled or create_overflow:
+                try:
+                    record = self._open(overflow=create_overflow)
+                except Exception:
+                    with self._cond:
+                        if create_overflow:
+                            self._overflow_count -= 1
+                        else:
+                            self._pooled_count -= 1
+                        self._cond.notify()
+                    raise
+            elif record is not None and not self._is_healthy(record, time.monotonic()):
+                with self._cond:
+                    self._metrics["failed_health_checks"] += 1
+                    self._pooled_count -= 1
+                self._close(record)
+                continue
+
+            if record is None:
+                continue
+
+            with self._cond:
+                record.last_used_at = time.monotonic()
+                self._in_use[id(record.conn)] = record
+                self._metrics["checkouts"] += 1
+                if waited:
+                    self._metrics["wait_time_seconds"] += time.monotonic() - wait_started
+            return record.conn
+
+    def putconn(self, conn, discard: bool = False):
+        """Returns a connection to the pool. ``discard=True`` closes it instead (e.g. after a broken connection)."""
+        with self._cond:
+            record = self._in_use.pop(id(conn), None)
+        if record is None:
+            logger.warning("Attempted to return a connection that is not checked out from this pool; closing it.")
+            try:
+                conn.close()
+            except Exception:
+                pass
+            return
+
+        now = time.monotonic()
+        keep = (
+            not discard
+            and not record.overflow
+            and not self._closed
+            and not self._is_expired(record, now)
+            and self._reset(record)
+        )
+        if keep:
+            with self._cond:
+                record.last_used_at = now
+                self._idle.append(record)
+                self._cond.notify()
+            return
+
+        with self._cond:
+            if record.overflow:
+                self._overflow_count -= 1
+            else:
+                self._pooled_count -= 1
+                if not discard:
+                    self._metrics["recycled"] += 1
+            self._cond.notify()
+        self._close(record)
+
+    @contextmanager
+    def connection(self, timeout: float | None = None):
+        """Context manager that checks out a connection and always returns it."""
+        conn = self.getconn(timeout=timeout)
+        discard = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard or conn.closed)
+
+    def connection_info(self, conn) -> dict:
+        """Per-connection scratch space that lives as long as the physical connection."""
+        with self._cond:
+            record = self._in_use.get(id(conn))
+        if record is None:
+            raise ValueError("Connection is not checked out from this pool.")
+        return record.info
+
+    def closeall(self):
+        """Closes every idle connection and marks the pool closed; in-use connections close on return."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._pooled_count -= len(idle)
+            self._cond.notify_all()
+        for record in idle:
+            self._close(record)
+
+    def metrics(self) -> dict:
+        """Returns a snapshot of pool size and usage counters."""
+        with self._cond:
+            snapshot = dict(self._metrics)
+            snapshot.update({
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "max_overflow": self.max_overflow,
+                "size": self._pooled_count,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "overflow_active": self._overflow_count,
+            })
+        snapshot["wait_time_seconds"] = round(snapshot["wait_time_seconds"], 6)
+        return snapshot
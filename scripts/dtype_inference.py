@@ -0,0 +1,178 @@
+import re
+import logging
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+NUMERIC = "numeric"
+DATETIME = "datetime"
+BOOLEAN = "boolean"
+STRING = "string"
+OTHER = "other"
+
+# PostgreSQL type OIDs (pg_type.oid) reported in cursor.description[i].type_code.
+PG_TYPE_KINDS = {
+    16: BOOLEAN,
+    20: NUMERIC, 21: NUMERIC, 23: NUMERIC, 26: NUMERIC,  # int8, int2, int4, oid
+    700: NUMERIC, 701: NUMERIC, 790: NUMERIC, 1700: NUMERIC,  # float4, float8, money, numeric
+    1082: DATETIME, 1114: DATETIME, 1184: DATETIME,  # date, timestamp, timestamptz
+    18: STRING, 19: STRING, 25: STRING, 1042: STRING, 1043: STRING,  # char, name, text, bpchar, varchar
+}
+TYPE_OIDS_ATTR = "pg_type_oids"
+
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d+)?)?([+-]\d{2}(:?\d{2})?|Z)?)?$")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def sql_shape(sql_query: str) -> str:
+    """SQL text with literals replaced, so queries differing only in constants share an inferred schema."""
+    return re.sub(r"\s+", " ", _LITERAL_RE.sub("?", sql_query)).strip().rstrip(";").lower()
+
+
+_INFERRED_KINDS = {
+    "boolean": BOOLEAN,
+    "integer": NUMERIC, "floating": NUMERIC, "mixed-integer-float": NUMERIC, "decimal": NUMERIC,
+    "date": DATETIME, "datetime": DATETIME, "datetime64": DATETIME,
+}
+
+
+def _infer_from_sample(sample: pd.Series) -> str:
+    """Decides a column's kind from a small sample of its non-null values."""
+    if sample.empty:
+        return OTHER
+    inferred = pd.api.types.infer_dtype(sample, skipna=True)
+    if inferred in _INFERRED_KINDS:
+        return _INFERRED_KINDS[inferred]
+    if inferred != "string":
+        return OTHER
+    stripped = sample.str.strip()
+    if pd.to_numeric(stripped, errors="coerce").notna().all():
+        return NUMERIC
+    if stripped.str.match(_ISO_DATE_RE).all():
+        return DATETIME
+    return STRING
+
+
+def infer_column_kind(series: pd.Series, type_oid: int | None = None, sample_size: int = 200) -> str:
+    """Kind of a column: from its dtype if already typed, else its PostgreSQL type OID, else a value sample."""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return BOOLEAN
+    if pd.api.types.is_numeric_dtype(dtype):
+        return NUMERIC
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return DATETIME
+    # Text columns may still hold numbers or ISO dates (the ingest stores several that way), so sample those.
+    if PG_TYPE_KINDS.get(type_oid, STRING) != STRING:
+        return PG_TYPE_KINDS[type_oid]
+    # Spread the sample over the column instead of only looking at its head.
+    step = max(1, len(series) // sample_size)
+    sample = series.iloc[::step].dropna()
+    if sample.empty:
+        sample = series.dropna().iloc[:sample_size]
+    return _infer_from_sample(sample)
+
+
+def _convert(series: pd.Series, kind: str) -> pd.Series | None:
+    """Converted column, or None when it is already in the right representation."""
+    dtype = series.dtype
+    if kind == NUMERIC:
+        if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            return None
+        try:
+            return series.astype("float64")  # Fast path for Decimal/int/float objects.
+        except (ValueError, TypeError):
+            return pd.to_numeric(series, errors="coerce")  # Surrounding whitespace is accepted by the parser.
+    if kind == DATETIME:
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return None
+        try:
+            return pd.to_datetime(series, errors="coerce", format="ISO8601")
+        except (ValueError, TypeError):  # Mixed date objects and strings.
+            return pd.to_datetime(series, errors="coerce")
+    if kind == STRING and (pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype)):
+        return series.str.strip()
+    return None
+
+
+def _loses_values(original: pd.Series, converted: pd.Series) -> bool:
+    """True when conversion turned values into nulls (blank strings aside), i.e. they did not fit the type."""
+    lost = converted.isna().to_numpy() & original.notna().to_numpy()
+    if not lost.any():
+        return False
+    dropped = original[lost]
+    if pd.api.types.is_object_dtype(dropped.dtype) or pd.api.types.is_string_dtype(dropped.dtype):
+        return bool((dropped.astype(str).str.strip() != "").any())
+    return True
+
+
+class DtypeInferenceEngine:
+    """Infers and applies column types for query results.
+
+    Inferred schemas are cached per (SQL shape, column names), so repeated questions skip
+    inference entirely. Conversion replaces individual columns of a shallow copy (or of
+    the frame itself with ``inplace=True``) rather than deep-copying the whole frame. A
+    column whose values do not all parse as its inferred type is left as it was, and the
+    cached schema is dropped so the next result of that shape is inferred afresh.
+    """
+
+    def __init__(self, sample_size: int = 200, max_cached_schemas: int = 512):
+        self.sample_size = sample_size
+        self.max_cached_schemas = max_cached_schemas
+        self._schemas: OrderedDict[tuple, list[str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.schema_cache_hits = 0
+        self.schema_cache_misses = 0
+
+    def infer_schema(self, df: pd.DataFrame, sql_query: str | None = None) -> dict[str, str]:
+        """Maps each column to 'numeric', 'datetime', 'boolean', 'string' or 'other' (see infer_kinds())."""
+        return dict(zip(df.columns, self.infer_kinds(df, sql_query)))
+
+    def infer_kinds(self, df: pd.DataFrame, sql_query: str | None = None) -> list[str]:
+        """The kind of each column by position, so columns sharing a name (e.g. from a join) keep their own."""
+        key = (sql_shape(sql_query), tuple(df.columns)) if sql_query else None
+        if key is not None:
+            with self._lock:
+                cached = self._schemas.get(key)
+                if cached is not None:
+                    self._schemas.move_to_end(key)
+                    self.schema_cache_hits += 1
+                    return cached
+                self.schema_cache_misses += 1
+        type_oids = df.attrs.get(TYPE_OIDS_ATTR, {})
+        kinds = [
+            infer_column_kind(df.iloc[:, i], type_oids.get(col), self.sample_size)
+            for i, col in enumerate(df.columns)
+        ]
+        if key is not None:
+            with self._lock:
+                self._schemas[key] = kinds
+                while len(self._schemas) > self.max_cached_schemas:
+                    self._schemas.popitem(last=False)
+        return kinds
+
+    def coerce(self, df: pd.DataFrame, sql_query: str | None = None, inplace: bool = False) -> pd.DataFrame:
+        """Returns ``df`` with columns converted to their inferred types."""
+        if df is None or df.empty:
+            return df
+        kinds = self.infer_kinds(df, sql_query)
+        target = df if inplace else df.copy(deep=False)
+        mismatched = False
+        for i, (col, kind) in enumerate(zip(target.columns, kinds)):
+            original = target.iloc[:, i]
+            converted = _convert(original, kind)
+            if converted is None:
+                continue
+            if kind in (NUMERIC, DATETIME) and _loses_values(original, converted):
+                logger.debug(f"Column '{col}' has values that are not {kind}; keeping it unconverted.")
+                mismatched = True
+                continue
+            target.isetitem(i, converted)
+            logger.debug(f"Column '{col}' coerced to {kind}.")
+        if mismatched and sql_query:
+            with self._lock:
+                self._schemas.pop((sql_shape(sql_query), tuple(df.columns)), None)
+        return target
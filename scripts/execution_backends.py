@@ -0,0 +1,439 @@
+import os
+import re
+import json
+import uuid
+import hashlib
+import logging
+import threading
+from urllib.parse import quote
+
+import pandas as pd
+import psycopg2
+
+from dtype_inference import TYPE_OIDS_ATTR
+from schema_catalog import fetch_catalog, fetch_catalog_checksum
+from stats_storage import PARTITION_COLUMNS, PARTITION_FILENAME, list_partitions, partition_path
+from table_versions import fetch_table_versions
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRejected(Exception):
+    """Raised by a backend for SQL it refuses to run (e.g. anything but a single read-only statement)."""
+
+
+class StatementTimeout(Exception):
+    """Raised when a query runs longer than the backend's statement timeout and the backend has no native error for it."""
+
+
+class ExecutionBackend:
+    """Where generated SQL runs and where the schema shown to the LLM comes from.
+
+    Subclasses implement catalog introspection (same structure as schema_catalog.fetch_catalog),
+    per-table versions for the result cache, and query execution. Execution methods raise one
+    of ``errors`` for problems with the query or the database; ``describe_error`` turns those
+    into the explanation shown to the user. A ``canceller`` passed to the execution methods is
+    given a callable that interrupts the running query (see query_engine._QueryCanceller).
+    Queries and EXPLAINs are aborted after ``statement_timeout_ms`` (0 disables the limit).
+    """
+
+    name = "base"
+    errors: tuple = (QueryRejected,)
+    statement_timeout_ms = 0
+
+    def fetch_catalog_checksum(self) -> str:
+        raise NotImplementedError
+
+    def fetch_catalog(self) -> dict:
+        raise NotImplementedError
+
+    def fetch_table_versions(self, table_names) -> dict:
+        raise NotImplementedError
+
+    def iter_chunks(self, sql_query: str, chunk_rows: int, canceller=None):
+        """Yields the result as DataFrames of at most ``chunk_rows`` rows; the first one (possibly empty) names the columns."""
+        raise NotImplementedError
+
+    def explain(self, sql_query: str, canceller=None) -> dict:
+        """The planner's estimate for ``sql_query`` without running it: {"total_cost", "plan_rows"}, None where unknown."""
+        raise NotImplementedError
+
+    def is_query_error(self, e: Exception) -> bool:
+        """Whether an error from ``errors`` is caused by the SQL itself (so a corrected query could succeed)."""
+        return True
+
+    def execute_prepared(self, name: str, sql_query: str, params: list, canceller=None) -> pd.DataFrame:
+        """Runs ``sql_query`` (``$1``-style placeholders) bound to ``params``; the whole result as one DataFrame.
+
+        Backends that can keep plans prepare the statement under ``name`` once and reuse it.
+        The SQL must come from trusted templates: it is not checked like generated SQL.
+        """
+        raise NotImplementedError
+
+    def execute(self, sql_query: str, canceller=None) -> pd.DataFrame:
+        """The whole result as one DataFrame."""
+        chunks = list(self.iter_chunks(sql_query, 100_000, canceller=canceller))
+        df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+        df.attrs = dict(chunks[0].attrs)
+        return df
+
+    def describe_error(self, e: Exception) -> str:
+        return f"Database error: {e}. Check SQL syntax."
+
+    def close(self):
+        pass
+
+
+class PostgresBackend(ExecutionBackend):
+    """Runs queries on PostgreSQL connections checked out from the query engine's pool."""
+
+    name = "postgres"
+    errors = (psycopg2.Error, QueryRejected)
+
+    def __init__(self, get_connection, release_connection, statement_timeout_ms: int = 0, connection_info=None):
+        self.get_connection = get_connection
+        self.release_connection = release_connection
+        self.statement_timeout_ms = statement_timeout_ms
+        self.connection_info = connection_info  # conn -> per-connection dict (db_pool.ConnectionPool.connection_info)
+
+    def _set_statement_timeout(self, conn):
+        """Limits statements for the rest of the current transaction only, so pooled connections keep their defaults."""
+        if self.statement_timeout_ms:
+            with conn.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s", (int(self.statement_timeout_ms),))
+
+    def _with_connection(self, func, *args):
+        conn = self.get_connection()
+        try:
+            return func(conn, *args)
+        finally:
+            self.release_connection(conn)
+
+    def fetch_catalog_checksum(self) -> str:
+        return self._with_connection(fetch_catalog_checksum)
+
+    def fetch_catalog(self) -> dict:
+        return self._with_connection(fetch_catalog)
+
+    def fetch_table_versions(self, table_names) -> dict:
+        return self._with_connection(fetch_table_versions, table_names)
+
+    def execute(self, sql_query: str, canceller=None) -> pd.DataFrame:
+        return self._fetch_all(lambda conn, cursor: cursor.execute(sql_query), canceller)
+
+    def execute_prepared(self, name: str, sql_query: str, params: list, canceller=None) -> pd.DataFrame:
+        """PREPAREs the statement once per pooled connection (prepared statements live as long as the session).
+
+        Without ``connection_info`` there is nowhere to remember what a connection has prepared,
+        so the parameters are bound client-side instead.
+        """
+        def run(conn, cursor):
+            if self.connection_info is None:
+                pyformat = re.sub(r"\$(\d+)", r"%(p\1)s", sql_query.replace("%", "%%"))
+                cursor.execute(pyformat, {f"p{i}": value for i, value in enumerate(params, start=1)})
+                return
+            prepared = self.connection_info(conn).setdefault("prepared_statements", set())
+            if name not in prepared:
+                cursor.execute(f"PREPARE {name} AS {sql_query}")
+                prepared.add(name)
+            cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", list(params))
+
+        return self._fetch_all(run, canceller)
+
+    def _fetch_all(self, run, canceller=None) -> pd.DataFrame:
+        """Calls ``run(conn, cursor)`` on a pooled connection and returns the cursor's result."""
+        conn = self.get_connection()
+        discard_conn = False
+        if canceller is not None:
+            canceller.attach(conn.cancel)
+        try:
+            self._set_statement_timeout(conn)
+            with conn.cursor() as cursor:
+                run(conn, cursor)
+                columns = [column.name for column in cursor.description]
+                df = pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+                df.attrs[TYPE_OIDS_ATTR] = {column.name: column.type_code for column in cursor.description}
+            conn.rollback()
+            return df
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard_conn = True
+            raise
+        finally:
+            if canceller is not None:
+                canceller.detach()
+            self.release_connection(conn, discard=discard_conn)
+
+    def iter_chunks(self, sql_query: str, chunk_rows: int, canceller=None):
+        """Fetches through a named (server-side) cursor, so only one chunk is held client-side at a time."""
+        conn = self.get_connection()
+        discard_conn = False
+        if canceller is not None:
+            canceller.attach(conn.cancel)
+        try:
+            self._set_statement_timeout(conn)
+            with conn.cursor(name=f"hoopsense_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = chunk_rows
+                cursor.execute(sql_query)
+                while True:
+                    rows = cursor.fetchmany(chunk_rows)
+                    description = cursor.description or []
+                    chunk = pd.DataFrame.from_records(rows, columns=[column.name for column in description])
+                    chunk.attrs[TYPE_OIDS_ATTR] = {column.name: column.type_code for column in description}
+                    yield chunk
+                    if len(rows) < chunk_rows:
+                        break
+            conn.rollback()  # Closes the server-side cursor's transaction.
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard_conn = True
+            raise
+        finally:
+            if canceller is not None:
+                canceller.detach()
+            self.release_connection(conn, discard=discard_conn)
+
+    def explain(self, sql_query: str, canceller=None) -> dict:
+        conn = self.get_connection()
+        discard_conn = False
+        if canceller is not None:
+            canceller.attach(conn.cancel)
+        try:
+            self._set_statement_timeout(conn)
+            with conn.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql_query}")
+                plan = cursor.fetchone()[0][0]["Plan"]
+            conn.rollback()
+            return {"total_cost": plan.get("Total Cost"), "plan_rows": plan.get("Plan Rows")}
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard_conn = True
+            raise
+        finally:
+            if canceller is not None:
+                canceller.detach()
+            self.release_connection(conn, discard=discard_conn)
+
+    def is_query_error(self, e: Exception) -> bool:
+        # Connection problems, cancellations and timeouts are OperationalErrors; a rewrite won't fix those.
+        return not isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+
+    def describe_error(self, e: Exception) -> str:
+        """User-facing explanation of a database error, with hints for common LLM mistakes."""
+        db_error_message = f"Database error: {e}. Check SQL syntax and DB connection."
+        if "relation" in str(e).lower() and "does not exist" in str(e).lower():
+            db_error_message += " This often means a table name in the SQL query is incorrect or doesn't exist in your database schema described to the LLM."
+        elif "column" in str(e).lower() and "does not exist" in str(e).lower():
+            db_error_message += " This often means a column name in the SQL query is incorrect for the specified table(s)."
+        return db_error_message
+
+
+class DuckDBParquetBackend(ExecutionBackend):
+    """Runs queries in an embedded DuckDB over the fetcher's partitioned Parquet output (see stats_storage).
+
+    Every (dataset, measure type) becomes a view named like the table stats_loader loads it
+    into (``player_stats``, ``player_stats_advanced``, ...), with the partition keys as
+    columns, so the same SQL runs on either backend. DuckDB may only read files under
+    ``root``, and only single SELECT statements are executed. Views are rebuilt when the
+    files under them change; those changes also drive the per-table versions.
+    """
+
+    name = "duckdb"
+
+    def __init__(self, root: str, base_tables: dict[str, str], threads: int = 0, statement_timeout_ms: int = 0):
+        import duckdb  # Optional dependency, only needed for this backend
+
+        self._duckdb = duckdb
+        self.errors = (duckdb.Error, QueryRejected, StatementTimeout)
+        self.root = os.path.abspath(root)
+        self.base_tables = base_tables
+        self.statement_timeout_ms = statement_timeout_ms
+        self._conn = duckdb.connect(":memory:")
+        if threads:
+            self._conn.execute(f"SET threads = {int(threads)}")
+        self._conn.execute("SET allowed_directories = ?", [[self.root + os.sep]])
+        self._conn.execute("SET enable_external_access = false")
+        self._conn.execute("SET lock_configuration = true")
+        self._views: dict[str, str] = {}  # view name -> signature of the files it reads
+        self._lock = threading.Lock()
+        self.refresh_views()
+
+    def _view_files(self) -> dict[str, tuple[str, list[str]]]:
+        """view name -> (glob over its partitions, Parquet files), from the partition directories on disk."""
+        from stats_loader import table_name_for
+
+        views: dict[str, tuple[str, list[str]]] = {}
+        for dataset, base_table in self.base_tables.items():
+            for values in list_partitions(self.root, dataset):
+                view = table_name_for(base_table, values["measure_type"])
+                pattern = os.path.join(self.root, dataset, "*", "*", f"measure_type={quote(values['measure_type'], safe='')}",
+                                       "*", PARTITION_FILENAME)
+                views.setdefault(view, (pattern, []))[1].append(partition_path(self.root, dataset, **values))
+        return views
+
+    @staticmethod
+    def _signature(files: list[str]) -> str:
+        entries = []
+        for path in sorted(files):
+            stat = os.stat(path)
+            entries.append(f"{path}:{stat.st_size}:{stat.st_mtime_ns}")
+        return hashlib.md5("\n".join(entries).encode("utf-8")).hexdigest()
+
+    def refresh_views(self) -> dict[str, str]:
+        """(Re)creates the views whose files changed and drops those whose files are gone; returns view -> signature."""
+        with self._lock:
+            current = {}
+            for view, (pattern, files) in self._view_files().items():
+                signature = self._signature(files)
+                current[view] = signature
+                if self._views.get(view) == signature:
+                    continue
+                # The glob picks up new partitions at query time; hive partition values are URI-decoded
+                # by DuckDB, and measure_type is implied by the view.
+                hive_types = ", ".join(f"'{column}': 'VARCHAR'" for column in PARTITION_COLUMNS)
+                self._conn.execute(
+                    f'CREATE OR REPLACE VIEW "{view}" AS SELECT * EXCLUDE (measure_type) FROM read_parquet('
+                    f"'{pattern.replace(chr(39), chr(39) * 2)}', hive_partitioning = true, union_by_name = true, "
+                    f"hive_types = {{{hive_types}}})"
+                )
+                logger.info(f"DuckDB view {view} now reads {len(files)} Parquet files.")
+            for view in set(self._views) - set(current):
+                self._conn.execute(f'DROP VIEW IF EXISTS "{view}"')
+            self._views = current
+            return dict(current)
+
+    def fetch_catalog(self) -> dict:
+        self.refresh_views()
+        tables: dict[str, dict] = {}
+        cursor = self._conn.cursor()
+        try:
+            rows = cursor.execute("""
+                SELECT table_name, column_name, data_type, is_nullable
+                FROM information_schema.columns
+                WHERE table_schema = 'main' AND table_name IN (SELECT unnest(?::VARCHAR[]))
+                ORDER BY table_name, ordinal_position
+            """, [sorted(self._views)]).fetchall()
+        finally:
+            cursor.close()
+        for table_name, col_name, data_type, is_nullable in rows:
+            table = tables.setdefault(table_name, {"columns": [], "primary_key": [], "foreign_keys": []})
+            table["columns"].append({"name": col_name, "type": data_type, "nullable": is_nullable != 'NO', "default": None})
+        return dict(sorted(tables.items()))
+
+    def fetch_catalog_checksum(self) -> str:
+        return hashlib.md5(json.dumps(self.fetch_catalog(), sort_keys=True).encode("utf-8")).hexdigest()
+
+    def fetch_table_versions(self, table_names) -> dict:
+        """A number derived from each view's file signature; views that do not exist report version 0."""
+        signatures = self.refresh_views()
+        return {
+            name: int(signatures[name][:15], 16) if name in signatures else 0
+            for name in {name.lower() for name in table_names}
+        }
+
+    def _check_read_only(self, cursor, sql_query: str):
+        statements = cursor.extract_statements(sql_query)
+        if len(statements) != 1 or statements[0].type != self._duckdb.StatementType.SELECT:
+            raise QueryRejected("Only a single SELECT statement can be executed")
+
+    def _start_timeout(self, cursor) -> threading.Timer | None:
+        """DuckDB has no statement_timeout setting; interrupt the cursor from a timer instead."""
+        if not self.statement_timeout_ms:
+            return None
+        timer = threading.Timer(self.statement_timeout_ms / 1000, cursor.interrupt)
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def _check_timeout(self, e: Exception, timer: threading.Timer | None):
+        """Reports an interrupt caused by the statement timeout (rather than a cancellation) as StatementTimeout."""
+        if timer is not None and timer.finished.is_set() and isinstance(e, self._duckdb.InterruptException):
+            raise StatementTimeout(f"Query exceeded the statement timeout of {self.statement_timeout_ms} ms") from e
+
+    def _execute(self, sql_query: str, canceller=None, params: list | None = None):
+        cursor = self._conn.cursor()
+        if canceller is not None:
+            canceller.attach(cursor.interrupt)
+        timer = None
+        try:
+            self._check_read_only(cursor, sql_query)
+            timer = self._start_timeout(cursor)
+            try:
+                return cursor, cursor.execute(sql_query, params), timer
+            except self._duckdb.BinderException as e:
+                if "were altered" not in str(e):
+                    raise
+                # A view's files changed shape (e.g. new stat columns) since it was created.
+                self.refresh_views()
+                return cursor, cursor.execute(sql_query, params), timer
+        except BaseException as e:
+            self._finish(cursor, timer, canceller)
+            self._check_timeout(e, timer)
+            raise
+
+    @staticmethod
+    def _finish(cursor, timer, canceller):
+        if timer is not None:
+            timer.cancel()
+        if canceller is not None:
+            canceller.detach()
+        cursor.close()
+
+    def execute(self, sql_query: str, canceller=None) -> pd.DataFrame:
+        return self._fetch_df(*self._execute(sql_query, canceller), canceller)
+
+    def execute_prepared(self, name: str, sql_query: str, params: list, canceller=None) -> pd.DataFrame:
+        """Binds ``params`` on a fresh cursor; DuckDB cursors do not outlive a query here, so ``name`` is unused."""
+        return self._fetch_df(*self._execute(sql_query, canceller, list(params)), canceller)
+
+    def _fetch_df(self, cursor, result, timer, canceller) -> pd.DataFrame:
+        try:
+            return result.fetch_df()
+        except self._duckdb.Error as e:
+            self._check_timeout(e, timer)
+            raise
+        finally:
+            self._finish(cursor, timer, canceller)
+
+    def iter_chunks(self, sql_query: str, chunk_rows: int, canceller=None):
+        cursor, result, timer = self._execute(sql_query, canceller)
+        try:
+            reader = result.to_arrow_reader(chunk_rows)
+            yielded = False
+            for batch in reader:
+                yielded = True
+                yield batch.to_pandas()
+            if not yielded:
+                yield reader.schema.empty_table().to_pandas()
+        except self._duckdb.Error as e:
+            self._check_timeout(e, timer)
+            raise
+        finally:
+            self._finish(cursor, timer, canceller)
+
+    def explain(self, sql_query: str, canceller=None) -> dict:
+        """DuckDB reports no cost, only the estimated cardinality of the plan's root operator."""
+        cursor = self._conn.cursor()
+        if canceller is not None:
+            canceller.attach(cursor.interrupt)
+        try:
+            self._check_read_only(cursor, sql_query)
+            rows = cursor.execute(f"EXPLAIN (FORMAT JSON) {sql_query}").fetchall()
+        finally:
+            self._finish(cursor, None, canceller)
+        node = json.loads(rows[0][1])[0]
+        estimate = node.get("extra_info", {}).get("Estimated Cardinality")
+        # Projections and sorts keep their input's row count but often report no (or a zero) estimate.
+        while not float(estimate or 0) and node.get("name") in ("PROJECTION", "ORDER_BY") and len(node.get("children", [])) == 1:
+            node = node["children"][0]
+            estimate = node.get("extra_info", {}).get("Estimated Cardinality")
+        return {"total_cost": None, "plan_rows": float(estimate) if estimate not in (None, "") else None}
+
+    def is_query_error(self, e: Exception) -> bool:
+        return not isinstance(e, (StatementTimeout, self._duckdb.InterruptException, self._duckdb.IOException))
+
+    def describe_error(self, e: Exception) -> str:
+        db_error_message = f"Database error: {e}. Check SQL syntax."
+        if isinstance(e, self._duckdb.CatalogException):
+            db_error_message += " This often means a table or column name in the SQL query doesn't exist in the schema described to the LLM."
+        return db_error_message
+
+    def close(self):
+        self._conn.close()
@@ -1,78 +1,354 @@
 import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import datetime
+import importlib
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple
+
 import pandas as pd
-from nba_api.stats.endpoints import LeagueDashPlayerStats, LeagueDashTeamStats
+
+from rate_limit import TokenBucket
+from stats_storage import export_csv, partition_path, write_partition
 
 # --- Configuration ---
+# Defaults for a plain `python scripts/fetch_nba_stats.py`; see --help to ingest a whole matrix.
 SEASON = '2023-24' # Example: '2023-24'
 SEASON_TYPE = 'Regular Season' # Options: 'Regular Season', 'Playoffs', 'Pre Season', 'All Star'
 PER_MODE = 'PerGame' # Options: 'Totals', 'PerGame', 'MinutesPerGame', 'Per48', etc.
 MEASURE_TYPE = 'Base' # Options: 'Base', 'Advanced', 'Misc', 'Four Factors', 'Scoring', etc.
 
+# stats.nba.com throttles aggressive clients; these defaults stay well under its limits.
+DEFAULT_WORKERS = 4
+DEFAULT_REQUESTS_PER_SECOND = 1.0
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 60.0
+DEFAULT_TIMEOUT_SECONDS = 60
+DEFAULT_MAX_AGE_HOURS = 12.0  # Current-season outputs older than this are re-fetched
+
 # Determine the project root directory (one level up from the 'scripts' directory)
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(PROJECT_ROOT, 'data') # Directory to store the CSV files
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data') # Directory to store the fetched datasets
+PARQUET_SUBDIR = 'parquet' # Partitioned Parquet datasets live in data/parquet/<dataset>/...
+OUTPUT_FORMATS = ('parquet', 'csv')
+MANIFEST_FILENAME = '.ingest_manifest.json'
+
+# Database tables that hold each dataset (stats_loader.table_name_for adds a suffix for non-Base measure types).
+PLAYER_STATS_TABLE = 'player_stats'
+TEAM_STATS_TABLE = 'team_stats'
+
+# dataset -> (nba_api endpoint class name, database table)
+DATASETS = {
+    'player': ('LeagueDashPlayerStats', PLAYER_STATS_TABLE),
+    'team': ('LeagueDashTeamStats', TEAM_STATS_TABLE),
+}
+DEFAULT_ENDPOINTS_MODULE = 'nba_api.stats.endpoints'
+
+
+class IngestJob(NamedTuple):
+    dataset: str
+    season: str
+    season_type: str
+    per_mode: str
+    measure_type: str
+
+    @property
+    def label(self) -> str:
+        return f"{self.dataset} {self.season} ({self.season_type} - {self.per_mode} - {self.measure_type})"
+
+
+def _slug(value: str) -> str:
+    return value.replace("-", "_").replace(" ", "_").lower()
+
+
+def output_filename(job: IngestJob) -> str:
+    """CSV name for a job; the default per-mode/measure keeps the original `nba_<dataset>_stats_<season>_<type>.csv` name."""
+    name = f"nba_{job.dataset}_stats_{job.season.replace('-', '_')}_{_slug(job.season_type)}"
+    if (job.per_mode, job.measure_type) != (PER_MODE, MEASURE_TYPE):
+        name += f"_{_slug(job.per_mode)}_{_slug(job.measure_type)}"
+    return f"{name}.csv"
+
+
+def output_paths(job: IngestJob, data_dir: str, formats=('parquet',)) -> list[str]:
+    """Where a job's dataset is written, one path per requested format."""
+    paths = []
+    for fmt in formats:
+        if fmt == 'parquet':
+            paths.append(partition_path(os.path.join(data_dir, PARQUET_SUBDIR), job.dataset, season=job.season,
+                                        season_type=job.season_type, measure_type=job.measure_type, per_mode=job.per_mode))
+        else:
+            paths.append(os.path.join(data_dir, output_filename(job)))
+    return paths
+
+
+def current_season(today: datetime.date | None = None) -> str:
+    """The NBA season in progress (or most recently finished) on ``today``; seasons roll over in October."""
+    today = today or datetime.date.today()
+    start_year = today.year if today.month >= 10 else today.year - 1
+    return f"{start_year}-{(start_year + 1) % 100:02d}"
+
+
+def expand_seasons(specs: list[str]) -> list[str]:
+    """Expands season specs such as '2023-24' or ranges like '2004-05:2023-24' into a list of seasons."""
+    seasons = []
+    for spec in specs:
+        first, _, last = spec.partition(':')
+        start = int(first[:4])
+        end = int(last[:4]) if last else start
+        seasons.extend(f"{year}-{(year + 1) % 100:02d}" for year in range(start, end + 1))
+    return list(dict.fromkeys(seasons))
+
+
+def build_jobs(datasets, seasons, season_types, per_modes, measure_types) -> list[IngestJob]:
+    """Cartesian product of the requested matrix, one job per endpoint call."""
+    return [IngestJob(*combo) for combo in itertools.product(datasets, seasons, season_types, per_modes, measure_types)]
+
+
+def load_endpoints(module_name: str = DEFAULT_ENDPOINTS_MODULE) -> dict:
+    """Maps each dataset to its endpoint class, imported from ``module_name``.
+
+    Pass a local module exposing the same class names (e.g. a stub whose
+    ``get_data_frames()`` returns canned DataFrames) to exercise the ingest offline.
+    """
+    module = importlib.import_module(module_name)
+    return {dataset: getattr(module, class_name) for dataset, (class_name, _) in DATASETS.items()}
+
+
+class IngestManifest:
+    """Records when and what each job's output was fetched from (keyed by its path under data/), so up-to-date jobs can be skipped."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable ingest manifest at {path}: {e}")
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            return self._entries.get(key)
 
-PLAYER_STATS_FILENAME = f'nba_player_stats_{SEASON.replace("-", "_")}_{SEASON_TYPE.replace(" ", "_").lower()}.csv'
-TEAM_STATS_FILENAME = f'nba_team_stats_{SEASON.replace("-", "_")}_{SEASON_TYPE.replace(" ", "_").lower()}.csv'
+    def record(self, key: str, entry: dict):
+        with self._lock:
+            self._entries[key] = entry
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
 
 
-def fetch_and_save_player_stats(season, season_type, per_mode, measure_type, output_path):
-    """Fetches player statistics and saves them to a CSV file."""
-    print(f"Fetching player stats for {season} ({season_type} - {per_mode} - {measure_type})...")
+def is_up_to_date(job: IngestJob, manifest_key: str, paths: list[str], manifest: IngestManifest,
+                  max_age_hours: float = DEFAULT_MAX_AGE_HOURS, today: datetime.date | None = None) -> bool:
+    """Past seasons never change once fetched; the current season is re-fetched after ``max_age_hours``."""
+    entry = manifest.get(manifest_key)
+    if entry is None or not all(os.path.exists(path) for path in paths):
+        return False
+    if job.season != current_season(today):
+        return True
+    return time.time() - entry.get('fetched_at', 0) < max_age_hours * 3600
+
+
+def fetch_with_retries(endpoint_cls, job: IngestJob, rate_limiter: TokenBucket | None = None,
+                       retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF_SECONDS,
+                       timeout: float = DEFAULT_TIMEOUT_SECONDS) -> tuple[pd.DataFrame, int, float]:
+    """Calls the endpoint for one job, retrying failures with full-jitter exponential backoff.
+
+    Returns (DataFrame, attempts, seconds spent waiting on the rate limiter).
+    """
+    limiter_wait = 0.0
+    for attempt in range(1, retries + 2):
+        if rate_limiter is not None:
+            started = time.monotonic()
+            rate_limiter.acquire()
+            limiter_wait += time.monotonic() - started
+        try:
+            endpoint = endpoint_cls(
+                season=job.season,
+                season_type_all_star=job.season_type,
+                per_mode_detailed=job.per_mode,
+                measure_type_detailed_defense=job.measure_type,
+                timeout=timeout,
+            )
+            return endpoint.get_data_frames()[0], attempt, limiter_wait
+        except Exception as e:
+            if attempt > retries:
+                raise
+            delay = random.uniform(0, min(MAX_BACKOFF_SECONDS, backoff * 2 ** (attempt - 1)))
+            print(f"  {job.label}: attempt {attempt} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def save_dataset(df: pd.DataFrame, job: IngestJob, paths: list[str], data_dir: str):
+    """Writes one fetched dataset to each of its output paths (a Parquet partition and/or a CSV export)."""
+    for path in paths:
+        if path.endswith('.parquet'):
+            write_partition(df, os.path.join(data_dir, PARQUET_SUBDIR), job.dataset, season=job.season,
+                            season_type=job.season_type, measure_type=job.measure_type, per_mode=job.per_mode)
+        else:
+            export_csv(df, path)
+
+
+def run_job(job: IngestJob, endpoints: dict, data_dir: str, manifest: IngestManifest,
+            rate_limiter: TokenBucket | None = None, formats=('parquet',), force: bool = False,
+            max_age_hours: float = DEFAULT_MAX_AGE_HOURS, retries: int = DEFAULT_RETRIES,
+            backoff: float = DEFAULT_BACKOFF_SECONDS, timeout: float = DEFAULT_TIMEOUT_SECONDS) -> dict:
+    """Fetches and saves one job unless its output is up to date. Never raises; the outcome is in the result."""
+    paths = output_paths(job, data_dir, formats)
+    manifest_key = os.path.relpath(paths[0], data_dir)
+    result = {"job": job, "output_path": ", ".join(paths), "status": None, "attempts": 0, "rows": 0,
+              "limiter_wait_seconds": 0.0, "seconds": 0.0, "error": None}
+    started = time.perf_counter()
+    if not force and is_up_to_date(job, manifest_key, paths, manifest, max_age_hours):
+        result["status"] = "skipped"
+        return result
     try:
-        player_stats = LeagueDashPlayerStats(
-            season=season,
-            season_type_all_star=season_type,
-            per_mode_detailed=per_mode,
-            measure_type_detailed_defense=measure_type
+        df, result["attempts"], result["limiter_wait_seconds"] = fetch_with_retries(
+            endpoints[job.dataset], job, rate_limiter, retries=retries, backoff=backoff, timeout=timeout
         )
-        df_player_stats = player_stats.get_data_frames()[0]
-        
-        # Ensure the output directory exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        df_player_stats.to_csv(output_path, index=False)
-        print(f"Player stats saved to {output_path}")
-        return True
+        save_dataset(df, job, paths, data_dir)
+        manifest.record(manifest_key, {
+            "fetched_at": time.time(),
+            "rows": len(df),
+            "sha256": hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes()).hexdigest(),
+            "job": job._asdict(),
+        })
+        result["status"] = "fetched"
+        result["rows"] = len(df)
     except Exception as e:
-        print(f"Error fetching or saving player stats: {e}")
-        return False
+        result["status"] = "failed"
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def run_ingest(jobs: list[IngestJob], endpoints: dict | None = None, data_dir: str = DATA_DIR,
+               workers: int = DEFAULT_WORKERS, requests_per_second: float | None = DEFAULT_REQUESTS_PER_SECOND,
+               **job_options) -> list[dict]:
+    """Runs ``jobs`` on a bounded thread pool, sharing one token-bucket rate limiter. Returns per-job results."""
+    endpoints = endpoints if endpoints is not None else load_endpoints()
+    manifest = IngestManifest(os.path.join(data_dir, MANIFEST_FILENAME))
+    rate_limiter = TokenBucket(requests_per_second, capacity=1) if requests_per_second else None
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(run_job, job, endpoints, data_dir, manifest, rate_limiter, **job_options) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            detail = result["error"] if result["status"] == "failed" else f"{result['rows']} rows -> {result['output_path']}"
+            print(f"[{len(results)}/{len(jobs)}] {result['status']:>7} {result['job'].label} "
+                  f"in {result['seconds']:.2f}s" + ("" if result["status"] == "skipped" else f": {detail}"))
+    return results
 
-def fetch_and_save_team_stats(season, season_type, per_mode, measure_type, output_path):
-    """Fetches team statistics and saves them to a CSV file."""
-    print(f"Fetching team stats for {season} ({season_type} - {per_mode} - {measure_type})...")
+
+def print_report(results: list[dict], elapsed: float):
+    """Per-job timings plus totals."""
+    print("\n" + "-"*30 + "\n")
+    print(f"{'status':<8} {'seconds':>8} {'wait':>6} {'tries':>5} {'rows':>6}  job")
+    for result in sorted(results, key=lambda r: r["job"]):
+        print(f"{result['status']:<8} {result['seconds']:>8.2f} {result['limiter_wait_seconds']:>6.2f} "
+              f"{result['attempts']:>5} {result['rows']:>6}  {result['job'].label}")
+    counts = {status: sum(r["status"] == status for r in results) for status in ("fetched", "skipped", "failed")}
+    print(f"\n{len(results)} jobs in {elapsed:.1f}s: {counts['fetched']} fetched, "
+          f"{counts['skipped']} skipped, {counts['failed']} failed.")
+
+
+def load_into_database(jobs: list[IngestJob], data_dir: str) -> bool:
+    """Loads the jobs' Parquet partitions into PostgreSQL with stats_loader."""
+    from stats_loader import connect_from_env, load_from_storage
+    filters = {
+        "season": sorted({job.season for job in jobs}),
+        "season_type": sorted({job.season_type for job in jobs}),
+        "measure_type": sorted({job.measure_type for job in jobs}),
+        "per_mode": sorted({job.per_mode for job in jobs}),
+    }
     try:
-        team_stats = LeagueDashTeamStats(
-            season=season,
-            season_type_all_star=season_type,
-            per_mode_detailed=per_mode,
-            measure_type_detailed_defense=measure_type
-        )
-        df_team_stats = team_stats.get_data_frames()[0]
-        
-        # Ensure the output directory exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        df_team_stats.to_csv(output_path, index=False)
-        print(f"Team stats saved to {output_path}")
-        return True
+        conn = connect_from_env()
+        try:
+            results = load_from_storage(conn, os.path.join(data_dir, PARQUET_SUBDIR),
+                                        {dataset: DATASETS[dataset][1] for dataset in sorted({job.dataset for job in jobs})},
+                                        filters=filters)
+        finally:
+            conn.close()
     except Exception as e:
-        print(f"Error fetching or saving team stats: {e}")
+        print(f"Error loading data into the database: {e}")
         return False
+    loaded = sum(r["status"] == "loaded" for r in results)
+    print(f"Database load: {loaded} of {len(results)} partitions changed.")
+    return all(r["status"] != "failed" for r in results)
 
-if __name__ == "__main__":
-    # Create data directory if it doesn't exist (now relative to project root)
-    if not os.path.exists(DATA_DIR):
-        os.makedirs(DATA_DIR)
-        print(f"Created directory: {DATA_DIR}")
 
-    player_output_file = os.path.join(DATA_DIR, PLAYER_STATS_FILENAME)
-    team_output_file = os.path.join(DATA_DIR, TEAM_STATS_FILENAME)
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch NBA league dashboard stats for a matrix of seasons and stat types.")
+    parser.add_argument('--datasets', nargs='+', choices=sorted(DATASETS), default=['player', 'team'])
+    parser.add_argument('--seasons', nargs='+', default=[SEASON],
+                        help="Seasons such as 2023-24, or inclusive ranges such as 2004-05:2023-24.")
+    parser.add_argument('--season-types', nargs='+', default=[SEASON_TYPE])
+    parser.add_argument('--per-modes', nargs='+', default=[PER_MODE])
+    parser.add_argument('--measure-types', nargs='+', default=[MEASURE_TYPE])
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--format', nargs='+', choices=OUTPUT_FORMATS, default=['parquet'], dest='formats',
+                        help="Partitioned Parquet (default) and/or the original one-CSV-per-job export.")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Concurrent endpoint calls.")
+    parser.add_argument('--requests-per-second', type=float, default=DEFAULT_REQUESTS_PER_SECOND,
+                        help="Token-bucket rate shared by all workers (0 disables throttling).")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES)
+    parser.add_argument('--backoff', type=float, default=DEFAULT_BACKOFF_SECONDS, help="Base delay for jittered exponential backoff.")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT_SECONDS, help="Per-request HTTP timeout in seconds.")
+    parser.add_argument('--max-age-hours', type=float, default=DEFAULT_MAX_AGE_HOURS,
+                        help="Re-fetch current-season outputs older than this; past seasons are fetched once.")
+    parser.add_argument('--force', action='store_true', help="Re-fetch even if outputs are up to date.")
+    parser.add_argument('--endpoints-module', default=DEFAULT_ENDPOINTS_MODULE,
+                        help="Module providing LeagueDashPlayerStats/LeagueDashTeamStats (e.g. a local stub).")
+    parser.add_argument('--load', action='store_true',
+                        help="Afterwards, COPY the fetched Parquet partitions into PostgreSQL (see stats_loader.py).")
+    args = parser.parse_args(argv)
+    if args.load and 'parquet' not in args.formats:
+        parser.error("--load reads the Parquet partitions; add parquet to --format.")
+    return args
 
-    # Fetch and save player stats
-    fetch_and_save_player_stats(SEASON, SEASON_TYPE, PER_MODE, MEASURE_TYPE, player_output_file)
 
-    print("\n" + "-"*30 + "\n")
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    jobs = build_jobs(args.datasets, expand_seasons(args.seasons), args.season_types, args.per_modes, args.measure_types)
+    print(f"Ingesting {len(jobs)} jobs with {args.workers} workers at {args.requests_per_second or 'unlimited'} requests/s...")
+
+    started = time.perf_counter()
+    results = run_ingest(
+        jobs,
+        endpoints=load_endpoints(args.endpoints_module),
+        data_dir=args.data_dir,
+        workers=args.workers,
+        requests_per_second=args.requests_per_second,
+        formats=tuple(args.formats),
+        force=args.force,
+        max_age_hours=args.max_age_hours,
+        retries=args.retries,
+        backoff=args.backoff,
+        timeout=args.timeout,
+    )
+    print_report(results, time.perf_counter() - started)
+
+    loaded = True
+    if args.load:
+        # The loader skips unchanged partitions and bumps the versions of the tables it changed;
+        # without it the database (and so its cached results) is untouched.
+        loaded = load_into_database(jobs, args.data_dir)
 
-    # Fetch and save team stats
-    fetch_and_save_team_stats(SEASON, SEASON_TYPE, PER_MODE, MEASURE_TYPE, team_output_file)
-    
-    print("\nNBA data fetching complete.") 
\ No newline at end of file
+    print("\nNBA data fetching complete.")
+    return 1 if not loaded or any(r["status"] == "failed" for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,404 @@
+import re
+import difflib
+import logging
+import unicodedata
+from collections import Counter, defaultdict
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTITIES = 4  # Player/team slots in the comparison templates
+MAX_SEASONS = 4  # Season slots in the season-list filter
+MAX_LEADERS = 50
+DEFAULT_LEADERS = 10
+MIN_GAMES_FOR_PERCENTAGES = {"Regular Season": 20, "Playoffs": 5}  # Keeps 1-for-1 shooters off percentage leaderboards
+
+# Question phrase -> (column, label). Longer phrases win over the phrases they contain.
+STAT_PHRASES = {
+    "points": ("pts", "Points"), "point": ("pts", "Points"), "ppg": ("pts", "Points"), "scoring": ("pts", "Points"),
+    "scored": ("pts", "Points"), "scorers": ("pts", "Points"), "scorer": ("pts", "Points"),
+    "rebounds": ("reb", "Rebounds"), "rebounding": ("reb", "Rebounds"), "rpg": ("reb", "Rebounds"), "boards": ("reb", "Rebounds"),
+    "offensive rebounds": ("oreb", "Offensive rebounds"), "defensive rebounds": ("dreb", "Defensive rebounds"),
+    "assists": ("ast", "Assists"), "apg": ("ast", "Assists"), "dimes": ("ast", "Assists"),
+    "steals": ("stl", "Steals"), "blocks": ("blk", "Blocks"), "turnovers": ("tov", "Turnovers"), "fouls": ("pf", "Personal fouls"),
+    "minutes": ("min", "Minutes"), "mpg": ("min", "Minutes"), "games played": ("gp", "Games played"),
+    "3pt%": ("fg3_pct", "3PT%"), "3p%": ("fg3_pct", "3PT%"), "3pt percentage": ("fg3_pct", "3PT%"),
+    "three point percentage": ("fg3_pct", "3PT%"), "3-point percentage": ("fg3_pct", "3PT%"),
+    "threes": ("fg3m", "3-pointers made"), "three pointers": ("fg3m", "3-pointers made"), "3-pointers": ("fg3m", "3-pointers made"),
+    "fg%": ("fg_pct", "FG%"), "field goal percentage": ("fg_pct", "FG%"), "shooting percentage": ("fg_pct", "FG%"),
+    "ft%": ("ft_pct", "FT%"), "free throw percentage": ("ft_pct", "FT%"), "free throws": ("ftm", "Free throws made"),
+    "plus minus": ("plus_minus", "Plus-minus"), "plus-minus": ("plus_minus", "Plus-minus"), "+/-": ("plus_minus", "Plus-minus"),
+    "double doubles": ("dd2", "Double-doubles"), "triple doubles": ("td3", "Triple-doubles"),
+    "fantasy points": ("nba_fantasy_pts", "Fantasy points"),
+    "wins": ("w", "Wins"), "losses": ("l", "Losses"), "win percentage": ("w_pct", "Win %"),
+}
+PERCENTAGE_STATS = {"fg_pct", "fg3_pct", "ft_pct", "w_pct"}
+_STAT_RE = re.compile(
+    r"(?<![a-z0-9])(" + "|".join(re.escape(p) for p in sorted(STAT_PHRASES, key=len, reverse=True)) + r")(?![a-z0-9])"
+)
+
+# Qualifiers the templates cannot express; questions using them go to the LLM.
+_UNSUPPORTED_RE = re.compile(
+    r"\b(career|all[- ]time|clutch|home|away|road|against|opponents?|without|when|month|week|game log|"
+    r"last \d+ games|per (?:36|48|100)|rookies?|correlat\w*|relat\w*|trend|distribution|how many|count|sum|ratio|"
+    r"difference|rank\w*|percentile|before|after|since|under|over|above|below|more than|less than|at least|"
+    r"position|guards?|forwards?|centers?|age|older|younger|shots?|quarter|half)\b"
+)
+_LEADERS_RE = re.compile(r"\b(top|leaders?|led|leading|most|highest|best|lowest|fewest|worst|least)\b")
+_ASCENDING_RE = re.compile(r"\b(lowest|fewest|worst|least)\b")
+_TOP_N_RE = re.compile(r"\btop\s+(\d{1,2})\b")
+_TEAMS_RE = re.compile(r"\bteams?\b")
+_PLAYOFFS_RE = re.compile(r"\b(playoffs?|postseason)\b")
+_TOTALS_RE = re.compile(r"\btotals?\b")
+_SEASON_RE = re.compile(r"\b((?:19|20)\d{2})-(\d{2})\b")
+_YEAR_RE = re.compile(r"(?<![\d-])((?:19|20)\d{2})(?![\d-])")
+_RANGE_RE = re.compile(
+    r"\b(?:from|between)\s+((?:19|20)\d{2}(?:-\d{2})?)\s+(?:to|and|through|until)\s+((?:19|20)\d{2}(?:-\d{2})?)\b"
+)
+_LATEST_RE = re.compile(r"\b(?:last|this|latest|current|most recent)\s+season\b")
+_LAST_N_RE = re.compile(r"\b(?:last|past)\s+(\d{1,2})\s+seasons\b")
+
+# Words never treated as (part of) a player or team name.
+_STOPWORDS = set(
+    "a an and or the of in on for by to vs versus compare compared comparison with who whom whose which what show "
+    "me list give tell between from during season seasons year years playoff playoffs postseason regular per game "
+    "games average averages total totals top leader leaders led leading most highest best lowest fewest worst least "
+    "last this latest current recent past is was were are did do does has have had how much many team teams player "
+    "players nba league stats stat statistics percentage s".split()
+) | {word for phrase in STAT_PHRASES for word in re.findall(r"[a-z]+", phrase)}
+
+
+def normalize_name(text: str) -> str:
+    """Lower-case ASCII words only, so "Luka Dončić" and "luka doncic" (or "O'Neal" and "o neal") compare equal."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", " ", text.lower()).strip()
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _season_ending(year: int) -> str:
+    """The NBA season ending in ``year``: 2023 -> '2022-23'."""
+    return f"{year - 1}-{year % 100:02d}"
+
+
+def _season_label(text: str) -> str:
+    return text if "-" in text else _season_ending(int(text))
+
+
+class NamedEntity(NamedTuple):
+    kind: str  # 'player' or 'team'
+    id: int
+    name: str
+    last_season: str
+
+
+class NameIndex:
+    """Player and team names with exact and fuzzy lookup.
+
+    Every entity is indexed under its full name and, where no other entity shares them, its
+    first and last name (players) or nickname and city (teams). One-word names must be
+    capitalized in the question (so "young players" is not Trae Young), and team abbreviations
+    must be written in capitals ("LAL"). Fuzzy lookups first shortlist aliases through a
+    character-trigram index and only compare those (difflib ratio >= ``threshold``).
+    """
+
+    def __init__(self, entities: list[NamedEntity], abbreviations: dict[str, NamedEntity] | None = None, threshold: float = 0.85):
+        self.threshold = threshold
+        self.abbreviations = {abbreviation.upper(): entity for abbreviation, entity in (abbreviations or {}).items()}
+        candidates: dict[str, list[NamedEntity]] = defaultdict(list)
+        for entity in entities:
+            for alias in self._aliases(entity):
+                candidates[alias].append(entity)
+        full_names = {normalize_name(entity.name) for entity in entities}
+        self._full_names = full_names
+        self._aliases_to_entity: dict[str, NamedEntity] = {}
+        for alias, owners in candidates.items():
+            unique = len({(owner.kind, owner.id) for owner in owners}) == 1
+            if alias in full_names or unique:
+                # Namesakes sharing a full name resolve to the most recently active one.
+                self._aliases_to_entity[alias] = max(owners, key=lambda owner: owner.last_season)
+        self._trigram_index: dict[str, list[str]] = defaultdict(list)
+        for alias in self._aliases_to_entity:
+            for trigram in _trigrams(alias):
+                self._trigram_index[trigram].append(alias)
+
+    @staticmethod
+    def _aliases(entity: NamedEntity) -> list[str]:
+        full = normalize_name(entity.name)
+        words = [word for word in full.split() if not word.isdigit()]
+        aliases = [full]
+        if entity.kind == "player" and len(words) > 1:
+            aliases += [word for word in (words[0], words[-1]) if len(word) >= 4 and word not in _STOPWORDS]
+        elif entity.kind == "team" and len(words) > 1:
+            aliases += [words[-1], " ".join(words[:-1])]
+            if len(words) > 2:
+                aliases += [" ".join(words[-2:]), " ".join(words[:-2])]
+        return aliases
+
+    def __len__(self) -> int:
+        return len(self._aliases_to_entity)
+
+    def _fuzzy(self, phrase: str) -> str | None:
+        grams = _trigrams(phrase)
+        shared = Counter(alias for gram in grams for alias in self._trigram_index.get(gram, ()))
+        best, best_ratio = None, self.threshold
+        for alias, count in shared.most_common(10):
+            if count < len(grams) / 2:
+                break
+            ratio = difflib.SequenceMatcher(None, phrase, alias).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = alias, ratio
+        return best
+
+    def find(self, question: str) -> tuple[list[NamedEntity], set[str]]:
+        """Entities named in ``question`` in order of appearance (longest names first), and the words they consumed."""
+        tokens = normalize_name(question).split()
+        capitalized = {normalize_name(word) for word in re.findall(r"\b[A-Z][\w'-]*", question)}
+        used = [False] * len(tokens)
+        found: list[tuple[int, NamedEntity]] = []
+        for n in (4, 3, 2, 1):
+            for i in range(len(tokens) - n + 1):
+                window = tokens[i:i + n]
+                if any(used[i:i + n]) or window[0] in _STOPWORDS or window[-1] in _STOPWORDS:
+                    continue
+                phrase = " ".join(window)
+                alias = phrase if phrase in self._aliases_to_entity else None
+                if alias is None and len(phrase) >= 5:
+                    alias = self._fuzzy(phrase)
+                if alias is None or (n == 1 and alias not in self._full_names and phrase not in capitalized):
+                    continue
+                entity = self._aliases_to_entity[alias]
+                if all(entity != other for _, other in found):
+                    found.append((i, entity))
+                used[i:i + n] = [True] * n
+        for word in re.findall(r"\b[A-Z]{2,4}\b", question):
+            entity = self.abbreviations.get(word)
+            if entity is not None and all(entity != other for _, other in found):
+                found.append((len(tokens), entity))
+                used = [u or t == word.lower() for u, t in zip(used, tokens)]
+        consumed = {token for token, u in zip(tokens, used) if u}
+        return [entity for _, entity in sorted(found, key=lambda item: item[0])], consumed
+
+
+# Base templates: {stat} and {direction} come from whitelists; $1/$2 are season_type/per_mode.
+_BASE_TEMPLATES = {
+    "player_stat": (
+        "player_stats",
+        "SELECT season, player_name, {stat} FROM player_stats WHERE season_type = $1 AND per_mode = $2 "
+        "AND player_id IN ($3, $4, $5, $6){seasons} ORDER BY season, player_name",
+    ),
+    "team_stat": (
+        "team_stats",
+        "SELECT season, team_name, {stat} FROM team_stats WHERE season_type = $1 AND per_mode = $2 "
+        "AND team_id IN ($3, $4, $5, $6){seasons} ORDER BY season, team_name",
+    ),
+    "player_leaders": (
+        "player_stats",
+        "SELECT player_name, team_abbreviation, season, {stat} FROM player_stats WHERE season_type = $1 AND per_mode = $2 "
+        "AND gp >= $3 AND {stat} IS NOT NULL{seasons} ORDER BY {stat} {direction}, player_name LIMIT $4",
+    ),
+    "team_leaders": (
+        "team_stats",
+        "SELECT team_name, season, {stat} FROM team_stats WHERE season_type = $1 AND per_mode = $2 "
+        "AND gp >= $3 AND {stat} IS NOT NULL{seasons} ORDER BY {stat} {direction}, team_name LIMIT $4",
+    ),
+}
+_BASE_PARAMS = {"player_stat": 6, "team_stat": 6, "player_leaders": 4, "team_leaders": 4}
+_SEASON_FILTERS = {
+    "all": "",
+    "latest": " AND season = (SELECT MAX(season) FROM {table} WHERE season_type = $1 AND per_mode = $2)",
+    "last_n": " AND season IN (SELECT DISTINCT season FROM {table} WHERE season_type = $1 AND per_mode = $2 "
+              "ORDER BY season DESC LIMIT ${k0})",
+    "range": " AND season BETWEEN ${k0} AND ${k1}",
+    "list": " AND season IN (${k0}, ${k1}, ${k2}, ${k3})",
+}
+
+
+def _build_templates() -> dict[str, tuple[str, str]]:
+    """name -> (table, SQL with $n placeholders and {stat}/{direction} slots) for every base template x season filter."""
+    templates = {}
+    for base, (table, sql) in _BASE_TEMPLATES.items():
+        k = _BASE_PARAMS[base] + 1
+        for mode, season_filter in _SEASON_FILTERS.items():
+            season_sql = season_filter.format(table=table, k0=k, k1=k + 1, k2=k + 2, k3=k + 3)
+            templates[f"{base}_{mode}"] = (table, sql.replace("{seasons}", season_sql))
+    return templates
+
+
+TEMPLATES = _build_templates()
+
+
+def _sql_literal(value) -> str:
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class TemplateMatch(NamedTuple):
+    template: str
+    stat: str
+    direction: str
+    params: list
+    explanation: str
+    slots: dict
+
+    @property
+    def sql(self) -> str:
+        """The template's SQL with ``$n`` placeholders."""
+        return TEMPLATES[self.template][1].format(stat=self.stat, direction=self.direction)
+
+    @property
+    def statement_name(self) -> str:
+        """Name for the prepared statement: one per template, stat and sort direction."""
+        return f"hoopsense_{self.template}_{self.stat}_{self.direction.lower()}"
+
+    @property
+    def display_sql(self) -> str:
+        """The SQL with the parameters inlined as literals (shown to users and used as the result cache key)."""
+        sql = self.sql
+        for index in range(len(self.params), 0, -1):  # $10 before $1
+            sql = sql.replace(f"${index}", _sql_literal(self.params[index - 1]))
+        return sql
+
+
+class IntentParser:
+    """Recognizes the common question shapes and fills the matching SQL template.
+
+    Handled shapes: one stat for up to MAX_ENTITIES players or teams (optionally over
+    seasons), and player or team leaders on one stat. Anything else (several stats, unknown
+    qualifiers, names the index does not know) returns None and is left to the LLM.
+    """
+
+    def __init__(self, names: NameIndex, columns: dict[str, set[str]], per_modes: set[str]):
+        self.names = names
+        self.columns = columns
+        self.per_modes = per_modes
+
+    def _seasons(self, text: str) -> tuple[str, list, str] | None:
+        """(season filter mode, its parameters, description), or None when the seasons cannot be expressed."""
+        last_n = _LAST_N_RE.search(text)
+        if last_n:
+            return "last_n", [int(last_n.group(1))], f"last {last_n.group(1)} seasons"
+        if _LATEST_RE.search(text):
+            return "latest", [], "latest season"
+        season_range = _RANGE_RE.search(text)
+        if season_range:
+            first, last = (_season_label(part) for part in season_range.groups())
+            return "range", [first, last], f"{first} to {last}"
+        seasons = [f"{start}-{end}" for start, end in _SEASON_RE.findall(text)]
+        seasons += [_season_ending(int(year)) for year in _YEAR_RE.findall(_SEASON_RE.sub(" ", text))]
+        seasons = sorted(set(seasons))
+        if not seasons:
+            return "all", [], "all seasons"
+        if len(seasons) == 1:
+            return "range", [seasons[0], seasons[0]], seasons[0]
+        if len(seasons) > MAX_SEASONS:
+            return None
+        return "list", seasons + [seasons[-1]] * (MAX_SEASONS - len(seasons)), ", ".join(seasons)
+
+    def _has_unknown_names(self, question: str, consumed: set[str]) -> bool:
+        """Capitalized words (after the first) that no entity explains, e.g. a player missing from the data."""
+        for word in re.findall(r"[A-Za-z][\w'.-]*", question)[1:]:
+            if not word[0].isupper() or word.isupper():
+                continue
+            tokens = normalize_name(word).split()
+            if any(token not in consumed and token not in _STOPWORDS for token in tokens):
+                return True
+        return False
+
+    def parse(self, question: str) -> TemplateMatch | None:
+        text = re.sub(r"\s+", " ", question.lower())
+        if _UNSUPPORTED_RE.search(text):
+            return None
+        stats = {STAT_PHRASES[phrase] for phrase in _STAT_RE.findall(text)}
+        if len(stats) != 1:
+            return None
+        (stat, label), = stats
+        season_type = "Playoffs" if _PLAYOFFS_RE.search(text) else "Regular Season"
+        per_mode = "Totals" if _TOTALS_RE.search(text) else "PerGame"
+        if per_mode not in self.per_modes:
+            return None
+        seasons = self._seasons(text)
+        if seasons is None:
+            return None
+        season_mode, season_params, season_text = seasons
+        entities, consumed = self.names.find(question)
+        if self._has_unknown_names(question, consumed):
+            return None
+        players = [entity for entity in entities if entity.kind == "player"]
+        teams = [entity for entity in entities if entity.kind == "team"]
+        direction = "DESC"
+
+        leaders = _LEADERS_RE.search(text)
+        if leaders and entities:
+            # "Who led the Lakers in rebounds?" ranks players within an entity; no template does that.
+            return None
+        if leaders:
+            base = "team_leaders" if _TEAMS_RE.search(text) else "player_leaders"
+            if season_mode == "all":
+                season_mode, season_text = "latest", "latest season"
+            top_n = _TOP_N_RE.search(text)
+            limit = min(int(top_n.group(1)), MAX_LEADERS) if top_n else DEFAULT_LEADERS
+            direction = "ASC" if _ASCENDING_RE.search(text) else "DESC"
+            min_games = MIN_GAMES_FOR_PERCENTAGES.get(season_type, 1) if stat in PERCENTAGE_STATS and base == "player_leaders" else 1
+            params = [season_type, per_mode, min_games, limit]
+            subject = f"{'Lowest' if direction == 'ASC' else 'Top'} {limit} {'teams' if base == 'team_leaders' else 'players'}"
+        elif players and not teams and len(players) <= MAX_ENTITIES:
+            base, chosen = "player_stat", players
+        elif teams and not players and len(teams) <= MAX_ENTITIES:
+            base, chosen = "team_stat", teams
+        else:
+            return None
+        if base.endswith("_stat"):
+            ids = [entity.id for entity in chosen]
+            params = [season_type, per_mode] + ids + [ids[-1]] * (MAX_ENTITIES - len(ids))
+            subject = " vs ".join(entity.name for entity in chosen)
+
+        table = TEMPLATES[f"{base}_{season_mode}"][0]
+        if stat not in self.columns.get(table, ()):
+            return None
+        mode_text = "totals" if per_mode == "Totals" else "per game"
+        explanation = f"{label} ({mode_text}), {subject}, {season_text} ({season_type})."
+        slots = {"stat": stat, "season_type": season_type, "per_mode": per_mode, "seasons": season_text,
+                 "entities": [entity.name for entity in entities]}
+        return TemplateMatch(f"{base}_{season_mode}", stat, direction, params + season_params, explanation, slots)
+
+
+def load_intent_parser(run_query, columns: dict[str, set[str]], threshold: float = 0.85) -> IntentParser | None:
+    """Builds the parser's name index from the stats tables; ``run_query(sql)`` returns a DataFrame.
+
+    Returns None when the player/team tables or their name columns are missing.
+    """
+    player_columns, team_columns = columns.get("player_stats", set()), columns.get("team_stats", set())
+    if not {"player_id", "player_name", "season", "season_type", "per_mode"} <= player_columns:
+        return None
+    entities = [
+        NamedEntity("player", int(row.player_id), row.player_name, row.last_season)
+        for row in run_query(
+            "SELECT player_id, player_name, MAX(season) AS last_season FROM player_stats "
+            "WHERE player_name IS NOT NULL GROUP BY player_id, player_name"
+        ).itertuples(index=False)
+    ]
+    abbreviations = {}
+    if {"team_id", "team_name", "season"} <= team_columns:
+        teams = {
+            int(row.team_id): NamedEntity("team", int(row.team_id), row.team_name, row.last_season)
+            for row in run_query(
+                "SELECT team_id, team_name, MAX(season) AS last_season FROM team_stats "
+                "WHERE team_name IS NOT NULL GROUP BY team_id, team_name"
+            ).itertuples(index=False)
+        }
+        entities.extend(teams.values())
+        if {"team_id", "team_abbreviation"} <= player_columns:
+            abbreviation_rows = run_query(
+                "SELECT DISTINCT team_id, team_abbreviation FROM player_stats WHERE team_abbreviation IS NOT NULL"
+            )
+            abbreviations = {row.team_abbreviation: teams[int(row.team_id)]
+                             for row in abbreviation_rows.itertuples(index=False) if int(row.team_id) in teams}
+    per_modes = set(run_query("SELECT DISTINCT per_mode FROM player_stats")["per_mode"].dropna())
+    names = NameIndex(entities, abbreviations, threshold=threshold)
+    logger.info(f"Intent parser loaded {len(entities)} players/teams ({len(names)} aliases).")
+    return IntentParser(names, columns, per_modes)
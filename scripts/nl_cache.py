@@ -0,0 +1,303 @@
+import os
+import re
+import json
+import math
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Iterator, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Words that carry no meaning for matching near-duplicate phrasings of the same question.
+_STOPWORDS = frozenset("""
+    a an the of in on for to and or by with from at as is are was were be been what whats which who whose
+    how me show tell give list please did does do during per this that his her their its s
+""".split())
+_TOKEN_RE = re.compile(r"[a-z0-9%]+(?:[-./][a-z0-9%]+)*")
+
+
+def normalize_query_text(text: str) -> str:
+    """Canonical form of a question used as the exact-match cache key."""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = text.replace("’", "'").replace("‘", "'").replace("“", '"').replace("”", '"')
+    text = re.sub(r"\s+", " ", text.lower()).strip()
+    return text.rstrip("?!. ")
+
+
+def query_tokens(normalized_text: str) -> frozenset:
+    """Content tokens of a normalized question (stopwords removed)."""
+    return frozenset(t for t in _TOKEN_RE.findall(normalized_text) if t not in _STOPWORDS)
+
+
+def _salient_tokens(tokens: frozenset) -> frozenset:
+    """Tokens that must match exactly for two questions to be interchangeable (seasons, counts, ...)."""
+    return frozenset(t for t in tokens if any(ch.isdigit() for ch in t))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class MemoryCacheBackend:
+    """In-process LRU store with TTL expiry."""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float | None = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return bool(self.ttl_seconds) and now - entry["created_at"] > self.ttl_seconds
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, time.time()):
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: dict):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def purge_fingerprints(self, keep_fingerprint: str) -> int:
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if e["fingerprint"] != keep_fingerprint]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def items(self) -> Iterator[tuple[str, dict]]:
+        now = time.time()
+        with self._lock:
+            snapshot = list(self._entries.items())
+        return ((k, e) for k, e in snapshot if not self._expired(e, now))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteCacheBackend:
+    """On-disk LRU store with TTL expiry that survives process restarts."""
+
+    def __init__(self, path: str, max_entries: int = 1000, ttl_seconds: float | None = None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS nl_sql_cache (
+                cache_key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS nl_sql_cache_lru ON nl_sql_cache (last_access)")
+
+    @staticmethod
+    def _to_entry(fingerprint: str, payload: str, created_at: float) -> dict:
+        entry = json.loads(payload)
+        entry["fingerprint"] = fingerprint
+        entry["created_at"] = created_at
+        return entry
+
+    def get(self, key: str) -> dict | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, payload, created_at FROM nl_sql_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds and now - row[2] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM nl_sql_cache WHERE cache_key = ?", (key,))
+                self.evictions += 1
+                return None
+            self._conn.execute("UPDATE nl_sql_cache SET last_access = ? WHERE cache_key = ?", (now, key))
+        return self._to_entry(*row)
+
+    def set(self, key: str, entry: dict):
+        payload = {k: v for k, v in entry.items() if k not in ("fingerprint", "created_at")}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO nl_sql_cache (cache_key, fingerprint, payload, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, entry["fingerprint"], json.dumps(payload), entry["created_at"], time.time()),
+            )
+            cursor = self._conn.execute(
+                "DELETE FROM nl_sql_cache WHERE cache_key IN ("
+                "  SELECT cache_key FROM nl_sql_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,),
+            )
+            self.evictions += max(cursor.rowcount, 0)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM nl_sql_cache WHERE cache_key = ?", (key,))
+
+    def purge_fingerprints(self, keep_fingerprint: str) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM nl_sql_cache WHERE fingerprint != ?", (keep_fingerprint,))
+            return max(cursor.rowcount, 0)
+
+    def items(self) -> Iterator[tuple[str, dict]]:
+        cutoff = time.time() - self.ttl_seconds if self.ttl_seconds else float("-inf")
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT cache_key, fingerprint, payload, created_at FROM nl_sql_cache WHERE created_at >= ?", (cutoff,)
+            ).fetchall()
+        return ((key, self._to_entry(fp, payload, created)) for key, fp, payload, created in rows)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM nl_sql_cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM nl_sql_cache").fetchone()[0]
+
+
+class TranslationCache:
+    """Caches NL-to-SQL translations keyed by normalized question text.
+
+    Entries are tagged with the schema fingerprint they were generated against and are
+    dropped as soon as a different fingerprint is seen. With ``similarity_threshold`` > 0,
+    a miss on the exact key falls back to the most similar cached question, using ``embed``
+    (cosine similarity) when provided and token Jaccard similarity otherwise. Tokens that
+    contain digits (seasons, game counts) must always match exactly.
+    """
+
+    def __init__(self, backend, similarity_threshold: float = 0.0,
+                 embed: Callable[[str], Sequence[float]] | None = None):
+        self.backend = backend
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed
+        self._fingerprint = None
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "similar_hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _check_fingerprint(self, fingerprint: str):
+        if fingerprint == self._fingerprint:
+            return
+        purged = self.backend.purge_fingerprints(fingerprint)
+        if purged:
+            logger.info(f"Schema fingerprint changed; invalidated {purged} cached NL-to-SQL translations.")
+            self._count("invalidations", purged)
+        self._fingerprint = fingerprint
+
+    def _find_similar(self, normalized: str, fingerprint: str) -> dict | None:
+        tokens = query_tokens(normalized)
+        salient = _salient_tokens(tokens)
+        query_vector = self.embed(normalized) if self.embed else None
+        best, best_score = None, self.similarity_threshold
+        for _, entry in self.backend.items():
+            if entry["fingerprint"] != fingerprint:
+                continue
+            entry_tokens = frozenset(entry.get("tokens", ()))
+            if _salient_tokens(entry_tokens) != salient:
+                continue
+            if query_vector is not None and entry.get("embedding"):
+                score = _cosine(query_vector, entry["embedding"])
+            else:
+                score = _jaccard(tokens, entry_tokens)
+            if score >= best_score:
+                best, best_score = entry, score
+        if best is not None:
+            logger.debug(f"Near-duplicate cache match for '{normalized}' -> '{best['normalized_query']}' (score {best_score:.2f}).")
+        return best
+
+    def get(self, natural_language_query: str, fingerprint: str) -> tuple[str, str | None] | None:
+        """Returns a cached (sql_query, query_explanation) pair, or None on a miss."""
+        self._check_fingerprint(fingerprint)
+        normalized = normalize_query_text(natural_language_query)
+        entry = self.backend.get(normalized)
+        if entry is not None and entry["fingerprint"] != fingerprint:
+            self.backend.delete(normalized)
+            self._count("invalidations")
+            entry = None
+        if entry is not None:
+            self._count("hits")
+            return entry["sql_query"], entry.get("query_explanation")
+        if self.similarity_threshold > 0:
+            entry = self._find_similar(normalized, fingerprint)
+            if entry is not None:
+                self._count("similar_hits")
+                return entry["sql_query"], entry.get("query_explanation")
+        self._count("misses")
+        return None
+
+    def put(self, natural_language_query: str, fingerprint: str, sql_query: str, query_explanation: str | None):
+        """Stores a successful translation."""
+        self._check_fingerprint(fingerprint)
+        normalized = normalize_query_text(natural_language_query)
+        entry = {
+            "normalized_query": normalized,
+            "sql_query": sql_query,
+            "query_explanation": query_explanation,
+            "tokens": sorted(query_tokens(normalized)),
+            "fingerprint": fingerprint,
+            "created_at": time.time(),
+        }
+        if self.similarity_threshold > 0 and self.embed:
+            try:
+                entry["embedding"] = list(self.embed(normalized))
+            except Exception as e:
+                logger.warning(f"Could not embed query for the translation cache: {e}")
+        self.backend.set(normalized, entry)
+        self._count("stores")
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss counters plus current size and evictions."""
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["hits"] + stats["similar_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["similar_hits"]) / lookups, 4) if lookups else 0.0
+        stats["size"] = len(self.backend)
+        stats["evictions"] = self.backend.evictions
+        return stats
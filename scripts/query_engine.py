@@ -1,12 +1,35 @@
 import os
 import json
+import asyncio
+import hashlib
 import logging
+import time
+import queue
+import threading
+import contextvars
 import pandas as pd
 import altair as alt
 import psycopg2
 from psycopg2 import sql
 from dotenv import load_dotenv
 from google.generative_ai import GoogleGenerativeAI
+from db_pool import ConnectionPool
+from nl_cache import MemoryCacheBackend, SqliteCacheBackend, TranslationCache, normalize_query_text
+from result_cache import ResultCache, normalize_sql
+from schema_catalog import SchemaCatalogLoader, render_schema_description
+from schema_retrieval import SchemaIndex, estimate_tokens
+from rate_limit import TokenBucket
+from streaming import StreamingResultCollector
+from summary_stats import SummaryStatsAccumulator
+from dtype_inference import TYPE_OIDS_ATTR, DtypeInferenceEngine
+from chart_reduction import bin_scatter, reduce_line, stratified_sample_scatter, top_k_with_other
+from rollups import RollupRewriter, fetch_rollup_columns, render_preferred_sources
+from execution_backends import DuckDBParquetBackend, ExecutionBackend, PostgresBackend
+from sql_preflight import preflight
+from intent_templates import IntentParser, TemplateMatch, load_intent_parser
+from singleflight import SingleFlight
+from telemetry import INTENT_MATCHES, PROMPT_TOKENS, QUERIES, RESULT_ROWS, enable_opentelemetry, record_cache_lookup, set_attributes, span, trace
+from fetch_nba_stats import DATA_DIR, DATASETS, PARQUET_SUBDIR
 
 # --- Load Environment Variables ---
 # Create a .env file in this directory (scripts/) based on .env.example
@@ -20,22 +43,80 @@ DB_USER = os.getenv("DB_USER", "your_db_user")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "your_db_password")
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "5432")
+EXECUTION_BACKEND = os.getenv("EXECUTION_BACKEND", "postgres").lower()  # Options: 'postgres', 'duckdb' (embedded, over the fetched Parquet)
+DUCKDB_PARQUET_ROOT = os.getenv("DUCKDB_PARQUET_ROOT", os.path.join(DATA_DIR, PARQUET_SUBDIR))
+DUCKDB_THREADS = int(os.getenv("DUCKDB_THREADS", "0"))  # 0 lets DuckDB use every core
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # Seconds to wait for a free connection
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "300"))  # Idle seconds before a surplus connection is recycled
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "3600"))  # Seconds before any connection is recycled
+DB_POOL_PING_INTERVAL = float(os.getenv("DB_POOL_PING_INTERVAL", "10"))  # Ping connections idle longer than this on checkout
+CACHE_DIR = os.getenv("HOOPSENSE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+NL_CACHE_BACKEND = os.getenv("NL_CACHE_BACKEND", "memory").lower()  # Options: 'memory', 'sqlite', 'none'
+NL_CACHE_PATH = os.getenv("NL_CACHE_PATH", os.path.join(CACHE_DIR, 'nl_sql_cache.sqlite3'))
+NL_CACHE_MAX_ENTRIES = int(os.getenv("NL_CACHE_MAX_ENTRIES", "1000"))
+NL_CACHE_TTL_SECONDS = float(os.getenv("NL_CACHE_TTL_SECONDS", "86400"))
+NL_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("NL_CACHE_SIMILARITY_THRESHOLD", "0"))  # 0 disables near-duplicate matching
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))  # 0 disables the result cache
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "3600"))
+RESULT_CACHE_VERSION_CHECK_INTERVAL = float(os.getenv("RESULT_CACHE_VERSION_CHECK_INTERVAL", "5"))  # Seconds between table-version checks
+SCHEMA_CACHE_PATH = os.getenv("SCHEMA_CACHE_PATH", os.path.join(CACHE_DIR, 'schema_catalog.json'))
+SCHEMA_REFRESH_INTERVAL = float(os.getenv("SCHEMA_REFRESH_INTERVAL", "300"))  # Seconds a validated schema is trusted before re-checking its checksum
+SCHEMA_PRUNING_ENABLED = os.getenv("SCHEMA_PRUNING_ENABLED", "true").lower() in ("1", "true", "yes")
+SCHEMA_PRUNING_MAX_TABLES = int(os.getenv("SCHEMA_PRUNING_MAX_TABLES", "6"))  # Tables kept per question (FK join partners may add more)
+ROLLUPS_ENABLED = os.getenv("ROLLUPS_ENABLED", "true").lower() in ("1", "true", "yes")  # Offer the rollup materialized views to the LLM
+ROLLUP_REWRITE_ENABLED = os.getenv("ROLLUP_REWRITE_ENABLED", "false").lower() in ("1", "true", "yes")  # Redirect matching GROUP BY queries to a rollup
+INTENT_TEMPLATES_ENABLED = os.getenv("INTENT_TEMPLATES_ENABLED", "true").lower() in ("1", "true", "yes")  # Answer common question shapes from SQL templates, skipping the LLM
+INTENT_NAME_MATCH_THRESHOLD = float(os.getenv("INTENT_NAME_MATCH_THRESHOLD", "0.85"))  # Minimum similarity (0-1) for a misspelled player/team name to match
+LLM_STAGE_TIMEOUT = float(os.getenv("LLM_STAGE_TIMEOUT", "30"))  # Seconds allowed for NL-to-SQL translation
+SQL_STAGE_TIMEOUT = float(os.getenv("SQL_STAGE_TIMEOUT", "60"))  # Seconds allowed for SQL execution
+CHART_STAGE_TIMEOUT = float(os.getenv("CHART_STAGE_TIMEOUT", "30"))  # Seconds allowed for summary stats + chart generation
+STREAMING_EXECUTION = os.getenv("STREAMING_EXECUTION", "true").lower() in ("1", "true", "yes")  # Server-side cursor + chunked fetch
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "5000"))  # Rows per fetch from the server-side cursor
+STREAM_MAX_ROWS = int(os.getenv("STREAM_MAX_ROWS", "200000"))  # Row budget per query; larger results are truncated
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", str(64 * 1024 * 1024)))  # In-memory byte budget per query
+SQL_PREFLIGHT_ENABLED = os.getenv("SQL_PREFLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")  # Validate and EXPLAIN generated SQL before running it
+SQL_MAX_PLAN_COST = float(os.getenv("SQL_MAX_PLAN_COST", "10000000"))  # Planner cost above which a query is rejected (PostgreSQL); 0 disables
+SQL_MAX_PLAN_ROWS = float(os.getenv("SQL_MAX_PLAN_ROWS", str(STREAM_MAX_ROWS)))  # Estimated result rows above which SQL_PLAN_ROWS_ACTION applies; 0 disables
+SQL_PLAN_ROWS_ACTION = os.getenv("SQL_PLAN_ROWS_ACTION", "limit").lower()  # 'limit' (cap the result with a LIMIT) or 'reject'
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", str(int(SQL_STAGE_TIMEOUT * 1000))))  # Per-statement limit enforced by the backend; 0 disables
+CHART_SAMPLE_ROWS = int(os.getenv("CHART_SAMPLE_ROWS", "5000"))  # Reservoir sample size used for charting streamed results
+PREVIEW_ROWS = int(os.getenv("PREVIEW_ROWS", "5"))
+SUMMARY_STATS_MAX_COLUMNS = int(os.getenv("SUMMARY_STATS_MAX_COLUMNS", "50"))  # Columns summarized per result; the rest only get counts
+SUMMARY_STATS_CELL_BUDGET = int(os.getenv("SUMMARY_STATS_CELL_BUDGET", "2000000"))  # Values fed to the quantile/distinct/top-k sketches; 0 disables the limit
+SUMMARY_STATS_SAMPLE_SIZE = int(os.getenv("SUMMARY_STATS_SAMPLE_SIZE", "1024"))  # Reservoir size per numeric column for approximate quartiles
+SUMMARY_STATS_DISTINCT_K = int(os.getenv("SUMMARY_STATS_DISTINCT_K", "1024"))  # Distinct counts are exact up to this many values, estimated above
+SUMMARY_STATS_TOP_K = int(os.getenv("SUMMARY_STATS_TOP_K", "5"))  # Most frequent values reported per categorical column
+CHART_LINE_MAX_POINTS = int(os.getenv("CHART_LINE_MAX_POINTS", "1000"))  # Points embedded in a line chart spec
+CHART_LINE_METHOD = os.getenv("CHART_LINE_METHOD", "lttb")  # 'lttb' or 'minmax'
+CHART_SCATTER_MAX_POINTS = int(os.getenv("CHART_SCATTER_MAX_POINTS", "2000"))  # Points embedded in a scatter chart spec
+CHART_SCATTER_METHOD = os.getenv("CHART_SCATTER_METHOD", "bin")  # 'bin' (2-D binning) or 'sample' (stratified sample)
+CHART_BAR_TOP_K = int(os.getenv("CHART_BAR_TOP_K", "20"))  # Bars shown before the rest is folded into "Other"
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")  # Identical in-flight questions/SQL share one translation and one execution
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))  # Questions processed at once by the batch API
+BATCH_LLM_REQUESTS_PER_SECOND = float(os.getenv("BATCH_LLM_REQUESTS_PER_SECOND", "5")) or None  # 0 disables throttling
+OTEL_TRACING_ENABLED = os.getenv("OTEL_TRACING_ENABLED", "false").lower() in ("1", "true", "yes")  # Also emit spans via OpenTelemetry (needs opentelemetry-api)
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))  # Stack sampling interval for per-request profiling
 
 # --- Logging Setup ---
-logging.basicConfig(
-    level=LOG_LEVEL,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
 logger = logging.getLogger(__name__)
+if OTEL_TRACING_ENABLED:
+    enable_opentelemetry()
+
+def configure_logging():
+    """Configures root logging at LOG_LEVEL. Called by entry points (this script, service.py), not on import."""
+    logging.basicConfig(
+        level=LOG_LEVEL,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
 
 # --- Gemini Configuration ---
-if not GEMINI_API_KEY:
-    logger.error("GEMINI_API_KEY is not set. Please provide your API key in the .env file.")
-    raise ValueError("GEMINI_API_KEY is not set.")
-genAI = GoogleGenerativeAI(api_key=GEMINI_API_KEY)
-model = genAI.get_generative_model(model_name='gemini-1.5-flash-latest')
+model = None  # Created by get_model() on first use; benchmarks assign a stand-in here
+_model_lock = threading.Lock()
 generation_config = {
     "temperature": 0.2,
     "top_p": 0.95,
@@ -44,8 +125,21 @@ generation_config = {
     "response_mime_type": "application/json",
 }
 
-def get_db_connection():
-    """Establishes and returns a PostgreSQL database connection."""
+def get_model():
+    """Returns the Gemini model client, creating it on first use."""
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                if not GEMINI_API_KEY:
+                    logger.error("GEMINI_API_KEY is not set. Please provide your API key in the .env file.")
+                    raise ValueError("GEMINI_API_KEY is not set.")
+                genAI = GoogleGenerativeAI(api_key=GEMINI_API_KEY)
+                model = genAI.get_generative_model(model_name='gemini-1.5-flash-latest')
+    return model
+
+def _connect_to_postgres():
+    """Opens a new physical PostgreSQL connection. Used by the connection pool."""
     try:
         conn = psycopg2.connect(
             dbname=DB_NAME,
@@ -60,116 +154,432 @@ def get_db_connection():
         logger.error(f"Error connecting to PostgreSQL database: {e}")
         raise
 
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool() -> ConnectionPool:
+    """Returns the process-wide connection pool, creating and warming it on first use."""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                pool = ConnectionPool(
+                    _connect_to_postgres,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    max_overflow=DB_POOL_MAX_OVERFLOW,
+                    timeout=DB_POOL_TIMEOUT,
+                    max_idle=DB_POOL_MAX_IDLE,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    ping_interval=DB_POOL_PING_INTERVAL,
+                )
+                try:
+                    pool.open()
+                except psycopg2.Error as e:
+                    logger.warning(f"Could not pre-fill the connection pool, connections will be opened on demand: {e}")
+                _db_pool = pool
+    return _db_pool
+
+def get_db_connection():
+    """Checks out a PostgreSQL connection from the pool. Return it with release_db_connection()."""
+    with span("db.connect"):
+        return get_db_pool().getconn()
+
+def release_db_connection(conn, discard: bool = False):
+    """Returns a connection obtained from get_db_connection() to the pool."""
+    get_db_pool().putconn(conn, discard=discard or conn.closed)
+
+def db_connection_info(conn) -> dict:
+    """Scratch space of a connection obtained from get_db_connection(), kept until the physical connection closes."""
+    return get_db_pool().connection_info(conn)
+
+def get_db_pool_metrics() -> dict:
+    """Returns usage counters (checkouts, waits, overflow, ...) for the connection pool."""
+    return get_db_pool().metrics()
+
+EXECUTION_BACKENDS = ("postgres", "duckdb")
+
+_execution_backends: dict[str, ExecutionBackend] = {}
+_execution_backends_lock = threading.Lock()
+
+# Backend chosen for the current request (see process_nl_query_async); EXECUTION_BACKEND otherwise.
+_selected_backend: contextvars.ContextVar[str | None] = contextvars.ContextVar("_selected_backend", default=None)
+
+def _create_execution_backend(name: str) -> ExecutionBackend:
+    if name == "duckdb":
+        base_tables = {dataset: table for dataset, (_, table) in DATASETS.items()}
+        return DuckDBParquetBackend(DUCKDB_PARQUET_ROOT, base_tables, threads=DUCKDB_THREADS,
+                                    statement_timeout_ms=SQL_STATEMENT_TIMEOUT_MS)
+    return PostgresBackend(get_db_connection, release_db_connection, statement_timeout_ms=SQL_STATEMENT_TIMEOUT_MS,
+                           connection_info=db_connection_info)
+
+def get_execution_backend(name: str | None = None) -> ExecutionBackend:
+    """Returns the named backend, else the one selected for this request, else EXECUTION_BACKEND (created lazily)."""
+    name = (name or _selected_backend.get() or EXECUTION_BACKEND).lower()
+    if name not in EXECUTION_BACKENDS:
+        raise ValueError(f"Unknown execution backend {name!r}; expected one of {', '.join(EXECUTION_BACKENDS)}.")
+    backend = _execution_backends.get(name)
+    if backend is None:
+        with _execution_backends_lock:
+            backend = _execution_backends.get(name)
+            if backend is None:
+                backend = _execution_backends[name] = _create_execution_backend(name)
+                logger.info(f"Execution backend '{name}' ready.")
+    return backend
+
+_schema_loaders: dict[str, SchemaCatalogLoader] = {}
+_schema_loaders_lock = threading.Lock()
+
+def _get_schema_loader(backend: ExecutionBackend) -> SchemaCatalogLoader:
+    loader = _schema_loaders.get(backend.name)
+    if loader is None:
+        with _schema_loaders_lock:
+            loader = _schema_loaders.get(backend.name)
+            if loader is None:
+                root, extension = os.path.splitext(SCHEMA_CACHE_PATH)
+                loader = _schema_loaders[backend.name] = SchemaCatalogLoader(
+                    backend.fetch_catalog_checksum,
+                    backend.fetch_catalog,
+                    cache_path=SCHEMA_CACHE_PATH if backend.name == "postgres" else f"{root}_{backend.name}{extension}",
+                    refresh_interval=SCHEMA_REFRESH_INTERVAL,
+                )
+    return loader
+
+def get_schema_catalog(force_refresh: bool = False) -> dict | None:
+    """Returns the current backend's structured schema catalog (loaded lazily, cached in memory and on disk)."""
+    return _get_schema_loader(get_execution_backend()).get(force_refresh=force_refresh)
+
+_schema_description_cache = {"fingerprint": None, "description": None}
+
+def get_database_schema_description() -> str:
+    """Returns the schema overview for the LLM prompt, rendering it only when the catalog changes."""
+    catalog = get_schema_catalog()
+    if catalog is None:
+        return "Error fetching schema: Could not connect or query information_schema." # Fallback schema
+    if _schema_description_cache["fingerprint"] != catalog["fingerprint"]:
+        description = render_schema_description(catalog)
+        logger.debug(f"Dynamically Fetched Schema for Prompt:\n{description}")
+        _schema_description_cache.update(fingerprint=catalog["fingerprint"], description=description)
+    return _schema_description_cache["description"]
+
+_rollup_cache = {"loaded_at": None, "columns": {}, "rewriter": None}
+_rollup_cache_lock = threading.Lock()
+
+def get_rollup_columns() -> dict:
+    """Columns of the populated rollup materialized views (see rollups.py), re-read every SCHEMA_REFRESH_INTERVAL."""
+    if not ROLLUPS_ENABLED or get_execution_backend().name != "postgres":
+        return {}
+    loaded_at = _rollup_cache["loaded_at"]
+    if loaded_at is None or time.monotonic() - loaded_at > SCHEMA_REFRESH_INTERVAL:
+        with _rollup_cache_lock:
+            if _rollup_cache["loaded_at"] is loaded_at:
+                try:
+                    conn = get_db_connection()
+                    try:
+                        columns = fetch_rollup_columns(conn)
+                    finally:
+                        release_db_connection(conn)
+                except Exception as e:
+                    logger.warning(f"Could not read the rollup catalog: {e}")
+                    columns = _rollup_cache["columns"]
+                _rollup_cache.update(loaded_at=time.monotonic(), columns=columns, rewriter=RollupRewriter(columns))
+    return _rollup_cache["columns"]
+
+def rewrite_with_rollups(sql_query: str) -> tuple[str, str | None]:
+    """Returns (sql, rollup name): the query redirected to a rollup when ROLLUP_REWRITE_ENABLED and one answers it exactly."""
+    if not ROLLUP_REWRITE_ENABLED or not get_rollup_columns():
+        return sql_query, None
+    return _rollup_cache["rewriter"].rewrite(sql_query)
+
+_intent_parsers: dict[str, dict] = {}  # backend name -> {"checked_at", "key", "parser"}
+_intent_parsers_lock = threading.Lock()
+_INTENT_TABLES = ("player_stats", "team_stats")
+
+def get_intent_parser() -> IntentParser | None:
+    """The current backend's template intent parser (see intent_templates.py); None if disabled or unavailable.
+
+    Its name index is rebuilt when the schema or the player/team tables change, checked at
+    most every SCHEMA_REFRESH_INTERVAL.
+    """
+    if not INTENT_TEMPLATES_ENABLED:
+        return None
+    backend = get_execution_backend()
+    state = _intent_parsers.get(backend.name)
+    if state is None or time.monotonic() - state["checked_at"] > SCHEMA_REFRESH_INTERVAL:
+        with _intent_parsers_lock:
+            if _intent_parsers.get(backend.name) is state:
+                parser, key = (state["parser"], state["key"]) if state else (None, None)
+                try:
+                    columns = get_known_columns()
+                    new_key = (get_schema_fingerprint(), tuple(sorted(backend.fetch_table_versions(_INTENT_TABLES).items())))
+                    if columns is None:
+                        parser = None
+                    elif new_key != key:
+                        with span("intent_index"):
+                            parser = load_intent_parser(backend.execute, columns, threshold=INTENT_NAME_MATCH_THRESHOLD)
+                    key = new_key
+                except Exception as e:
+                    logger.warning(f"Could not load the intent parser, questions go to the LLM meanwhile: {e}")
+                    key = None
+                state = _intent_parsers[backend.name] = {"checked_at": time.monotonic(), "key": key, "parser": parser}
+            else:
+                state = _intent_parsers[backend.name]
+    return state["parser"]
+
+def match_intent_template(natural_language_query: str) -> TemplateMatch | None:
+    """The SQL template answering the question, or None to ask the LLM; hits and misses feed INTENT_MATCHES."""
+    with span("intent_match") as current:
+        parser = get_intent_parser()
+        match = parser.parse(natural_language_query) if parser is not None else None
+        current.set(template=match.template if match else "none")
+    INTENT_MATCHES.inc(template=match.template if match else "none")
+    return match
+
+_schema_index_cache = {"fingerprint": None, "index": None}
+
+def get_schema_context(natural_language_query: str) -> str:
+    """Schema overview for one question: only relevant tables/columns when pruning is enabled, plus the rollups."""
+    full_description = get_database_schema_description()
+    catalog = get_schema_catalog()
+    if catalog is None:
+        return full_description
+    preferred_sources = render_preferred_sources(get_rollup_columns())
+    if preferred_sources:
+        full_description = f"{preferred_sources}\n{full_description}"
+    if not SCHEMA_PRUNING_ENABLED:
+        return full_description
+    if _schema_index_cache["fingerprint"] != catalog["fingerprint"]:
+        _schema_index_cache.update(fingerprint=catalog["fingerprint"], index=SchemaIndex(catalog))
+    pruned = _schema_index_cache["index"].render(natural_language_query, max_tables=SCHEMA_PRUNING_MAX_TABLES)
+    if pruned is None:
+        logger.info("No schema elements matched the question; using the full schema.")
+        return full_description
+    return f"{preferred_sources}\n{pruned}" if preferred_sources else pruned
+
 def fetch_database_schema_dynamically() -> str:
-    """Fetches schema information (tables, columns, types) from the PostgreSQL database."""
-    schema_parts = ["Database Schema Overview (Dynamically Fetched):\n"]
-    conn = None
+    """Fetches schema information (tables, columns, types) from the PostgreSQL database, bypassing caches."""
+    catalog = get_schema_catalog(force_refresh=True)
+    if catalog is None:
+        return "Error fetching schema: Could not connect or query information_schema." # Fallback schema
+    logger.info("Successfully fetched database schema.")
+    return render_schema_description(catalog)
+
+def __getattr__(name: str):
+    # DATABASE_SCHEMA_DESCRIPTION used to be computed at import time; it is now resolved on first access.
+    if name == "DATABASE_SCHEMA_DESCRIPTION":
+        return get_database_schema_description()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_schema_fingerprint() -> str:
+    """Short hash identifying the schema the LLM sees; changes whenever the schema does."""
+    catalog = get_schema_catalog()
+    fingerprint = f"{get_execution_backend().name}:{catalog['fingerprint'] if catalog else ''}"
+    # The rollups are part of what the LLM sees, so translations made before they existed are not reused.
+    fingerprint += "".join(f"|{name}:{','.join(sorted(columns))}" for name, columns in sorted(get_rollup_columns().items()))
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()[:16]
+
+_known_columns_cache = {"fingerprint": None, "columns": None}
+
+def get_known_columns() -> dict[str, set[str]] | None:
+    """table -> lower-case column names generated SQL may read (catalog tables plus rollups); None without a schema."""
+    catalog = get_schema_catalog()
+    if catalog is None:
+        return None
+    fingerprint = get_schema_fingerprint()
+    if _known_columns_cache["fingerprint"] != fingerprint:
+        columns = {name.lower(): {column["name"].lower() for column in table["columns"]} for name, table in catalog["tables"].items()}
+        columns.update((name, {column.lower() for column in rollup_columns}) for name, rollup_columns in get_rollup_columns().items())
+        _known_columns_cache.update(fingerprint=fingerprint, columns=columns)
+    return _known_columns_cache["columns"]
+
+def preflight_sql(sql_query: str) -> tuple[str, dict, str | None]:
+    """Checks generated SQL before it runs (see sql_preflight.preflight); returns (sql to run, info, rejection reason).
+
+    SQL the backend cannot plan is rejected with the backend's explanation. If EXPLAIN fails
+    for other reasons (connection trouble, timeouts), the query passes unchanged and
+    execution reports the problem.
+    """
+    backend = get_execution_backend()
+    canceller = _active_query_canceller.get()
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Get table names
-        cursor.execute("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public' AND table_type = 'BASE TABLE'
-            ORDER BY table_name;
-        """)
-        tables = cursor.fetchall()
-
-        for i, (table_name,) in enumerate(tables):
-            schema_parts.append(f"{i+1}. `{table_name}` table:")
-            
-            # Get columns for each table
-            cursor.execute("""
-                SELECT column_name, data_type, is_nullable, column_default
-                FROM information_schema.columns
-                WHERE table_schema = 'public' AND table_name = %s
-                ORDER BY ordinal_position;
-            """, (table_name,))
-            columns = cursor.fetchall()
-            for col_name, data_type, is_nullable, col_default in columns:
-                col_desc = f"    *   `{col_name}` ({data_type.upper()})"
-                if is_nullable == 'NO':
-                    col_desc += ", NOT NULL"
-                if col_default:
-                    col_desc += f", DEFAULT {col_default}"
-                schema_parts.append(col_desc)
-            
-            # Get primary keys for the table
-            cursor.execute("""
-                SELECT kcu.column_name
-                FROM information_schema.table_constraints tc
-                JOIN information_schema.key_column_usage kcu 
-                    ON tc.constraint_name = kcu.constraint_name AND tc.table_schema = kcu.table_schema
-                WHERE tc.constraint_type = 'PRIMARY KEY' AND tc.table_name = %s AND tc.table_schema = 'public';
-            """, (table_name,))
-            pk_columns = [row[0] for row in cursor.fetchall()]
-            if pk_columns:
-                schema_parts.append(f"        Primary Key(s): ({', '.join(pk_columns)})")
-
-            # Get foreign keys for the table
-            cursor.execute("""
-                SELECT 
-                    kcu.column_name, 
-                    ccu.table_name AS foreign_table_name,
-                    ccu.column_name AS foreign_column_name 
-                FROM information_schema.table_constraints AS tc 
-                JOIN information_schema.key_column_usage AS kcu
-                    ON tc.constraint_name = kcu.constraint_name AND tc.table_schema = kcu.table_schema
-                JOIN information_schema.constraint_column_usage AS ccu
-                    ON ccu.constraint_name = tc.constraint_name AND ccu.table_schema = tc.table_schema
-                WHERE tc.constraint_type = 'FOREIGN KEY' AND tc.table_name=%s AND tc.table_schema = 'public';
-            """, (table_name,))
-            fk_constraints = cursor.fetchall()
-            if fk_constraints:
-                schema_parts.append("        Foreign Key(s):")
-                for col, f_table, f_col in fk_constraints:
-                     schema_parts.append(f"            `{col}` REFERENCES `{f_table}`(`{f_col}`)")
-            schema_parts.append("") # Add a newline for readability
-
-        cursor.close()
-        logger.info("Successfully fetched database schema.")
-        # Add general advice for Gemini
-        schema_parts.append("General SQL Generation Guidelines:")
-        schema_parts.append("- Prioritize PostgreSQL compatible SQL.")
-        schema_parts.append("- Use table aliases for clarity if joining multiple tables.")
-        schema_parts.append("- For percentage calculations (e.g., 3PT%), if not directly available, calculate using appropriate fields (e.g., (SUM(fg3m) * 100.0 / SUM(fg3a)) AS three_point_percentage). Handle potential division by zero if necessary.")
-        schema_parts.append("- Pay close attention to data types for comparisons, aggregations, and functions.")
-        return "\n".join(schema_parts)
-    except psycopg2.Error as e:
-        logger.error(f"Error fetching database schema: {e}")
-        return f"Error fetching schema: Could not connect or query information_schema. {e}" # Fallback schema
-    finally:
-        if conn:
-            conn.close()
+        with span("preflight") as current:
+            checked_sql, info, rejection = preflight(
+                sql_query, get_known_columns(), lambda sql_text: backend.explain(sql_text, canceller=canceller),
+                SQL_MAX_PLAN_COST, SQL_MAX_PLAN_ROWS, SQL_PLAN_ROWS_ACTION
+            )
+            current.set(plan_rows=info["plan_rows"], row_limit=info["row_limit"], rejected=bool(rejection))
+        return checked_sql, info, rejection
+    except backend.errors as e:
+        info = {"plan_cost": None, "plan_rows": None, "row_limit": None}
+        if backend.is_query_error(e):
+            return sql_query, info, backend.describe_error(e)
+        logger.warning(f"Skipping the EXPLAIN check for SQL: '{sql_query}'. Reason: {e}")
+        return sql_query, info, None
+
+def _schema_is_available() -> bool:
+    return get_schema_catalog() is not None
+
+_translation_caches: dict[str, TranslationCache] = {}
+_translation_cache_lock = threading.Lock()
+
+def get_translation_cache(backend: ExecutionBackend | None = None) -> TranslationCache | None:
+    """Returns the backend's NL-to-SQL translation cache configured by NL_CACHE_*, or None if disabled.
+
+    Each backend has its own cache: the schema fingerprint includes the backend, and a cache
+    drops every entry made under another fingerprint.
+    """
+    if NL_CACHE_BACKEND == "none":
+        return None
+    backend = backend or get_execution_backend()
+    cache = _translation_caches.get(backend.name)
+    if cache is None:
+        with _translation_cache_lock:
+            cache = _translation_caches.get(backend.name)
+            if cache is None:
+                if NL_CACHE_BACKEND == "sqlite":
+                    root, extension = os.path.splitext(NL_CACHE_PATH)
+                    path = NL_CACHE_PATH if backend.name == "postgres" else f"{root}_{backend.name}{extension}"
+                    storage = SqliteCacheBackend(path, max_entries=NL_CACHE_MAX_ENTRIES, ttl_seconds=NL_CACHE_TTL_SECONDS)
+                else:
+                    storage = MemoryCacheBackend(max_entries=NL_CACHE_MAX_ENTRIES, ttl_seconds=NL_CACHE_TTL_SECONDS)
+                cache = _translation_caches[backend.name] = TranslationCache(storage, similarity_threshold=NL_CACHE_SIMILARITY_THRESHOLD)
+                logger.info(f"NL-to-SQL translation cache enabled for {backend.name} ({NL_CACHE_BACKEND} backend).")
+    return cache
+
+def _lookup_cached_translation(natural_language_query: str) -> tuple[TranslationCache | None, str | None, tuple | None]:
+    """Returns (cache, schema fingerprint, cached translation or None)."""
+    cache = get_translation_cache() if _schema_is_available() else None
+    if cache is None:
+        return None, None, None
+    fingerprint = get_schema_fingerprint()
+    cached = cache.get(natural_language_query, fingerprint)
+    record_cache_lookup("translation", cached is not None)
+    if cached is not None:
+        logger.info(f"Translation cache hit for query: '{natural_language_query}'")
+    return cache, fingerprint, cached
 
-DATABASE_SCHEMA_DESCRIPTION = fetch_database_schema_dynamically()
-logger.debug(f"Dynamically Fetched Schema for Prompt:\n{DATABASE_SCHEMA_DESCRIPTION}")
+# Concurrent identical requests wait for the one in flight instead of repeating its work.
+_translation_flight = SingleFlight("translation")
+_sql_flight = SingleFlight("sql")
+
+def get_single_flight_stats() -> dict:
+    """Leaders, coalesced waiters, waiter timeouts and in-flight keys per stage."""
+    return {"translation": _translation_flight.stats(), "sql": _sql_flight.stats()}
+
+def _translation_flight_key(natural_language_query: str) -> tuple:
+    return get_execution_backend().name, normalize_query_text(natural_language_query)
 
 def get_nl_to_sql(natural_language_query: str) -> tuple[str | None, str | None]:
-    """Converts natural language query to SQL using Gemini."""
+    """Converts natural language query to SQL, serving repeated questions from the translation cache.
+
+    Concurrent calls for the same question share one translation; a waiting caller gives up
+    after LLM_STAGE_TIMEOUT.
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return _get_nl_to_sql(natural_language_query)
+    try:
+        return _translation_flight.do(_translation_flight_key(natural_language_query),
+                                      lambda: _get_nl_to_sql(natural_language_query), timeout=LLM_STAGE_TIMEOUT)
+    except TimeoutError:
+        return None, f"Timed out after {LLM_STAGE_TIMEOUT:g}s waiting for the identical question already being translated."
+
+def _get_nl_to_sql(natural_language_query: str) -> tuple[str | None, str | None]:
+    cache, fingerprint, cached = _lookup_cached_translation(natural_language_query)
+    if cached is not None:
+        return cached
+
+    sql_query, query_explanation = _generate_sql_with_llm(natural_language_query)
+    if cache is not None and sql_query:
+        cache.put(natural_language_query, fingerprint, sql_query, query_explanation)
+    return sql_query, query_explanation
+
+async def get_nl_to_sql_async(natural_language_query: str, rate_limiter: TokenBucket | None = None) -> tuple[str | None, str | None]:
+    """Async variant of get_nl_to_sql() that awaits Gemini instead of blocking a thread on it.
+
+    ``rate_limiter`` throttles actual Gemini calls; translation cache hits are not throttled.
+    Concurrent calls for the same question share one translation (cancelled once no caller
+    waits for it any more).
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return await _get_nl_to_sql_async(natural_language_query, rate_limiter)
+    return await _translation_flight.do_async(_translation_flight_key(natural_language_query),
+                                              lambda: _get_nl_to_sql_async(natural_language_query, rate_limiter))
+
+async def _get_nl_to_sql_async(natural_language_query: str, rate_limiter: TokenBucket | None = None) -> tuple[str | None, str | None]:
+    cache, fingerprint, cached = await asyncio.to_thread(_lookup_cached_translation, natural_language_query)
+    if cached is not None:
+        return cached
+
+    prompt = await asyncio.to_thread(_build_sql_prompt, natural_language_query)
+    sql_query, query_explanation = await _generate_sql_with_llm_async(prompt, rate_limiter)
+    if cache is not None and sql_query:
+        await asyncio.to_thread(cache.put, natural_language_query, fingerprint, sql_query, query_explanation)
+    return sql_query, query_explanation
+
+async def repair_nl_to_sql_async(natural_language_query: str, rejected_sql: str, reason: str,
+                                 rate_limiter: TokenBucket | None = None) -> tuple[str | None, str | None]:
+    """Asks Gemini once more, showing it the SQL that failed pre-flight and why. The result is not cached here."""
+    feedback = f"""
+    A previous answer to this question was rejected before execution.
+    Rejected SQL: {rejected_sql}
+    Reason: {reason}
+    Write a corrected query that fixes this problem and only uses tables and columns from the schema above.
+    """
+    prompt = await asyncio.to_thread(_build_sql_prompt, natural_language_query, feedback)
+    return await _generate_sql_with_llm_async(prompt, rate_limiter)
+
+async def _generate_sql_with_llm_async(prompt: str, rate_limiter: TokenBucket | None = None) -> tuple[str | None, str | None]:
+    if rate_limiter is not None:
+        with span("llm.rate_limit"):
+            await rate_limiter.acquire_async()
+    try:
+        with span("llm") as current:
+            response = await get_model().generate_content_async(
+                prompt,
+                generation_config=generation_config
+            )
+            current.set(prompt_chars=len(prompt), response_chars=len(response.text))
+        return _parse_llm_response(response.text)
+    except Exception as e:
+        logger.error(f"Error calling Gemini API: {e}", exc_info=True)
+        return None, f"Error interacting with LLM: {e}"
+
+def _store_translation(natural_language_query: str, sql_query: str, query_explanation: str | None):
+    cache = get_translation_cache() if _schema_is_available() else None
+    if cache is not None:
+        cache.put(natural_language_query, get_schema_fingerprint(), sql_query, query_explanation)
+
+def _build_sql_prompt(natural_language_query: str, feedback: str = "") -> str:
+    """Builds the NL-to-SQL prompt around the (pruned) schema context; ``feedback`` is added after the question."""
+    with span("schema_context"):
+        schema_context = get_schema_context(natural_language_query)
     prompt = f"""
     Given the following database schema:
-    {DATABASE_SCHEMA_DESCRIPTION}
+    {schema_context}
 
     Convert the following natural language basketball question into a syntactically correct PostgreSQL query. 
     Return ONLY a JSON object containing two keys: "sql_query" (the generated SQL string) and "query_explanation" (a brief natural language explanation of what the SQL query is trying to achieve).
     Do not include any other text, greetings, or markdown formatting outside of this JSON object.
 
     Natural Language Question: "{natural_language_query}"
-
+    {feedback}
     JSON Output:
     """
+    full_schema_tokens = estimate_tokens(get_database_schema_description())
+    prompt_tokens = estimate_tokens(prompt)
+    PROMPT_TOKENS.observe(prompt_tokens)
+    set_attributes(prompt_tokens=prompt_tokens)
+    logger.info(
+        f"Prompt size: ~{prompt_tokens} tokens "
+        f"(~{prompt_tokens - estimate_tokens(schema_context) + full_schema_tokens} before schema pruning)."
+    )
     logger.debug(f"Sending following prompt to Gemini:\n{prompt}")
+    return prompt
+
+def _parse_llm_response(response_text: str) -> tuple[str | None, str | None]:
+    """Extracts (sql_query, query_explanation) from Gemini's JSON answer."""
+    logger.debug(f"Raw Gemini response text: {response_text}")
     try:
-        response = model.generate_content(
-            prompt,
-            generation_config=generation_config
-        )
-        response_text = response.text
-        logger.debug(f"Raw Gemini response text: {response_text}")
-        
         if response_text.strip().startswith("```json"):
             response_text = response_text.strip()[7:-3].strip()
         elif response_text.strip().startswith("```"):
@@ -178,7 +588,7 @@ def get_nl_to_sql(natural_language_query: str) -> tuple[str | None, str | None]:
         data = json.loads(response_text)
         sql_query = data.get("sql_query")
         query_explanation = data.get("query_explanation")
-        
+
         if not sql_query:
             logger.warning("Gemini did not return an SQL query in the expected JSON structure.")
             return None, "Gemini did not return an SQL query."
@@ -186,81 +596,387 @@ def get_nl_to_sql(natural_language_query: str) -> tuple[str | None, str | None]:
         logger.debug(f"Generated SQL: {sql_query}")
         return sql_query, query_explanation
     except json.JSONDecodeError as e:
-        logger.error(f"Error decoding Gemini JSON response: {e}. Raw response: \"{response_text if 'response_text' in locals() else 'N/A'}\"")
-        return None, f"Error decoding LLM response: {e}. Raw output: {response_text if 'response_text' in locals() else 'N/A'}"
+        logger.error(f"Error decoding Gemini JSON response: {e}. Raw response: \"{response_text}\"")
+        return None, f"Error decoding LLM response: {e}. Raw output: {response_text}"
+
+def _generate_sql_with_llm(natural_language_query: str) -> tuple[str | None, str | None]:
+    """Converts natural language query to SQL using Gemini."""
+    prompt = _build_sql_prompt(natural_language_query)
+    try:
+        with span("llm") as current:
+            response = get_model().generate_content(
+                prompt,
+                generation_config=generation_config
+            )
+            current.set(prompt_chars=len(prompt), response_chars=len(response.text))
+        return _parse_llm_response(response.text)
     except Exception as e:
         logger.error(f"Error calling Gemini API: {e}", exc_info=True)
         return None, f"Error interacting with LLM: {e}"
 
-def execute_sql_query(sql_query: str) -> tuple[pd.DataFrame | None, str | None]:
-    """Executes the SQL query against the PostgreSQL database and returns a DataFrame."""
-    conn = None
+_result_caches: dict[str, ResultCache] = {}
+_result_cache_lock = threading.Lock()
+
+def get_result_cache(backend: ExecutionBackend | None = None) -> ResultCache | None:
+    """Returns the backend's SQL result cache configured by RESULT_CACHE_*, or None if disabled.
+
+    Entries are invalidated by the per-table versions the backend reports (bumped by the ingest
+    scripts for PostgreSQL, derived from the Parquet files for DuckDB).
+    """
+    if RESULT_CACHE_MAX_BYTES <= 0:
+        return None
+    backend = backend or get_execution_backend()
+    cache = _result_caches.get(backend.name)
+    if cache is None:
+        with _result_cache_lock:
+            cache = _result_caches.get(backend.name)
+            if cache is None:
+                cache = _result_caches[backend.name] = ResultCache(
+                    RESULT_CACHE_MAX_BYTES,
+                    version_provider=backend.fetch_table_versions,
+                    version_check_interval=RESULT_CACHE_VERSION_CHECK_INTERVAL,
+                    ttl_seconds=RESULT_CACHE_TTL_SECONDS,
+                )
+    return cache
+
+def _result_versions(cache: ResultCache, sql_query: str, backend: ExecutionBackend) -> dict | None:
+    """Table versions to store a result under, read before the query runs (None: read them at put())."""
+    try:
+        return cache.versions_for(sql_query)
+    except backend.errors as e:
+        logger.warning(f"Could not read table versions before executing query: {e}")
+        return None
+
+def execute_sql_query(sql_query: str, backend: str | None = None,
+                      template: TemplateMatch | None = None) -> tuple[pd.DataFrame | None, str | None]:
+    """Executes the SQL query on the execution backend (EXECUTION_BACKEND by default) and returns a DataFrame.
+
+    Identical SQL is served from the result cache until one of the tables it reads is re-ingested.
+    With ``template``, ``sql_query`` is its display SQL (the cache key) and the template runs as a
+    prepared statement instead.
+    """
+    backend = get_execution_backend(backend)
+    cache = get_result_cache(backend)
+    if cache is not None:
+        try:
+            cached_df = cache.get(sql_query)
+        except backend.errors as e:
+            logger.warning(f"Result cache lookup failed, executing query directly: {e}")
+            cached_df = None
+        record_cache_lookup("result", cached_df is not None)
+        if cached_df is not None:
+            logger.info(f"Result cache hit, returning {len(cached_df)} cached rows.")
+            return cached_df, None
+        versions = _result_versions(cache, sql_query, backend)
+
+    df, error = _run_sql_query(sql_query, backend, template)
+    if cache is not None and df is not None:
+        try:
+            cache.put(sql_query, df, versions=versions)
+        except backend.errors as e:
+            logger.warning(f"Could not cache query result: {e}")
+    return df, error
+
+class _QueryCanceller:
+    """Lets an async caller cancel the query a worker thread is running on a backend.
+
+    Backends attach a callable that interrupts the running query (e.g. a PostgreSQL
+    connection's ``cancel``) for as long as it runs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel = None
+        self.cancelled = False
+
+    def attach(self, cancel):
+        with self._lock:
+            self._cancel = cancel
+            if self.cancelled:
+                cancel()
+
+    def detach(self):
+        with self._lock:
+            self._cancel = None
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._cancel is not None:
+                try:
+                    self._cancel()
+                    logger.info("Cancelled running SQL query.")
+                except Exception as e:
+                    logger.warning(f"Could not cancel running SQL query: {e}")
+
+_active_query_canceller: contextvars.ContextVar[_QueryCanceller | None] = contextvars.ContextVar(
+    "_active_query_canceller", default=None
+)
+
+def _run_sql_query(sql_query: str, backend: ExecutionBackend | None = None,
+                   template: TemplateMatch | None = None) -> tuple[pd.DataFrame | None, str | None]:
+    """Runs the SQL query (or the template's prepared statement) on the execution backend and returns a DataFrame."""
+    backend = backend or get_execution_backend()
+    canceller = _active_query_canceller.get()
     try:
-        conn = get_db_connection()
-        logger.info(f"Executing SQL: {sql_query}")
-        df = pd.read_sql_query(sql_query, conn)
+        logger.info(f"Executing SQL on {backend.name}: {sql_query}")
+        with span("db.execute", backend=backend.name) as current:
+            if template is not None:
+                current.set(template=template.template)
+                df = backend.execute_prepared(template.statement_name, template.sql, template.params, canceller=canceller)
+            else:
+                df = backend.execute(sql_query, canceller=canceller)
+            current.set(row_count=len(df))
+        RESULT_ROWS.observe(len(df), backend=backend.name)
         logger.info(f"SQL query executed successfully, returned {len(df)} rows.")
         return df, None
-    except psycopg2.Error as e:
+    except backend.errors as e:
         logger.error(f"Database error during query execution: {e}. SQL: {sql_query}")
-        db_error_message = f"Database error: {e}. Check SQL syntax and DB connection."
-        if "relation" in str(e).lower() and "does not exist" in str(e).lower():
-            db_error_message += " This often means a table name in the SQL query is incorrect or doesn't exist in your database schema described to the LLM."
-        elif "column" in str(e).lower() and "does not exist" in str(e).lower():
-            db_error_message += " This often means a column name in the SQL query is incorrect for the specified table(s)."
-        return None, db_error_message
+        return None, backend.describe_error(e)
     except Exception as e:
         logger.error(f"An unexpected error occurred during SQL execution: {e}. SQL: {sql_query}", exc_info=True)
         return None, f"An unexpected error occurred: {e}"
-    finally:
-        if conn:
-            conn.close()
-            logger.info("Database connection closed.")
 
-def sanitize_and_coerce_dtypes(df: pd.DataFrame) -> pd.DataFrame:
-    """Attempts to sanitize and coerce dtypes for better Altair compatibility."""
-    if df is None or df.empty:
-        return df
-    df_copy = df.copy()
-    for col in df_copy.columns:
-        # Attempt to convert to numeric if possible, handling errors by keeping original
+async def _run_cancellable_in_thread(func, *args, timeout: float | None = None):
+    """Runs a DB-bound function on a worker thread; on timeout or cancellation the server-side query is cancelled too."""
+    canceller = _QueryCanceller()
+    context = contextvars.copy_context()
+    context.run(_active_query_canceller.set, canceller)
+    task = asyncio.get_running_loop().run_in_executor(None, context.run, func, *args)
+    try:
+        return await asyncio.wait_for(task, timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError):
+        canceller.cancel()
+        raise
+
+async def execute_sql_query_async(sql_query: str, timeout: float | None = None) -> tuple[pd.DataFrame | None, str | None]:
+    """Runs execute_sql_query() on a worker thread; on timeout or cancellation the server-side query is cancelled too."""
+    return await _run_cancellable_in_thread(execute_sql_query, sql_query, timeout=timeout)
+
+def _run_sql_query_streaming(sql_query: str, backend: ExecutionBackend | None = None,
+                             max_rows: int | None = None) -> tuple[StreamingResultCollector | None, bool, str | None]:
+    """Streams the result from the execution backend in chunks until the row/byte budget is hit.
+
+    ``max_rows`` lowers the STREAM_MAX_ROWS budget. Returns (collector, truncated, error).
+    """
+    backend = backend or get_execution_backend()
+    row_budget = min(STREAM_MAX_ROWS, max_rows) if max_rows is not None else STREAM_MAX_ROWS
+    canceller = _active_query_canceller.get()
+    collector = StreamingResultCollector(
+        preview_rows=PREVIEW_ROWS, sample_rows=CHART_SAMPLE_ROWS, stats=new_summary_stats_accumulator(),
+        coerce=lambda chunk: _dtype_engine.coerce(chunk, sql_query=sql_query),
+    )
+    truncated = False
+    try:
+        logger.info(f"Executing SQL on {backend.name} (streaming): {sql_query}")
+        with span("db.execute", backend=backend.name) as current:
+            chunks = backend.iter_chunks(sql_query, STREAM_CHUNK_ROWS, canceller=canceller)
+            try:
+                for chunk in chunks:
+                    if collector.row_count >= row_budget or collector.bytes_fetched >= STREAM_MAX_BYTES:
+                        truncated = not chunk.empty
+                        break
+                    if collector.columns is None:
+                        collector.columns = list(chunk.columns)
+                        collector.column_type_oids = chunk.attrs.get(TYPE_OIDS_ATTR, {})
+                    remaining = row_budget - collector.row_count
+                    if len(chunk) > remaining:
+                        chunk, truncated = chunk.iloc[:remaining], True
+                    collector.add_chunk(chunk)
+                    if truncated:
+                        break
+            finally:
+                chunks.close()
+            current.set(row_count=collector.row_count, bytes_fetched=collector.bytes_fetched, truncated=truncated)
+        RESULT_ROWS.observe(collector.row_count, backend=backend.name)
+        logger.info(
+            f"SQL query streamed successfully: {collector.row_count} rows, {collector.bytes_fetched} bytes"
+            f"{' (truncated at budget)' if truncated else ''}."
+        )
+        return collector, truncated, None
+    except backend.errors as e:
+        logger.error(f"Database error during query execution: {e}. SQL: {sql_query}")
+        return None, False, backend.describe_error(e)
+    except Exception as e:
+        logger.error(f"An unexpected error occurred during SQL execution: {e}. SQL: {sql_query}", exc_info=True)
+        return None, False, f"An unexpected error occurred: {e}"
+
+def _json_records(df: pd.DataFrame) -> list[dict]:
+    return json.loads(df.to_json(orient='records', date_format='iso'))
+
+def execute_sql_query_streaming(sql_query: str, backend: str | None = None,
+                                max_rows: int | None = None) -> tuple[pd.DataFrame | None, dict | None, str | None]:
+    """Executes the SQL query on the execution backend with bounded memory, keeping at most ``max_rows`` rows.
+
+    Returns (chart_frame, info, error): ``chart_frame`` is the full result when it fits in
+    CHART_SAMPLE_ROWS and a uniform sample otherwise; ``info`` carries row_count, truncated,
+    bytes_fetched, preview rows and summary stats computed incrementally over every fetched row.
+    """
+    backend = get_execution_backend(backend)
+    cache = get_result_cache(backend)
+    variant = f"stream:{STREAM_MAX_ROWS if max_rows is None else min(STREAM_MAX_ROWS, max_rows)}"  # Samples never pass for full results
+    if cache is not None:
         try:
-            df_copy[col] = pd.to_numeric(df_copy[col])
-            logger.debug(f"Column '{col}' coerced to numeric.")
-            continue # Skip to next column if numeric conversion is successful
-        except (ValueError, TypeError):
-            pass # Not numeric, try datetime
+            cached = cache.lookup(sql_query, variant=variant)
+        except backend.errors as e:
+            logger.warning(f"Result cache lookup failed, executing query directly: {e}")
+            cached = None
+        record_cache_lookup("result", cached is not None and "row_count" in cached[1])
+        if cached is not None and "row_count" in cached[1]:
+            logger.info(f"Result cache hit, returning {len(cached[0])} cached rows.")
+            return cached[0], cached[1], None
+        versions = _result_versions(cache, sql_query, backend)
 
-        # Attempt to convert to datetime if possible, handling errors
+    collector, truncated, error = _run_sql_query_streaming(sql_query, backend, max_rows)
+    if error:
+        return None, None, error
+    frame = collector.sample
+    frame.attrs[TYPE_OIDS_ATTR] = collector.column_type_oids
+    info = {
+        "row_count": collector.row_count,
+        "truncated": truncated,
+        "sampled": collector.row_count > len(frame),
+        "bytes_fetched": collector.bytes_fetched,
+        "preview": _json_records(collector.preview),
+        "summary_stats": collector.summary_stats(),
+    }
+    if cache is not None:
         try:
-            df_copy[col] = pd.to_datetime(df_copy[col])
-            logger.debug(f"Column '{col}' coerced to datetime.")
-            continue
-        except (ValueError, TypeError):
-            pass # Not datetime, leave as object/string
-        
-        if df_copy[col].dtype == 'object':
-             try:
-                # For object columns, try to strip whitespace if they are strings
-                df_copy[col] = df_copy[col].astype(str).str.strip()
-             except AttributeError: # Not a string series
-                pass 
+            cache.put(sql_query, frame, metadata=info, versions=versions, variant=variant)
+        except backend.errors as e:
+            logger.warning(f"Could not cache query result: {e}")
+    return frame, info, None
+
+def _execute_for_pipeline(sql_query: str, max_rows: int | None = None) -> tuple[pd.DataFrame | None, dict | None, str | None]:
+    """Executes SQL for process_nl_query in streaming or classic mode; returns (frame, info, error).
+
+    Results are cut to ``max_rows`` (the pre-flight row limit, whose LIMIT lets one more row
+    through) and flagged as truncated only when rows were actually dropped.
+    """
+    if STREAMING_EXECUTION:
+        return execute_sql_query_streaming(sql_query, max_rows=max_rows)
+    df, error = execute_sql_query(sql_query)
+    if df is None:
+        return None, None, error
+    truncated = max_rows is not None and len(df) > max_rows
+    if truncated:
+        df = df.iloc[:max_rows]
+    return df, {"row_count": len(df), "truncated": truncated, "sampled": False}, error
+
+async def _execute_for_pipeline_async(sql_query: str, timeout: float | None = None, max_rows: int | None = None):
+    """Concurrent executions of the same SQL on the same backend share one run; see _run_in_sql_flight()."""
+    key = (get_execution_backend().name, normalize_sql(sql_query), max_rows)
+    return await _run_in_sql_flight(key, _execute_for_pipeline, sql_query, max_rows, timeout=timeout)
+
+async def _run_in_sql_flight(key: tuple, func, *args, timeout: float | None = None):
+    """Runs ``func(*args)`` like _run_cancellable_in_thread(), or waits up to ``timeout`` for the identical run in flight.
+
+    The server-side query is cancelled only when every caller waiting for it has timed out or been cancelled.
+    """
+    if not SINGLE_FLIGHT_ENABLED:
+        return await _run_cancellable_in_thread(func, *args, timeout=timeout)
+    return await _sql_flight.do_async(key, lambda: _run_cancellable_in_thread(func, *args, timeout=timeout), timeout=timeout)
+
+def execute_template_match(match: TemplateMatch) -> tuple[pd.DataFrame | None, dict | None, str | None]:
+    """Runs a matched SQL template as a prepared statement; returns (frame, info, error) like _execute_for_pipeline().
+
+    Template results are a few rows per player, team or leaderboard, so they are never streamed.
+    """
+    df, error = execute_sql_query(match.display_sql, template=match)
+    if df is None:
+        return None, None, error
+    return df, {"row_count": len(df), "truncated": False, "sampled": False}, error
+
+async def _execute_template_match_async(match: TemplateMatch, timeout: float | None = None):
+    key = (get_execution_backend().name, "template", match.display_sql)
+    return await _run_in_sql_flight(key, execute_template_match, match, timeout=timeout)
+
+_dtype_engine = DtypeInferenceEngine()
+
+def sanitize_and_coerce_dtypes(df: pd.DataFrame, sql_query: str | None = None, inplace: bool = False) -> pd.DataFrame:
+    """Coerces column dtypes for better Altair compatibility.
+
+    Types come from the column dtype, the PostgreSQL type OIDs recorded by the executor, or a
+    sample of values, and are cached per SQL shape when ``sql_query`` is given. Without
+    ``inplace`` only a shallow copy is made; ``df`` itself is left unchanged.
+    """
+    if df is None or df.empty:
+        return df
+    with span("dtype_coercion", rows=len(df), columns=len(df.columns)):
+        df_coerced = _dtype_engine.coerce(df, sql_query=sql_query, inplace=inplace)
     logger.info("Data types sanitized/coerced for charting.")
-    return df_copy 
+    return df_coerced
+
+def new_summary_stats_accumulator() -> SummaryStatsAccumulator:
+    """A summary stats accumulator with the configured SUMMARY_STATS_* budget."""
+    return SummaryStatsAccumulator(
+        max_columns=SUMMARY_STATS_MAX_COLUMNS,
+        cell_budget=SUMMARY_STATS_CELL_BUDGET,
+        sample_size=SUMMARY_STATS_SAMPLE_SIZE,
+        distinct_k=SUMMARY_STATS_DISTINCT_K,
+        top_k=SUMMARY_STATS_TOP_K,
+    )
+
+def compute_summary_stats(df_sanitized: pd.DataFrame) -> dict:
+    """Type-appropriate, JSON-safe summary statistics for an already sanitized DataFrame."""
+    with span("summary_stats", rows=len(df_sanitized)):
+        accumulator = new_summary_stats_accumulator()
+        accumulator.update(df_sanitized)
+        return accumulator.to_dict()
+
+def create_altair_chart(df: pd.DataFrame, nl_query: str, summary_stats: dict | None = None,
+                        sql_query: str | None = None) -> dict | None:
+    """Creates a generic Altair chart from the DataFrame. Returns a structured dict.
+
+    Pass ``summary_stats`` when they were already computed (e.g. incrementally while streaming).
+    """
+    output = {"chart_spec": None, "summary_stats": None, "chart_type": "none", "message": None, "data_reduction": None}
+    if df is None or df.empty:
+        output["message"] = "No data provided to create chart."
+        return output
 
-def create_altair_chart(df: pd.DataFrame, nl_query: str) -> dict | None:
-    """Creates a generic Altair chart from the DataFrame. Returns a structured dict."""
-    output = {"chart_spec": None, "summary_stats": None, "chart_type": "none", "message": None}
+    df_sanitized = sanitize_and_coerce_dtypes(df, sql_query=sql_query) # Work with a sanitized (shallow) copy
+    output["summary_stats"] = summary_stats if summary_stats is not None else compute_summary_stats(df_sanitized)
+    output.update(build_chart_spec(df_sanitized, nl_query))
+    return output
+
+async def create_altair_chart_async(df: pd.DataFrame, nl_query: str, summary_stats: dict | None = None,
+                                    sql_query: str | None = None) -> dict | None:
+    """Like create_altair_chart(), but computes summary stats and the chart spec concurrently."""
+    output = {"chart_spec": None, "summary_stats": None, "chart_type": "none", "message": None, "data_reduction": None}
     if df is None or df.empty:
         output["message"] = "No data provided to create chart."
         return output
 
-    df_sanitized = sanitize_and_coerce_dtypes(df.copy()) # Work with a sanitized copy
-    output["summary_stats"] = df_sanitized.describe(include='all').to_dict()
+    df_sanitized = await asyncio.to_thread(sanitize_and_coerce_dtypes, df, sql_query)
+    if summary_stats is None:
+        summary_stats, chart_info = await asyncio.gather(
+            asyncio.to_thread(compute_summary_stats, df_sanitized),
+            asyncio.to_thread(build_chart_spec, df_sanitized, nl_query),
+        )
+    else:
+        chart_info = await asyncio.to_thread(build_chart_spec, df_sanitized, nl_query)
+    output["summary_stats"] = summary_stats
+    output.update(chart_info)
+    return output
+
+def _reduction_note(reduction: dict) -> str:
+    if reduction["method"] == "top_k_other":
+        return f" (Top {reduction['max_points']} categories + Other)" if "other_categories" in reduction else ""
+    return f" ({reduction['output_rows']:,} of {reduction['input_rows']:,} points, {reduction['method']})"
 
+def build_chart_spec(df_sanitized: pd.DataFrame, nl_query: str) -> dict:
+    """Picks a chart type for a sanitized DataFrame and returns its Vega-Lite spec, chart type and message.
+
+    Only the encoded columns are embedded, reduced to the CHART_* point budgets, so the spec
+    size is bounded regardless of the result size. Any reduction is recorded in ``data_reduction``
+    and in the spec's ``usermeta``.
+    """
+    output = {"chart_spec": None, "chart_type": "none", "message": None, "data_reduction": None}
     chart_title = f"Result for: {nl_query[:50]}{'...' if len(nl_query) > 50 else ''}"
     num_rows, num_cols = df_sanitized.shape
     chart = None
+    reduction = None
 
     try:
         if num_cols == 1 and pd.api.types.is_numeric_dtype(df_sanitized.iloc[:, 0].dtype):
@@ -275,38 +991,36 @@ def create_altair_chart(df: pd.DataFrame, nl_query: str) -> dict | None:
 
         elif num_cols >= 2:
             numeric_cols = [col for col in df_sanitized.columns if pd.api.types.is_numeric_dtype(df_sanitized[col].dtype)]
-            string_cols = [col for col in df_sanitized.columns if pd.api.types.is_string_dtype(df_sanitized[col].dtype) or pd.api.types.is_categorical_dtype(df_sanitized[col].dtype)]
+            string_cols = [col for col in df_sanitized.columns if pd.api.types.is_string_dtype(df_sanitized[col].dtype) or isinstance(df_sanitized[col].dtype, pd.CategoricalDtype)]
             datetime_cols = [col for col in df_sanitized.columns if pd.api.types.is_datetime64_any_dtype(df_sanitized[col].dtype)]
 
             if datetime_cols and numeric_cols:
                 x_col, y_col = datetime_cols[0], numeric_cols[0]
-                chart = alt.Chart(df_sanitized).mark_line().encode(
+                df_chart, reduction = reduce_line(df_sanitized, x_col, y_col, max_points=CHART_LINE_MAX_POINTS, method=CHART_LINE_METHOD)
+                chart = alt.Chart(df_chart).mark_line().encode(
                     x=alt.X(f'{x_col}:T', title=x_col),
                     y=alt.Y(f'{y_col}:Q', title=y_col),
                     tooltip=[alt.Tooltip(f'{x_col}:T', title=x_col), alt.Tooltip(f'{y_col}:Q', title=y_col)]
-                ).properties(title=chart_title)
+                )
                 output["chart_type"] = "line"
             elif string_cols and numeric_cols:
                 x_col, y_col = string_cols[0], numeric_cols[0]
-                df_subset = df_sanitized
-                if df_sanitized[x_col].nunique() > 20:
-                     # Attempt to sort by y_col if it's truly numeric after sanitization
-                     if pd.api.types.is_numeric_dtype(df_sanitized[y_col].dtype):
-                         df_subset = df_sanitized.nlargest(20, y_col)
-                     else: # Fallback if y_col is not numeric for some reason
-                         df_subset = df_sanitized.head(20) 
-                     chart_title += " (Top 20 categories)"
-                
-                chart = alt.Chart(df_subset).mark_bar().encode(
+                tooltip_cols = numeric_cols[1:3]
+                df_chart, reduction = top_k_with_other(df_sanitized, x_col, y_col, top_k=CHART_BAR_TOP_K, extra_cols=tooltip_cols)
+                chart = alt.Chart(df_chart).mark_bar().encode(
                     x=alt.X(f'{x_col}:N', sort='-y', title=x_col),
                     y=alt.Y(f'{y_col}:Q', title=y_col),
                     tooltip=[alt.Tooltip(f'{x_col}:N', title=x_col), alt.Tooltip(f'{y_col}:Q', title=y_col)] + \
-                              [alt.Tooltip(f'{nc}:Q', title=nc) for nc in numeric_cols[1:3] if nc in df_subset.columns]
-                ).properties(title=chart_title)
+                              [alt.Tooltip(f'{nc}:Q', title=nc) for nc in tooltip_cols]
+                )
                 output["chart_type"] = "bar"
             elif len(numeric_cols) >= 2:
                 x_col, y_col = numeric_cols[0], numeric_cols[1]
                 color_col = string_cols[0] if string_cols and df_sanitized[string_cols[0]].nunique() < 10 else None
+                if CHART_SCATTER_METHOD == "sample":
+                    df_chart, reduction = stratified_sample_scatter(df_sanitized, x_col, y_col, max_points=CHART_SCATTER_MAX_POINTS, color_col=color_col)
+                else:
+                    df_chart, reduction = bin_scatter(df_sanitized, x_col, y_col, max_points=CHART_SCATTER_MAX_POINTS, color_col=color_col)
                 encode_params = {
                     'x': alt.X(f'{x_col}:Q', title=x_col),
                     'y': alt.Y(f'{y_col}:Q', title=y_col),
@@ -315,16 +1029,31 @@ def create_altair_chart(df: pd.DataFrame, nl_query: str) -> dict | None:
                 if color_col:
                     encode_params['color'] = alt.Color(f'{color_col}:N', title=color_col)
                     encode_params['tooltip'].append(alt.Tooltip(f'{color_col}:N', title=color_col))
-                
-                chart = alt.Chart(df_sanitized).mark_circle(size=60).encode(**encode_params).properties(title=chart_title)
+                count_column = (reduction or {}).get("count_column")
+                if count_column:
+                    # Binned points stand for several rows; size them by how many.
+                    encode_params['size'] = alt.Size(f'{count_column}:Q', title='rows')
+                    encode_params['tooltip'].append(alt.Tooltip(f'{count_column}:Q', title='rows'))
+                    chart = alt.Chart(df_chart).mark_circle().encode(**encode_params)
+                else:
+                    chart = alt.Chart(df_chart).mark_circle(size=60).encode(**encode_params)
                 output["chart_type"] = "scatter"
             else:
                 output["message"] = "Data retrieved, but a specific chart could not be automatically generated based on column types. Please examine the raw data."
         else:
             output["message"] = "Data not suitable for standard charting (e.g., single non-numeric column or too few columns)."
+
+        if chart and output["chart_type"] != "bar_single_value":
+            if reduction is not None:
+                chart_title += _reduction_note(reduction)
+                chart = chart.properties(usermeta={"data_reduction": reduction})
+                logger.info(f"Chart data reduced from {reduction['input_rows']} to {reduction['output_rows']} rows ({reduction['method']}).")
+            chart = chart.properties(title=chart_title)
         
         if chart:
-            output["chart_spec"] = chart.to_dict() # Use to_dict() for JSON serializable spec
+            with span("chart_to_dict", chart_type=output["chart_type"]):
+                output["chart_spec"] = chart.to_dict() # Use to_dict() for JSON serializable spec
+            output["data_reduction"] = reduction
             logger.info(f"Altair chart ({output['chart_type']}) generated successfully.")
         else:
             logger.warning(f"Altair chart object was not created. Message: {output.get('message')}")
@@ -336,20 +1065,81 @@ def create_altair_chart(df: pd.DataFrame, nl_query: str) -> dict | None:
     
     return output
 
-def process_nl_query(natural_language_query: str) -> dict:
-    """Processes a natural language query, converts to SQL, executes, and visualizes."""
-    output = {
+def _new_query_output(natural_language_query: str) -> dict:
+    return {
         "natural_query": natural_language_query,
         "sql_query": None,
+        "rollup": None,
+        "template": None,
+        "preflight": None,
         "query_explanation": None,
-        "chart_info": {"chart_spec": None, "summary_stats": None, "chart_type": "none", "message": "Processing started..."},
+        "chart_info": {"chart_spec": None, "summary_stats": None, "chart_type": "none", "message": "Processing started...", "data_reduction": None},
         "data_preview": None,
+        "row_count": None,
+        "truncated": False,
         "explanation": None,
-        "error": None
+        "error": None,
+        "timings": None
     }
+
+def _stage_timed_out(output: dict, stage: str, timeout: float) -> dict:
+    output["error"] = f"The {stage} stage timed out."
+    output["explanation"] = f"The {stage} stage did not finish within {timeout:g} seconds."
+    logger.error(f"{stage} stage timed out after {timeout:g}s for query: '{output['natural_query']}'")
+    return output
+
+async def process_nl_query_async(natural_language_query: str, stage_timeouts: dict | None = None,
+                                 backend: str | None = None, profile: bool = False) -> dict:
+    """Processes a natural language query, converts to SQL, executes, and visualizes.
+
+    Each stage ('llm', 'sql', 'chart') runs under its own timeout; cancelling the returned
+    coroutine also cancels an in-flight SQL query on the server. ``backend`` ('postgres' or
+    'duckdb') overrides EXECUTION_BACKEND for this question, schema context included.
+    The output's ``timings`` field holds the per-stage spans (see telemetry.py); with
+    ``profile`` it also holds sampled stacks of the threads working on the question.
+    """
+    return await _process_nl_query_async(natural_language_query, stage_timeouts, backend=backend, profile=profile)
+
+async def _process_nl_query_async(natural_language_query: str, stage_timeouts: dict | None = None,
+                                  llm_rate_limiter: TokenBucket | None = None, sql_executor=None,
+                                  backend: str | None = None, profile: bool = False) -> dict:
+    """Runs the pipeline with ``backend`` selected for everything it does (schema, caches, execution)."""
+    get_execution_backend(backend)  # Fails fast on an unknown backend name
+    token = _selected_backend.set(backend) if backend else None
+    try:
+        with trace(profile=profile, profile_interval=PROFILE_SAMPLE_INTERVAL_MS / 1000) as request_trace:
+            output = await _run_nl_query_pipeline(natural_language_query, stage_timeouts, llm_rate_limiter, sql_executor)
+        output["timings"] = request_trace.to_dict()
+        status = "ok" if not output["error"] else "timeout" if "timed out" in output["error"] else "error"
+        QUERIES.inc(status=status)
+        return output
+    finally:
+        if token is not None:
+            _selected_backend.reset(token)
+
+async def _run_nl_query_pipeline(natural_language_query: str, stage_timeouts: dict | None = None,
+                                 llm_rate_limiter: TokenBucket | None = None, sql_executor=None) -> dict:
+    """Pipeline body; ``sql_executor(sql, timeout, max_rows)`` lets batch runs share executions of identical SQL."""
+    timeouts = {"llm": LLM_STAGE_TIMEOUT, "sql": SQL_STAGE_TIMEOUT, "chart": CHART_STAGE_TIMEOUT}
+    timeouts.update(stage_timeouts or {})
+    sql_executor = sql_executor or _execute_for_pipeline_async
+    output = _new_query_output(natural_language_query)
     logger.info(f"Processing natural language query: '{natural_language_query}'")
 
-    sql_query, query_explanation = get_nl_to_sql(natural_language_query)
+    match = await asyncio.to_thread(match_intent_template, natural_language_query) if INTENT_TEMPLATES_ENABLED else None
+    if match is not None:
+        # Template SQL is written against the known schema, so pre-flight and rollup rewriting are skipped.
+        logger.info(f"Answering from SQL template {match.template}: {match.slots}")
+        sql_query, query_explanation = match.display_sql, match.explanation
+        output["template"] = match.template
+    else:
+        try:
+            with span("nl_to_sql"):
+                sql_query, query_explanation = await asyncio.wait_for(
+                    get_nl_to_sql_async(natural_language_query, rate_limiter=llm_rate_limiter), timeouts["llm"]
+                )
+        except asyncio.TimeoutError:
+            return _stage_timed_out(output, "NL-to-SQL", timeouts["llm"])
     output["sql_query"] = sql_query
     output["query_explanation"] = query_explanation
 
@@ -359,7 +1149,58 @@ def process_nl_query(natural_language_query: str) -> dict:
         logger.warning(f"NL to SQL failed for query: '{natural_language_query}'. Reason: {output['explanation']}")
         return output
 
-    df, db_error = execute_sql_query(sql_query)
+    if SQL_PREFLIGHT_ENABLED and match is None:
+        try:
+            checked_sql, preflight_info, rejection = await _run_cancellable_in_thread(preflight_sql, sql_query, timeout=timeouts["sql"])
+        except asyncio.TimeoutError:
+            return _stage_timed_out(output, "SQL pre-flight", timeouts["sql"])
+        preflight_info["repaired"] = False
+        if rejection:
+            logger.warning(f"Pre-flight rejected SQL: '{sql_query}'. Reason: {rejection} Asking the LLM for a correction.")
+            try:
+                with span("sql_repair"):
+                    repaired_sql, repaired_explanation = await asyncio.wait_for(
+                        repair_nl_to_sql_async(natural_language_query, sql_query, rejection, rate_limiter=llm_rate_limiter),
+                        timeouts["llm"]
+                    )
+            except asyncio.TimeoutError:
+                return _stage_timed_out(output, "SQL repair", timeouts["llm"])
+            if repaired_sql:
+                try:
+                    checked_sql, preflight_info, rejection = await _run_cancellable_in_thread(
+                        preflight_sql, repaired_sql, timeout=timeouts["sql"]
+                    )
+                except asyncio.TimeoutError:
+                    return _stage_timed_out(output, "SQL pre-flight", timeouts["sql"])
+                preflight_info["repaired"] = True
+                sql_query = output["sql_query"] = repaired_sql
+                query_explanation = output["query_explanation"] = repaired_explanation
+                if not rejection:
+                    # Replace the rejected translation so the question is not repaired again next time.
+                    await asyncio.to_thread(_store_translation, natural_language_query, repaired_sql, repaired_explanation)
+        output["preflight"] = preflight_info
+        if rejection:
+            output["error"] = "The generated SQL query failed pre-flight checks."
+            output["explanation"] = rejection
+            logger.error(f"Pre-flight rejected SQL: '{sql_query}'. Reason: {rejection}")
+            return output
+        sql_query = output["sql_query"] = checked_sql
+
+    rewritten_sql, rollup = rewrite_with_rollups(sql_query) if match is None else (sql_query, None)
+    if rollup:
+        logger.info(f"Answering from rollup {rollup} instead of: '{sql_query}'")
+        sql_query = output["sql_query"] = rewritten_sql
+        output["rollup"] = rollup
+
+    try:
+        with span("sql"):
+            if match is not None:
+                df, exec_info, db_error = await _execute_template_match_async(match, timeouts["sql"])
+            else:
+                row_limit = (output["preflight"] or {}).get("row_limit")
+                df, exec_info, db_error = await sql_executor(sql_query, timeouts["sql"], row_limit)
+    except asyncio.TimeoutError:
+        return _stage_timed_out(output, "SQL execution", timeouts["sql"])
 
     if db_error:
         output["error"] = "Database query execution failed."
@@ -372,6 +1213,11 @@ def process_nl_query(natural_language_query: str) -> dict:
         output["explanation"] = "The SQL query executed but returned no data, or an unknown database error occurred."
         logger.warning(f"DB query returned None for SQL: '{sql_query}'")
         return output
+
+    output["row_count"] = exec_info["row_count"]
+    output["truncated"] = exec_info["truncated"]
+    if output["truncated"]:
+        logger.warning(f"Result for SQL: '{sql_query}' was truncated at {output['row_count']} rows (streaming budget or pre-flight row limit).")
     
     if df.empty:
         output["explanation"] = "The query executed successfully but returned no results."
@@ -380,9 +1226,16 @@ def process_nl_query(natural_language_query: str) -> dict:
         output["chart_info"]["message"] = "Query returned no results, so no chart can be generated."
         return output
         
-    output["data_preview"] = df.head().to_dict(orient='records')
+    output["data_preview"] = exec_info.get("preview") or df.head(PREVIEW_ROWS).to_dict(orient='records')
 
-    chart_info_dict = create_altair_chart(df, natural_language_query)
+    try:
+        with span("chart"):
+            chart_info_dict = await asyncio.wait_for(
+                create_altair_chart_async(df, natural_language_query, summary_stats=exec_info.get("summary_stats"), sql_query=sql_query),
+                timeouts["chart"]
+            )
+    except asyncio.TimeoutError:
+        return _stage_timed_out(output, "chart generation", timeouts["chart"])
     output["chart_info"] = chart_info_dict
     
     if chart_info_dict.get("chart_spec"):
@@ -397,13 +1250,197 @@ def process_nl_query(natural_language_query: str) -> dict:
     logger.info(f"Successfully processed query: '{natural_language_query}'")
     return output
 
+_background_loop = None
+_background_loop_lock = threading.Lock()
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    """Event loop on a daemon thread that runs the async pipeline for synchronous callers."""
+    global _background_loop
+    if _background_loop is None:
+        with _background_loop_lock:
+            if _background_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="query-engine-loop", daemon=True).start()
+                _background_loop = loop
+    return _background_loop
+
+def run_coroutine_sync(coro):
+    """Runs a coroutine on the shared background loop and blocks until it completes."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        coro.close()
+        raise RuntimeError("Cannot block on the query pipeline from inside a running event loop; await the async API instead.")
+    future = asyncio.run_coroutine_threadsafe(coro, _get_background_loop())
+    try:
+        return future.result()
+    except BaseException:
+        future.cancel()
+        raise
+
+def process_nl_query(natural_language_query: str, backend: str | None = None, profile: bool = False) -> dict:
+    """Processes a natural language query, converts to SQL, executes, and visualizes."""
+    return run_coroutine_sync(process_nl_query_async(natural_language_query, backend=backend, profile=profile))
+
+def warm_up() -> dict:
+    """Creates the state a long-running process keeps warm, so the first questions skip the cold start.
+
+    That is the LLM client, the execution backend (and DB pool), the schema catalog and what
+    is derived from it (known columns, the pruning index, the intent parser's name index,
+    the result cache). Calling it again
+    after a schema change rebuilds the derived state ahead of the next question. Failures are
+    logged rather than raised; the pipeline retries lazily. Returns seconds spent per step.
+    """
+    steps = {
+        "llm_client": get_model,
+        "execution_backend": get_execution_backend,
+        "schema": get_schema_fingerprint,
+        "known_columns": get_known_columns,
+        "schema_index": lambda: get_schema_context("warm up"),
+        "intent_parser": get_intent_parser,
+        "result_cache": get_result_cache,
+    }
+    timings = {}
+    for step, func in steps.items():
+        started = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            logger.warning(f"Warm-up step '{step}' failed, it will be retried on first use: {e}")
+        timings[step] = round(time.perf_counter() - started, 4)
+    logger.info(f"Query engine warmed up: {timings}")
+    return timings
+
+def shutdown():
+    """Closes the execution backends and the connection pool."""
+    global _db_pool
+    with _execution_backends_lock:
+        backends = list(_execution_backends.values())
+        _execution_backends.clear()
+    for backend in backends:
+        backend.close()
+    with _db_pool_lock:
+        pool, _db_pool = _db_pool, None
+    if pool is not None:
+        pool.closeall()
+
+async def process_nl_queries_batch_async(queries: list[str], max_concurrency: int = BATCH_MAX_CONCURRENCY,
+                                         llm_requests_per_second: float | None = BATCH_LLM_REQUESTS_PER_SECOND,
+                                         stage_timeouts: dict | None = None, stats: dict | None = None,
+                                         backend: str | None = None):
+    """Processes many questions concurrently, yielding {"index", "result"} records as they complete.
+
+    Questions that normalize to the same text are processed once, and questions that
+    compile to the same SQL share one execution. Gemini calls are throttled by a token
+    bucket. Aggregate throughput stats are written into ``stats`` when the run finishes.
+    """
+    started = time.perf_counter()
+    stats = stats if stats is not None else {}
+    groups: dict[str, list[int]] = {}
+    for index, natural_query in enumerate(queries):
+        groups.setdefault(normalize_query_text(natural_query), []).append(index)
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    rate_limiter = TokenBucket(llm_requests_per_second) if llm_requests_per_second else None
+    sql_tasks: dict[tuple, asyncio.Future] = {}
+    shared_sql_count = 0
+
+    async def shared_sql_executor(sql_query: str, timeout: float, max_rows: int | None = None):
+        nonlocal shared_sql_count
+        key = (normalize_sql(sql_query), max_rows)
+        task = sql_tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(_execute_for_pipeline_async(sql_query, timeout=timeout, max_rows=max_rows))
+            sql_tasks[key] = task
+        else:
+            shared_sql_count += 1
+        return await asyncio.shield(task)
+
+    async def run_group(indices: list[int]):
+        async with semaphore:
+            result = await _process_nl_query_async(
+                queries[indices[0]], stage_timeouts, llm_rate_limiter=rate_limiter, sql_executor=shared_sql_executor,
+                backend=backend,
+            )
+        return indices, result
+
+    tasks = [asyncio.ensure_future(run_group(indices)) for indices in groups.values()]
+    completed = errors = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            indices, result = await next_done
+            for index in indices:
+                completed += 1
+                errors += bool(result["error"])
+                yield {"index": index, "result": result if index == indices[0] else dict(result, natural_query=queries[index])}
+    finally:
+        for task in tasks + list(sql_tasks.values()):
+            task.cancel()
+        elapsed = time.perf_counter() - started
+        stats.update({
+            "queries": len(queries),
+            "completed": completed,
+            "errors": errors,
+            "unique_questions": len(groups),
+            "deduplicated_questions": len(queries) - len(groups),
+            "unique_sql": len(sql_tasks),
+            "deduplicated_sql": shared_sql_count,
+            "llm_rate_limit_wait_seconds": round(rate_limiter.total_wait_seconds, 3) if rate_limiter else 0.0,
+            "elapsed_seconds": round(elapsed, 3),
+            "queries_per_second": round(completed / elapsed, 3) if elapsed > 0 else 0.0,
+        })
+        logger.info(f"Batch finished: {stats}")
+
+class BatchRun:
+    """Iterator over a batch run's results for synchronous callers; ``stats`` is filled in once it is exhausted."""
+
+    def __init__(self, queries: list[str], **options):
+        self.queries = queries
+        self.options = options
+        self.stats: dict = {}
+
+    def __iter__(self):
+        results: queue.Queue = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for record in process_nl_queries_batch_async(self.queries, stats=self.stats, **self.options):
+                    results.put(record)
+            except BaseException as e:
+                results.put(e)
+            finally:
+                results.put(done)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), _get_background_loop())
+        try:
+            while True:
+                record = results.get()
+                if record is done:
+                    break
+                if isinstance(record, BaseException):
+                    raise record
+                yield record
+        finally:
+            future.cancel()
+
+def process_nl_queries_batch(queries: list[str], max_concurrency: int = BATCH_MAX_CONCURRENCY,
+                             llm_requests_per_second: float | None = BATCH_LLM_REQUESTS_PER_SECOND,
+                             stage_timeouts: dict | None = None, backend: str | None = None) -> BatchRun:
+    """Processes many questions concurrently; iterate the returned BatchRun to stream results as they complete."""
+    return BatchRun(queries, max_concurrency=max_concurrency,
+                    llm_requests_per_second=llm_requests_per_second, stage_timeouts=stage_timeouts, backend=backend)
+
 if __name__ == '__main__':
+    configure_logging()
     logger.info("Query Engine Module started for direct testing.")
     
     # --- Mocking for testing without a live DB (if DB_USER is still 'your_db_user') ---
     # This allows testing NL-to-SQL and basic chart logic without a full DB setup.
     # To use your actual DB, ensure .env is configured and comment out/remove this mock block.
-    if DB_USER == 'your_db_user': # A simple check to see if DB creds are default
+    if DB_USER == 'your_db_user' and EXECUTION_BACKEND == 'postgres': # Default DB creds; EXECUTION_BACKEND=duckdb needs no DB
         logger.warning("Default DB credentials detected. Using MOCKED database execution.")
         logger.warning("To use actual DB: configure .env and remove/comment out mock_execute_sql_query block.")
         _original_execute_sql_query = execute_sql_query
@@ -446,6 +1483,7 @@ if __name__ == '__main__':
             return pd.DataFrame(), None # Return empty DF instead of error for mock
         
         execute_sql_query = mock_execute_sql_query # Apply the mock
+        STREAMING_EXECUTION = False # The mock replaces execute_sql_query, which only the non-streaming path uses
     # ------------------------------------------------------------
 
     test_queries = [
@@ -483,7 +1521,7 @@ if __name__ == '__main__':
         print(f"{'~'*50}")
 
     # Restore original execute_sql_query if it was mocked
-    if '_original_execute_sql_query' in locals() and DB_USER == 'your_db_user':
+    if '_original_execute_sql_query' in locals():
          execute_sql_query = _original_execute_sql_query
          logger.info("Restored original database execution function.")
 
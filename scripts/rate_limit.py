@@ -0,0 +1,46 @@
+import time
+import asyncio
+import threading
+
+
+class TokenBucket:
+    """Token-bucket rate limiter usable from threads (acquire) and coroutines (acquire_async).
+
+    ``rate`` tokens are added per second up to ``capacity`` (the allowed burst). Callers
+    reserve tokens up front, so waiters are served in arrival order without busy-waiting.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.total_wait_seconds = 0.0
+
+    def _reserve(self, tokens: float) -> float:
+        """Takes ``tokens`` (possibly going into debt) and returns how long the caller must wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.acquired += 1
+            self.total_wait_seconds += wait
+            return wait
+
+    def acquire(self, tokens: float = 1.0):
+        """Blocks the calling thread until ``tokens`` are available."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1.0):
+        """Suspends the calling coroutine until ``tokens`` are available."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
@@ -0,0 +1,225 @@
+import io
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(
+    r"""('(?:[^']|'')*')"""          # string literal
+    r"""|("(?:[^"]|"")*")"""         # quoted identifier
+    r"""|(--[^\n]*|/\*.*?\*/)"""     # comment
+    r"""|(\s+)""",                   # whitespace
+    re.DOTALL,
+)
+_TABLE_REF_RE = re.compile(
+    r"""\b(?:FROM|JOIN)\s+((?:"[^"]+"|[A-Za-z_][\w$]*)(?:\s*\.\s*(?:"[^"]+"|[A-Za-z_][\w$]*))?)""",
+    re.IGNORECASE,
+)
+_FROM_LIST_RE = re.compile(r"""\bFROM\s+(.*?)(?:\bWHERE\b|\bGROUP\b|\bORDER\b|\bLIMIT\b|\bHAVING\b|\bJOIN\b|\bUNION\b|\)|$)""", re.IGNORECASE | re.DOTALL)
+_CTE_NAME_RE = re.compile(r"""(?:\bWITH\s+(?:RECURSIVE\s+)?|,\s*)([A-Za-z_][\w$]*)\s+AS\s*\(""", re.IGNORECASE)
+_VOLATILE_RE = re.compile(r"\b(now|random|clock_timestamp|timeofday|current_date|current_time|current_timestamp|localtime|localtimestamp)\b", re.IGNORECASE)
+
+
+def normalize_sql(sql_query: str) -> str:
+    """Canonical SQL text for cache keys: comments dropped, whitespace collapsed outside literals, no trailing ';'."""
+    parts = []
+    pos = 0
+    for match in _TOKEN_RE.finditer(sql_query):
+        if match.start() > pos:
+            parts.append(sql_query[pos:match.start()])
+        literal, quoted, comment, space = match.groups()
+        if literal or quoted:
+            parts.append(match.group(0))
+        elif not parts or not parts[-1].endswith(" "):
+            parts.append(" ")
+        pos = match.end()
+    parts.append(sql_query[pos:])
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def _unquote_identifier(name: str) -> str:
+    name = re.sub(r"\s+", "", name)
+    segments = [seg[1:-1] if seg.startswith('"') else seg.lower() for seg in name.split(".")]
+    return segments[-1]
+
+
+def referenced_tables(sql_query: str) -> set[str]:
+    """Best-effort set of table names a query reads from (CTE names excluded)."""
+    sql_text = normalize_sql(sql_query)
+    cte_names = {name.lower() for name in _CTE_NAME_RE.findall(sql_text)}
+    tables = {_unquote_identifier(ref) for ref in _TABLE_REF_RE.findall(sql_text)}
+    # Comma-separated FROM lists: FROM a, b x, c
+    for from_list in _FROM_LIST_RE.findall(sql_text):
+        for item in from_list.split(",")[1:]:
+            item = item.strip()
+            ident = re.match(r"""("[^"]+"|[A-Za-z_][\w$]*)(\s*\.\s*("[^"]+"|[A-Za-z_][\w$]*))?""", item)
+            if ident:
+                tables.add(_unquote_identifier(ident.group(0)))
+    return {t for t in tables if t not in cte_names and t.lower() not in ("select", "lateral", "unnest")}
+
+
+def is_cacheable_sql(sql_query: str) -> bool:
+    """False for queries whose results depend on the wall clock or randomness."""
+    return not _VOLATILE_RE.search(normalize_sql(sql_query))
+
+
+def dataframe_to_bytes(df: pd.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False, compression="zstd")
+    return buffer.getvalue()
+
+
+def dataframe_from_bytes(payload: bytes) -> pd.DataFrame:
+    return pd.read_parquet(io.BytesIO(payload))
+
+
+class ResultCache:
+    """Memory-bounded LRU cache of query results keyed by normalized SQL.
+
+    Results are stored as compressed Parquet bytes together with the version of every
+    table the query reads. ``version_provider(tables)`` returns the current versions;
+    it is consulted at most once per ``version_check_interval`` seconds per table, and an
+    entry whose tables have moved on is dropped. ``variant`` separates results of the same
+    SQL fetched differently (e.g. a streamed sample under a row budget) from full results.
+    """
+
+    def __init__(self, max_bytes: int, version_provider: Callable[[set], dict] | None = None,
+                 version_check_interval: float = 5.0, ttl_seconds: float | None = None,
+                 max_entry_bytes: int | None = None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes or max(1, max_bytes // 4)
+        self.version_provider = version_provider
+        self.version_check_interval = version_check_interval
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self._known_versions: dict[str, tuple[int, float]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0, "skipped_too_large": 0}
+
+    def _current_versions(self, tables: set) -> dict:
+        if not tables or self.version_provider is None:
+            return {}
+        now = time.monotonic()
+        with self._lock:
+            stale = {t for t in tables if t not in self._known_versions
+                     or now - self._known_versions[t][1] > self.version_check_interval}
+        if stale:
+            fresh = self.version_provider(stale)
+            with self._lock:
+                for table in stale:
+                    self._known_versions[table] = (fresh.get(table, 0), now)
+        with self._lock:
+            return {t: self._known_versions[t][0] for t in tables}
+
+    def _drop_locked(self, key: tuple[str, str]):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry["payload"])
+
+    def get(self, sql_query: str, variant: str = "") -> pd.DataFrame | None:
+        """The cached complete result, or None (entries holding a sample or a truncated result are misses)."""
+        entry = self.lookup(sql_query, variant, complete_only=True)
+        return entry[0] if entry is not None else None
+
+    def lookup(self, sql_query: str, variant: str = "", complete_only: bool = False) -> tuple[pd.DataFrame, dict] | None:
+        """Returns (DataFrame, metadata) for a valid cached result, or None."""
+        key = (variant, normalize_sql(sql_query))
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            self._count("misses")
+            return None
+        if complete_only and (entry["metadata"].get("sampled") or entry["metadata"].get("truncated")):
+            self._count("misses")
+            return None
+        expired = self.ttl_seconds and time.time() - entry["created_at"] > self.ttl_seconds
+        if expired or self._current_versions(entry["tables"]) != entry["versions"]:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    self._drop_locked(key)
+                self._counters["invalidations"] += 1
+                self._counters["misses"] += 1
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+        return dataframe_from_bytes(entry["payload"]), dict(entry["metadata"])
+
+    def versions_for(self, sql_query: str) -> dict:
+        """Current versions of the tables a query reads; take them before running it and pass them to put()."""
+        return self._current_versions(referenced_tables(sql_query))
+
+    def put(self, sql_query: str, df: pd.DataFrame, metadata: dict | None = None,
+            versions: dict | None = None, variant: str = "") -> bool:
+        """Caches a result plus optional metadata (e.g. truncation info). Returns False if not cacheable or too large.
+
+        ``versions`` should come from versions_for() before the query ran: versions read after
+        it would label a result computed before a concurrent ingest as current.
+        """
+        if not is_cacheable_sql(sql_query):
+            return False
+        key = (variant, normalize_sql(sql_query))
+        tables = referenced_tables(sql_query)
+        if versions is None:
+            versions = self._current_versions(tables)
+        try:
+            payload = dataframe_to_bytes(df)
+        except Exception as e:
+            logger.warning(f"Could not serialize result for caching: {e}")
+            return False
+        if len(payload) > self.max_entry_bytes:
+            self._count("skipped_too_large")
+            return False
+        with self._lock:
+            self._drop_locked(key)
+            self._entries[key] = {
+                "payload": payload,
+                "metadata": dict(metadata or {}),
+                "tables": tables,
+                "versions": versions,
+                "created_at": time.time(),
+            }
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._drop_locked(oldest)
+                self._counters["evictions"] += 1
+            self._counters["stores"] += 1
+        return True
+
+    def invalidate_tables(self, table_names):
+        """Drops every cached result that reads from any of the given tables."""
+        table_names = {t.lower() for t in table_names}
+        with self._lock:
+            for table in table_names:
+                self._known_versions.pop(table, None)
+            stale = [k for k, e in self._entries.items() if e["tables"] & table_names]
+            for key in stale:
+                self._drop_locked(key)
+            self._counters["invalidations"] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._known_versions.clear()
+            self._bytes = 0
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update({"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes})
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
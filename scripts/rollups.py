@@ -0,0 +1,442 @@
+import re
+import sys
+import logging
+import argparse
+
+import psycopg2
+from psycopg2 import sql
+
+from result_cache import normalize_sql
+from table_versions import bump_table_versions
+
+logger = logging.getLogger(__name__)
+
+# Counting stats aggregated by the rollups, when the source table has them (lower-cased nba_api headers).
+ROLLUP_STATS = ["gp", "w", "l", "min", "pts", "reb", "oreb", "dreb", "ast", "stl", "blk", "tov", "pf",
+                "fgm", "fga", "fg3m", "fg3a", "ftm", "fta", "plus_minus"]
+# Shooting percentages derived from made/attempted totals.
+PERCENTAGES = {"fg_pct": ("fgm", "fga"), "fg3_pct": ("fg3m", "fg3a"), "ft_pct": ("ftm", "fta")}
+# Per-game averages exposed as friendly columns.
+PER_GAME_STATS = ["min", "pts", "reb", "oreb", "dreb", "ast", "stl", "blk", "tov", "pf", "fg3m", "plus_minus"]
+LEADERBOARD_STATS = ["pts", "reb", "ast", "stl", "blk", "fg3m"]
+LEADERBOARD_SIZE = 10
+LEADERBOARD_MIN_GAMES_FRACTION = 0.5  # Of the most games played by anyone that season, as the NBA's qualifier does
+
+# Suffixes of the exact, re-aggregatable measure columns the rewriter relies on.
+_MEASURE_SUFFIXES = ("_sum", "_count", "_min", "_max", "_gp_sum")
+ROW_COUNT_COLUMN = "row_count"
+
+
+class Rollup:
+    """A materialized view over one source table.
+
+    Aggregate rollups group the source by ``dimensions`` and store, per available stat,
+    exact measures (``<stat>_sum``, ``_count``, ``_min``, ``_max``, ``_gp_sum``) that the
+    rewriter can re-aggregate, plus friendly derived columns (totals, per-game averages,
+    shooting percentages) for the LLM. ``extra_columns`` maps alias -> (expression, source
+    column it needs); ``build`` replaces the generated SQL for special rollups.
+    """
+
+    def __init__(self, name: str, source_table: str, dimensions: list[str], description: str,
+                 extra_columns: dict[str, tuple[str, str]] | None = None, build=None, unique_key: list[str] | None = None):
+        self.name = name
+        self.source_table = source_table
+        self.dimensions = dimensions
+        self.description = description
+        self.extra_columns = extra_columns or {}
+        self.build = build
+        self.unique_key = unique_key
+
+    @property
+    def rewritable(self) -> bool:
+        return self.build is None
+
+    def select_sql(self, source_columns: set[str]) -> str | None:
+        """The view's SELECT for a source table with ``source_columns``, or None if it lacks the dimensions."""
+        if self.build is not None:
+            return self.build(self, source_columns)
+        dimensions = [d for d in self.dimensions if d in source_columns]
+        if len(dimensions) != len(self.dimensions):
+            return None
+        stats = [s for s in ROLLUP_STATS if s in source_columns]
+        items = [f"count(*) AS {ROW_COUNT_COLUMN}"]
+        for stat in stats:
+            items += [f"sum({stat}) AS {stat}_sum", f"count({stat}) AS {stat}_count",
+                      f"min({stat}) AS {stat}_min", f"max({stat}) AS {stat}_max"]
+            if stat != "gp" and "gp" in stats:
+                items.append(f"sum({stat} * gp) AS {stat}_gp_sum")
+        if "gp" in stats:
+            items.append("sum(gp) AS games")
+            for stat in stats:
+                if stat != "gp":
+                    # PerGame rows hold averages, Totals rows totals; other per-modes have no meaningful total.
+                    items.append(f"sum(CASE per_mode WHEN 'PerGame' THEN {stat} * gp WHEN 'Totals' THEN {stat} END) AS {stat}_total")
+            for stat in PER_GAME_STATS:
+                if stat in stats:
+                    items.append(
+                        f"sum(CASE per_mode WHEN 'PerGame' THEN {stat} * gp WHEN 'Totals' THEN {stat} END)"
+                        f" / nullif(sum(CASE WHEN per_mode IN ('PerGame', 'Totals') THEN gp END), 0) AS {stat}_per_game"
+                    )
+            for pct, (made, attempted) in PERCENTAGES.items():
+                if made in stats and attempted in stats:
+                    items.append(
+                        f"sum(CASE per_mode WHEN 'PerGame' THEN {made} * gp WHEN 'Totals' THEN {made} END)"
+                        f" / nullif(sum(CASE per_mode WHEN 'PerGame' THEN {attempted} * gp WHEN 'Totals' THEN {attempted} END), 0) AS {pct}"
+                    )
+        for alias, (expression, required_column) in self.extra_columns.items():
+            if required_column in source_columns:
+                items.append(f"{expression} AS {alias}")
+        return (
+            f"SELECT {', '.join(dimensions)}, {', '.join(items)} "
+            f"FROM {self.source_table} GROUP BY {', '.join(dimensions)}"
+        )
+
+
+def _build_league_leaders(rollup: Rollup, source_columns: set[str]) -> str | None:
+    """Top LEADERBOARD_SIZE qualified players per season, season type and stat (per game, from PerGame rows)."""
+    stats = [s for s in LEADERBOARD_STATS if f"{s}_per_game" in source_columns]
+    if not stats or "games" not in source_columns:
+        return None
+    values = ", ".join(f"('{stat}', q.{stat}_per_game)" for stat in stats)
+    return f"""
+        SELECT season, season_type, stat, rank, player_id, player_name, value, games
+        FROM (
+            SELECT q.season, q.season_type, v.stat, q.player_id, q.player_name, v.value, q.games,
+                   rank() OVER (PARTITION BY q.season, q.season_type, v.stat ORDER BY v.value DESC, q.player_id) AS rank
+            FROM (
+                SELECT s.*, max(s.games) OVER (PARTITION BY s.season, s.season_type) AS most_games
+                FROM {rollup.source_table} s
+                WHERE s.per_mode = 'PerGame'
+            ) q
+            CROSS JOIN LATERAL (VALUES {values}) AS v(stat, value)
+            WHERE v.value IS NOT NULL AND q.games >= {LEADERBOARD_MIN_GAMES_FRACTION} * q.most_games
+        ) ranked
+        WHERE rank <= {LEADERBOARD_SIZE}
+    """
+
+
+# In dependency order: a rollup may read from one defined before it.
+ROLLUPS = [
+    Rollup(
+        "rollup_player_career", "player_stats", ["player_id", "player_name", "season_type", "per_mode"],
+        "One row per player and season type over all loaded seasons: career games, totals, per-game averages and shooting percentages.",
+        extra_columns={"seasons": ("count(DISTINCT season)", "season"), "first_season": ("min(season)", "season"),
+                       "last_season": ("max(season)", "season"),
+                       "teams": ("string_agg(DISTINCT team_abbreviation, '/')", "team_abbreviation")},
+    ),
+    Rollup(
+        "rollup_player_season", "player_stats", ["player_id", "player_name", "season", "season_type", "per_mode"],
+        "One row per player, season and season type (stints with several teams combined): games, totals, per-game averages and shooting percentages.",
+        extra_columns={"teams": ("string_agg(DISTINCT team_abbreviation, '/')", "team_abbreviation")},
+    ),
+    Rollup(
+        "rollup_team_season", "team_stats", ["team_id", "team_name", "season", "season_type", "per_mode"],
+        "One row per team, season and season type: games, wins/losses, totals, per-game averages and shooting percentages.",
+    ),
+    Rollup(
+        "rollup_league_leaders", "rollup_player_season", [],
+        f"Top {LEADERBOARD_SIZE} players per season, season type and stat ('pts', 'reb', 'ast', 'stl', 'blk', 'fg3m') by per-game value, "
+        f"among players with at least {int(LEADERBOARD_MIN_GAMES_FRACTION * 100)}% of the season's most games played.",
+        build=_build_league_leaders, unique_key=["season", "season_type", "stat", "player_id"],
+    ),
+]
+ROLLUPS_BY_NAME = {rollup.name: rollup for rollup in ROLLUPS}
+
+
+def _relation_columns(cursor, names) -> dict[str, set[str]]:
+    """Columns of existing tables and materialized views in 'public' (information_schema omits matviews)."""
+    cursor.execute("""
+        SELECT c.relname, a.attname
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+        WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p', 'm', 'v') AND c.relname = ANY(%s)
+    """, (list(names),))
+    columns: dict[str, set[str]] = {}
+    for relation, column in cursor.fetchall():
+        columns.setdefault(relation, set()).add(column)
+    return columns
+
+
+def ensure_rollups(conn, recreate: bool = False) -> list[str]:
+    """Creates (or with ``recreate`` rebuilds, e.g. after new stat columns appeared) every rollup whose source exists."""
+    created = []
+    with conn.cursor() as cursor:
+        for rollup in ROLLUPS:
+            existing = _relation_columns(cursor, [rollup.name, rollup.source_table])
+            if rollup.name in existing and not recreate:
+                continue
+            if rollup.source_table not in existing:
+                logger.info(f"Skipping {rollup.name}: source {rollup.source_table} does not exist.")
+                continue
+            select = rollup.select_sql(existing[rollup.source_table])
+            if select is None:
+                logger.info(f"Skipping {rollup.name}: {rollup.source_table} lacks the required columns.")
+                continue
+            name = sql.Identifier(rollup.name)
+            cursor.execute(sql.SQL("DROP MATERIALIZED VIEW IF EXISTS {} CASCADE").format(name))
+            cursor.execute(sql.SQL("CREATE MATERIALIZED VIEW {} AS ").format(name) + sql.SQL(select))
+            # A unique index makes REFRESH ... CONCURRENTLY possible (readers are never blocked).
+            key = rollup.unique_key or rollup.dimensions
+            cursor.execute(sql.SQL("CREATE UNIQUE INDEX {} ON {} ({})").format(
+                sql.Identifier(f"{rollup.name}_key_idx"), name, sql.SQL(", ").join(map(sql.Identifier, key))
+            ))
+            created.append(rollup.name)
+            logger.info(f"Created materialized view {rollup.name}.")
+    conn.commit()
+    return created
+
+
+def refresh_rollups(conn, changed_tables=None) -> list[str]:
+    """Refreshes rollups that read (directly or through another rollup) from ``changed_tables`` (all if None).
+
+    Called by the ingest after loading data; bumps the refreshed rollups' table versions so
+    cached results computed from them are invalidated.
+    """
+    created = ensure_rollups(conn)
+    changed = None if changed_tables is None else {name.lower() for name in changed_tables}
+    refreshed = []
+    # autocommit: REFRESH ... CONCURRENTLY cannot run inside a transaction block.
+    previous_autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            existing = _relation_columns(cursor, [rollup.name for rollup in ROLLUPS])
+            for rollup in ROLLUPS:
+                if rollup.name not in existing:
+                    continue
+                if changed is not None and rollup.source_table not in changed and rollup.source_table not in refreshed:
+                    continue
+                if rollup.name in created:  # Populated just now
+                    refreshed.append(rollup.name)
+                    continue
+                try:
+                    cursor.execute(sql.SQL("REFRESH MATERIALIZED VIEW CONCURRENTLY {}").format(sql.Identifier(rollup.name)))
+                except psycopg2.errors.FeatureNotSupported:  # Never populated yet
+                    cursor.execute(sql.SQL("REFRESH MATERIALIZED VIEW {}").format(sql.Identifier(rollup.name)))
+                cursor.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(rollup.name)))
+                refreshed.append(rollup.name)
+                logger.info(f"Refreshed materialized view {rollup.name}.")
+    finally:
+        conn.autocommit = previous_autocommit
+    if refreshed:
+        bump_table_versions(conn, refreshed)
+    return refreshed
+
+
+def fetch_rollup_columns(conn) -> dict[str, set[str]]:
+    """Columns of the rollups that exist and are populated."""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT matviewname FROM pg_matviews WHERE schemaname = 'public' AND ispopulated AND matviewname = ANY(%s)",
+                       ([rollup.name for rollup in ROLLUPS],))
+        populated = [row[0] for row in cursor.fetchall()]
+        columns = _relation_columns(cursor, populated) if populated else {}
+    conn.rollback()
+    return columns
+
+
+def render_preferred_sources(rollup_columns: dict[str, set[str]]) -> str | None:
+    """Prompt section listing the available rollups and their friendly (non-measure) columns."""
+    if not rollup_columns:
+        return None
+    lines = ["Preferred Sources (pre-computed materialized views; query these instead of aggregating the base tables whenever they can answer the question):"]
+    for rollup in ROLLUPS:
+        columns = rollup_columns.get(rollup.name)
+        if not columns:
+            continue
+        friendly = [c for c in sorted(columns) if not c.endswith(_MEASURE_SUFFIXES) and c not in rollup.dimensions]
+        key = rollup.unique_key or rollup.dimensions
+        lines.append(f"*   `{rollup.name}` (one row per {', '.join(key)}): {rollup.description}")
+        lines.append(f"        Columns: {', '.join(key + [c for c in friendly if c not in key])}")
+    lines.append("")
+    return "\n".join(lines)
+
+
+# --- Rewriter ---
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_IDENT_RE = re.compile(r"(?<![\w$.])([a-z_][\w$]*)(?![\w$])(?!\s*\()", re.I)
+_AGG_START_RE = re.compile(r"\b(sum|count|avg|min|max)\s*\(", re.I)
+_UNSUPPORTED_RE = re.compile(
+    r"\b(join|union|intersect|except|with|distinct|over|filter|grouping|rollup|cube|lateral|window|into|for)\b|\(\s*select\b|\"|;", re.I
+)
+_QUERY_RE = re.compile(
+    r"^select\s+(?P<select>.+?)\s+from\s+(?P<table>[a-z_][\w$]*)"
+    r"(?:\s+(?:as\s+)?(?P<alias>(?!where\b|group\b)[a-z_][\w$]*))?"
+    r"(?:\s+where\s+(?P<where>.+?))?"
+    r"\s+group\s+by\s+(?P<group>.+?)"
+    r"(?P<tail>\s+(?:having|order\s+by|limit)\s.*)?$",
+    re.I | re.S,
+)
+_ALLOWED_WORDS = {
+    "and", "or", "not", "in", "is", "null", "like", "ilike", "between", "true", "false", "as", "asc", "desc",
+    "nulls", "first", "last", "limit", "offset", "having", "order", "by", "case", "when", "then", "else", "end",
+    "numeric", "float", "int", "integer", "bigint", "double", "precision", "real", "text", "varchar", "decimal",
+}
+
+
+def _split_top_level(text: str, separator: str = ",") -> list[str]:
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(text):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts]
+
+
+def _blank_measures(expression: str) -> str:
+    """Blanks out the rollup aggregate calls the rewriter inserted, leaving the identifiers still to be checked."""
+    return re.sub(r"\b(SUM|MIN|MAX|NULLIF)\((?:[a-z_][\w$]*|SUM\([a-z_][\w$]*\), 0)\)", "0", expression)
+
+
+class RollupRewriter:
+    """Conservatively redirects single-table GROUP BY queries to a rollup that can answer them exactly.
+
+    A query qualifies only if every WHERE/GROUP BY/HAVING/ORDER BY column is a dimension
+    of the rollup and every aggregate is one the rollup pre-computes: ``count(*)``,
+    ``sum/count/min/max/avg(stat)`` and ``sum(stat * gp)``. Those are re-aggregated over
+    the rollup (SUM of sums, MIN of minimums, ...), which gives the same result as
+    aggregating the base table. Anything else (joins, subqueries, DISTINCT, window
+    functions, quoted identifiers) is left untouched.
+    """
+
+    def __init__(self, rollup_columns: dict[str, set[str]]):
+        self.candidates: dict[str, list[tuple[Rollup, set[str]]]] = {}
+        for rollup in ROLLUPS:
+            columns = rollup_columns.get(rollup.name)
+            if rollup.rewritable and columns:
+                self.candidates.setdefault(rollup.source_table, []).append((rollup, columns))
+        for candidates in self.candidates.values():
+            candidates.sort(key=lambda item: len(item[0].dimensions))  # Coarsest (smallest) rollup first
+
+    def rewrite(self, sql_query: str) -> tuple[str, str | None]:
+        """Returns (sql, rollup name) — the original SQL and None when no rollup applies."""
+        text = normalize_sql(sql_query)
+        literals = []
+        masked = _LITERAL_RE.sub(lambda m: literals.append(m.group(0)) or f"__lit{len(literals) - 1}__", text)
+        if _UNSUPPORTED_RE.search(masked):
+            return sql_query, None
+        match = _QUERY_RE.match(masked)
+        if not match or match.group("table").lower() not in self.candidates:
+            return sql_query, None
+        parts = {key: (match.group(key) or "") for key in ("select", "where", "group", "tail")}
+        alias = match.group("alias")
+        if alias:
+            prefix = re.compile(rf"\b{re.escape(alias)}\s*\.\s*", re.I)
+            parts = {key: prefix.sub("", value) for key, value in parts.items()}
+        if re.search(r"[\w$]\s*\.\s*[a-z_]", " ".join(parts.values()), re.I):
+            return sql_query, None  # Qualified names we cannot resolve
+        for rollup, columns in self.candidates[match.group("table").lower()]:
+            rewritten = self._rewrite_for(rollup, columns, parts)
+            if rewritten is not None:
+                for i, literal in enumerate(literals):
+                    rewritten = rewritten.replace(f"__lit{i}__", literal)
+                logger.info(f"Rewrote query to use {rollup.name}.")
+                return rewritten, rollup.name
+        return sql_query, None
+
+    def _rewrite_aggregates(self, expression: str, columns: set[str]) -> str | None:
+        """Replaces every aggregate call in ``expression`` with its rollup equivalent, or None if one is unsupported."""
+        out, pos = [], 0
+        for start_match in _AGG_START_RE.finditer(expression):
+            if start_match.start() < pos:
+                continue
+            depth, end = 1, start_match.end()
+            while end < len(expression) and depth:
+                depth += {"(": 1, ")": -1}.get(expression[end], 0)
+                end += 1
+            if depth:
+                return None
+            function = start_match.group(1).lower()
+            argument = re.sub(r"\s+", "", expression[start_match.end():end - 1]).lower()
+            replacement = self._measure(function, argument, columns)
+            if replacement is None:
+                return None
+            out.append(expression[pos:start_match.start()])
+            out.append(replacement)
+            pos = end
+        out.append(expression[pos:])
+        return "".join(out)
+
+    @staticmethod
+    def _measure(function: str, argument: str, columns: set[str]) -> str | None:
+        if function == "count" and argument in ("*", "1"):
+            return f"SUM({ROW_COUNT_COLUMN})"
+        weighted = re.fullmatch(r"([a-z_][\w$]*)\*gp|gp\*([a-z_][\w$]*)", argument)
+        if function == "sum" and weighted:
+            stat = weighted.group(1) or weighted.group(2)
+            return f"SUM({stat}_gp_sum)" if f"{stat}_gp_sum" in columns else None
+        if not re.fullmatch(r"[a-z_][\w$]*", argument) or f"{argument}_sum" not in columns:
+            return None
+        return {
+            "sum": f"SUM({argument}_sum)",
+            "count": f"SUM({argument}_count)",
+            "min": f"MIN({argument}_min)",
+            "max": f"MAX({argument}_max)",
+            "avg": f"(SUM({argument}_sum)::numeric / NULLIF(SUM({argument}_count), 0))",
+        }[function]
+
+    @staticmethod
+    def _only_dimensions(expression: str, allowed: set[str]) -> bool:
+        for identifier in _IDENT_RE.findall(expression):
+            name = identifier.lower()
+            if name not in allowed and name not in _ALLOWED_WORDS and not re.fullmatch(r"__lit\d+__", name):
+                return False
+        return True
+
+    def _rewrite_for(self, rollup: Rollup, columns: set[str], parts: dict) -> str | None:
+        dimensions = set(rollup.dimensions)
+        select_items, aliases = [], set()
+        for item in _split_top_level(parts["select"]):
+            alias_match = re.fullmatch(r"(?P<expr>.+?)\s+as\s+(?P<alias>[a-z_][\w$]*)", item, re.I | re.S)
+            expression, alias = (alias_match.group("expr"), alias_match.group("alias")) if alias_match else (item, None)
+            rewritten = self._rewrite_aggregates(expression, columns)
+            if rewritten is None or not self._only_dimensions(_blank_measures(rewritten), dimensions):
+                return None
+            if alias:
+                aliases.add(alias.lower())
+            select_items.append(f"{rewritten} AS {alias}" if alias else rewritten)
+        if parts["where"] and (_AGG_START_RE.search(parts["where"]) or not self._only_dimensions(parts["where"], dimensions)):
+            return None
+        for item in _split_top_level(parts["group"]):
+            if item.lower() not in dimensions and not item.isdigit():
+                return None
+        tail = parts["tail"]
+        if tail:
+            tail = self._rewrite_aggregates(tail, columns)
+            if tail is None or not self._only_dimensions(_blank_measures(tail), dimensions | aliases):
+                return None
+        rewritten_sql = f"SELECT {', '.join(select_items)} FROM {rollup.name}"
+        if parts["where"]:
+            rewritten_sql += f" WHERE {parts['where']}"
+        rewritten_sql += f" GROUP BY {parts['group']}"
+        return rewritten_sql + (tail or "")
+
+
+def main(argv=None) -> int:
+    from stats_loader import connect_from_env
+
+    parser = argparse.ArgumentParser(description="Create or refresh the HoopSense rollup materialized views.")
+    parser.add_argument('action', choices=['create', 'refresh', 'recreate'])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    conn = connect_from_env()
+    try:
+        if args.action == 'refresh':
+            print(f"Refreshed: {refresh_rollups(conn)}")
+        else:
+            print(f"Created: {ensure_rollups(conn, recreate=args.action == 'recreate')}")
+            if args.action == 'recreate':
+                bump_table_versions(conn, [rollup.name for rollup in ROLLUPS])
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
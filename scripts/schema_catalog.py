@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import logging
+import threading
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# One cheap pass over the system catalogs; any column, type, default, PK or FK change alters the hash.
+CATALOG_CHECKSUM_SQL = """
+    SELECT md5(coalesce(string_agg(entry, ';' ORDER BY entry), ''))
+    FROM (
+        SELECT c.relname || '.' || a.attname || ':' || format_type(a.atttypid, a.atttypmod)
+               || ':' || a.attnotnull::text || ':' || coalesce(pg_get_expr(d.adbin, d.adrelid), '') AS entry
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+        LEFT JOIN pg_attrdef d ON d.adrelid = c.oid AND d.adnum = a.attnum
+        WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p')
+        UNION ALL
+        SELECT con.conrelid::regclass::text || ':' || con.conname || ':' || pg_get_constraintdef(con.oid)
+        FROM pg_constraint con
+        JOIN pg_namespace n ON n.oid = con.connamespace
+        WHERE n.nspname = 'public' AND con.contype IN ('p', 'f')
+    ) AS catalog_entries;
+"""
+
+COLUMNS_SQL = """
+    SELECT c.table_name, c.column_name, c.data_type, c.is_nullable, c.column_default
+    FROM information_schema.columns c
+    JOIN information_schema.tables t
+        ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+    WHERE c.table_schema = 'public' AND t.table_type = 'BASE TABLE'
+    ORDER BY c.table_name, c.ordinal_position;
+"""
+
+PRIMARY_KEYS_SQL = """
+    SELECT tc.table_name, kcu.column_name
+    FROM information_schema.table_constraints tc
+    JOIN information_schema.key_column_usage kcu
+        ON tc.constraint_name = kcu.constraint_name AND tc.table_schema = kcu.table_schema
+    WHERE tc.constraint_type = 'PRIMARY KEY' AND tc.table_schema = 'public'
+    ORDER BY tc.table_name, kcu.ordinal_position;
+"""
+
+FOREIGN_KEYS_SQL = """
+    SELECT
+        tc.table_name,
+        kcu.column_name,
+        ccu.table_name AS foreign_table_name,
+        ccu.column_name AS foreign_column_name
+    FROM information_schema.table_constraints AS tc
+    JOIN information_schema.key_column_usage AS kcu
+        ON tc.constraint_name = kcu.constraint_name AND tc.table_schema = kcu.table_schema
+    JOIN information_schema.constraint_column_usage AS ccu
+        ON ccu.constraint_name = tc.constraint_name AND ccu.table_schema = tc.table_schema
+    WHERE tc.constraint_type = 'FOREIGN KEY' AND tc.table_schema = 'public'
+    ORDER BY tc.table_name, kcu.column_name;
+"""
+
+SQL_GENERATION_GUIDELINES = [
+    "General SQL Generation Guidelines:",
+    "- Prioritize PostgreSQL compatible SQL.",
+    "- Use table aliases for clarity if joining multiple tables.",
+    "- For percentage calculations (e.g., 3PT%), if not directly available, calculate using appropriate fields (e.g., (SUM(fg3m) * 100.0 / SUM(fg3a)) AS three_point_percentage). Handle potential division by zero if necessary.",
+    "- Pay close attention to data types for comparisons, aggregations, and functions.",
+]
+
+
+def fetch_catalog_checksum(conn) -> str:
+    """Returns a hash of the public schema's tables, columns and keys."""
+    with conn.cursor() as cursor:
+        cursor.execute(CATALOG_CHECKSUM_SQL)
+        checksum = cursor.fetchone()[0]
+    conn.rollback()
+    return checksum
+
+
+def fetch_catalog(conn) -> dict:
+    """Fetches every table's columns, primary key and foreign keys in three set-based queries."""
+    tables: dict[str, dict] = {}
+    with conn.cursor() as cursor:
+        cursor.execute(COLUMNS_SQL)
+        for table_name, col_name, data_type, is_nullable, col_default in cursor.fetchall():
+            table = tables.setdefault(table_name, {"columns": [], "primary_key": [], "foreign_keys": []})
+            table["columns"].append({
+                "name": col_name,
+                "type": data_type,
+                "nullable": is_nullable != 'NO',
+                "default": col_default,
+            })
+
+        cursor.execute(PRIMARY_KEYS_SQL)
+        for table_name, col_name in cursor.fetchall():
+            if table_name in tables:
+                tables[table_name]["primary_key"].append(col_name)
+
+        cursor.execute(FOREIGN_KEYS_SQL)
+        for table_name, col_name, f_table, f_col in cursor.fetchall():
+            if table_name in tables:
+                tables[table_name]["foreign_keys"].append({"column": col_name, "ref_table": f_table, "ref_column": f_col})
+    conn.rollback()
+    return dict(sorted(tables.items()))
+
+
+def render_table_description(index: int, table_name: str, table: dict, columns: list[str] | None = None) -> list[str]:
+    """Prompt lines for one table; ``columns`` restricts which columns are listed."""
+    lines = [f"{index}. `{table_name}` table:"]
+    for column in table["columns"]:
+        if columns is not None and column["name"] not in columns:
+            continue
+        col_desc = f"    *   `{column['name']}` ({column['type'].upper()})"
+        if not column["nullable"]:
+            col_desc += ", NOT NULL"
+        if column["default"]:
+            col_desc += f", DEFAULT {column['default']}"
+        lines.append(col_desc)
+    if table["primary_key"]:
+        lines.append(f"        Primary Key(s): ({', '.join(table['primary_key'])})")
+    if table["foreign_keys"]:
+        lines.append("        Foreign Key(s):")
+        for fk in table["foreign_keys"]:
+            lines.append(f"            `{fk['column']}` REFERENCES `{fk['ref_table']}`(`{fk['ref_column']}`)")
+    lines.append("")  # Add a newline for readability
+    return lines
+
+
+def render_schema_description(catalog: dict) -> str:
+    """Renders a catalog into the schema overview included in the NL-to-SQL prompt."""
+    schema_parts = ["Database Schema Overview (Dynamically Fetched):\n"]
+    for i, (table_name, table) in enumerate(catalog["tables"].items()):
+        schema_parts.extend(render_table_description(i + 1, table_name, table))
+    schema_parts.extend(SQL_GENERATION_GUIDELINES)
+    return "\n".join(schema_parts)
+
+
+class SchemaCatalogLoader:
+    """Loads the schema catalog lazily and keeps it in memory and on disk.
+
+    ``fetch_checksum()`` must be cheap; ``fetch_tables()`` does the full introspection and
+    only runs when the checksum differs from the cached catalog. A catalog checked less
+    than ``refresh_interval`` seconds ago (by any process sharing ``cache_path``) is used
+    without touching the database at all.
+    """
+
+    def __init__(self, fetch_checksum: Callable[[], str], fetch_tables: Callable[[], dict],
+                 cache_path: str | None = None, refresh_interval: float = 300.0,
+                 retry_after: float = 30.0):
+        self.fetch_checksum = fetch_checksum
+        self.fetch_tables = fetch_tables
+        self.cache_path = cache_path
+        self.refresh_interval = refresh_interval
+        self.retry_after = retry_after
+        self._catalog: dict | None = None
+        self._last_failure_at = None
+        self._lock = threading.Lock()
+
+    def _read_disk_cache(self) -> dict | None:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                catalog = json.load(f)
+            if "fingerprint" in catalog and "tables" in catalog:
+                return catalog
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable schema cache at {self.cache_path}: {e}")
+        return None
+
+    def _write_disk_cache(self, catalog: dict):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(catalog, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write schema cache to {self.cache_path}: {e}")
+
+    def _is_fresh(self, catalog: dict | None) -> bool:
+        return catalog is not None and time.time() - catalog.get("checked_at", 0) < self.refresh_interval
+
+    def get(self, force_refresh: bool = False) -> dict | None:
+        """Returns the current catalog, or None if it could not be loaded."""
+        catalog = self._catalog
+        if not force_refresh and self._is_fresh(catalog):
+            return catalog
+        with self._lock:
+            if not force_refresh and self._is_fresh(self._catalog):
+                return self._catalog
+            if self._catalog is None and not force_refresh:
+                disk_catalog = self._read_disk_cache()
+                if self._is_fresh(disk_catalog):
+                    logger.info("Loaded schema catalog from disk cache.")
+                    self._catalog = disk_catalog
+                    return disk_catalog
+                self._catalog = disk_catalog
+            if self._last_failure_at and not force_refresh and time.time() - self._last_failure_at < self.retry_after:
+                return self._catalog
+            try:
+                self._catalog = self._refresh(self._catalog)
+                self._last_failure_at = None
+            except Exception as e:
+                logger.error(f"Error fetching database schema: {e}")
+                self._last_failure_at = time.time()
+            return self._catalog
+
+    def _refresh(self, current: dict | None) -> dict:
+        checksum = self.fetch_checksum()
+        if current is not None and current["fingerprint"] == checksum:
+            current = dict(current, checked_at=time.time())
+            logger.debug("Schema checksum unchanged; keeping cached catalog.")
+        else:
+            started = time.perf_counter()
+            current = {"fingerprint": checksum, "tables": self.fetch_tables(), "checked_at": time.time()}
+            logger.info(f"Fetched schema for {len(current['tables'])} tables in {time.perf_counter() - started:.3f}s.")
+        self._write_disk_cache(current)
+        return current
+
+    def invalidate(self):
+        """Forgets the in-memory catalog so the next get() re-validates it."""
+        with self._lock:
+            if self._catalog is not None:
+                self._catalog = dict(self._catalog, checked_at=0)
@@ -0,0 +1,130 @@
+import re
+import math
+import logging
+from collections import defaultdict
+
+from schema_catalog import SQL_GENERATION_GUIDELINES, render_table_description
+
+logger = logging.getLogger(__name__)
+
+# Basketball vocabulary -> column names (as stored by the ingest, i.e. lower-cased nba_api headers).
+STAT_SYNONYMS = {
+    "points": ["pts"], "ppg": ["pts"], "scoring": ["pts"], "scored": ["pts"],
+    "rebounds": ["reb", "oreb", "dreb"], "rpg": ["reb"], "boards": ["reb"],
+    "offensive rebounds": ["oreb"], "defensive rebounds": ["dreb"],
+    "assists": ["ast"], "apg": ["ast"], "dimes": ["ast"],
+    "steals": ["stl"], "blocks": ["blk"], "turnovers": ["tov"], "fouls": ["pf"],
+    "3pt%": ["fg3_pct", "fg3m", "fg3a"], "3p%": ["fg3_pct", "fg3m", "fg3a"],
+    "3pt": ["fg3m", "fg3a", "fg3_pct"], "3-point": ["fg3m", "fg3a", "fg3_pct"],
+    "three point": ["fg3m", "fg3a", "fg3_pct"], "three-point": ["fg3m", "fg3a", "fg3_pct"],
+    "threes": ["fg3m", "fg3a", "fg3_pct"], "3s": ["fg3m", "fg3a"],
+    "fg%": ["fg_pct", "fgm", "fga"], "field goal": ["fgm", "fga", "fg_pct"], "shooting": ["fg_pct", "fg3_pct", "ft_pct"],
+    "ft%": ["ft_pct", "ftm", "fta"], "free throw": ["ftm", "fta", "ft_pct"],
+    "minutes": ["min"], "mpg": ["min"], "games": ["gp"], "games played": ["gp"],
+    "wins": ["w", "w_pct"], "losses": ["l"], "record": ["w", "l", "w_pct"], "win percentage": ["w_pct"],
+    "plus minus": ["plus_minus"], "+/-": ["plus_minus"], "efficiency": ["off_rating", "def_rating", "net_rating"],
+    "true shooting": ["ts_pct"], "usage": ["usg_pct"], "pace": ["pace"], "age": ["age"],
+    "double doubles": ["dd2"], "triple doubles": ["td3"], "fantasy": ["nba_fantasy_pts"],
+    "player": ["player_name", "player_id"], "players": ["player_name", "player_id"],
+    "team": ["team_name", "team_abbreviation", "team_id"], "teams": ["team_name", "team_abbreviation", "team_id"],
+    "season": ["season"], "playoffs": ["season_type"], "playoff": ["season_type"], "regular season": ["season_type"],
+    "position": ["position"], "shot chart": ["loc_x", "loc_y", "shot_made_flag"], "shots": ["shot_made_flag", "shot_type"],
+}
+
+# Columns that are always useful to the LLM when their table is included (keys, labels, partitions).
+_ANCHOR_COLUMN_RE = re.compile(r"(_id$|_name$|^name$|abbreviation|^season|^game_date$)")
+_WORD_RE = re.compile(r"[a-z0-9%+/-]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt-token estimate (~4 characters per token for English/SQL)."""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def _identifier_terms(name: str) -> list[str]:
+    terms = [t for t in re.split(r"[_\W]+", name.lower()) if t]
+    return terms + [name.lower()]
+
+
+def _query_terms(question: str) -> list[str]:
+    text = re.sub(r"\s+", " ", question.lower())
+    terms = _WORD_RE.findall(text)
+    for phrase, columns in STAT_SYNONYMS.items():
+        if re.search(rf"(?<![a-z0-9]){re.escape(phrase)}(?![a-z0-9])", text):
+            terms.extend(columns)
+    return terms
+
+
+class SchemaIndex:
+    """TF-IDF index over table and column names (plus basketball synonyms) of one schema catalog."""
+
+    def __init__(self, catalog: dict):
+        self.catalog = catalog
+        self.tables = catalog["tables"]
+        self._postings: dict[str, list[tuple[str, str | None]]] = defaultdict(list)
+        documents = []
+        for table_name, table in self.tables.items():
+            documents.append(((table_name, None), _identifier_terms(table_name)))
+            for column in table["columns"]:
+                documents.append(((table_name, column["name"]), _identifier_terms(column["name"])))
+        for doc_id, terms in documents:
+            for term in set(terms):
+                self._postings[term].append(doc_id)
+        self._idf = {term: math.log(1 + len(documents) / len(docs)) for term, docs in self._postings.items()}
+        # Undirected FK adjacency, used to pull in join partners.
+        self._neighbours: dict[str, set[str]] = defaultdict(set)
+        for table_name, table in self.tables.items():
+            for fk in table["foreign_keys"]:
+                if fk["ref_table"] in self.tables:
+                    self._neighbours[table_name].add(fk["ref_table"])
+                    self._neighbours[fk["ref_table"]].add(table_name)
+
+    def score(self, question: str) -> tuple[dict[str, float], dict[str, set[str]]]:
+        """Returns per-table scores and the matched columns per table."""
+        table_scores: dict[str, float] = defaultdict(float)
+        matched_columns: dict[str, set[str]] = defaultdict(set)
+        for term in _query_terms(question):
+            for table_name, column_name in self._postings.get(term, ()):
+                weight = self._idf[term]
+                if column_name is None:
+                    table_scores[table_name] += 2 * weight
+                else:
+                    table_scores[table_name] += weight
+                    matched_columns[table_name].add(column_name)
+        return dict(table_scores), dict(matched_columns)
+
+    def select(self, question: str, max_tables: int = 6) -> dict[str, set[str] | None] | None:
+        """Tables (and columns) relevant to the question, or None if nothing matched."""
+        table_scores, matched_columns = self.score(question)
+        if not table_scores:
+            return None
+        ranked = sorted(table_scores, key=lambda t: (-table_scores[t], t))[:max_tables]
+        selection: dict[str, set[str] | None] = {}
+        for table_name in ranked:
+            selection[table_name] = self._columns_for(table_name, matched_columns.get(table_name, set()))
+        # Follow FK edges so the LLM sees the tables it needs to join through.
+        for table_name in ranked:
+            for partner in sorted(self._neighbours.get(table_name, ())):
+                if partner not in selection and len(selection) < max_tables * 2:
+                    selection[partner] = self._columns_for(partner, set())
+        return selection
+
+    def _columns_for(self, table_name: str, matched: set[str]) -> set[str]:
+        table = self.tables[table_name]
+        columns = set(matched) | set(table["primary_key"])
+        columns |= {fk["column"] for fk in table["foreign_keys"]}
+        columns |= {c["name"] for c in table["columns"] if _ANCHOR_COLUMN_RE.search(c["name"].lower())}
+        for other in self.tables.values():
+            columns |= {fk["ref_column"] for fk in other["foreign_keys"] if fk["ref_table"] == table_name}
+        return columns
+
+    def render(self, question: str, max_tables: int = 6) -> str | None:
+        """Schema overview restricted to the relevant tables/columns, or None to fall back to the full schema."""
+        selection = self.select(question, max_tables=max_tables)
+        if not selection:
+            return None
+        schema_parts = ["Database Schema Overview (only the tables and columns relevant to this question):\n"]
+        for i, (table_name, columns) in enumerate(selection.items()):
+            schema_parts.extend(render_table_description(i + 1, table_name, self.tables[table_name], columns=columns))
+        schema_parts.extend(SQL_GENERATION_GUIDELINES)
+        return "\n".join(schema_parts)
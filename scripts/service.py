@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from contextlib import asynccontextmanager
+
+import query_engine
+from telemetry import Counter, Gauge, Histogram, render_prometheus
+
+# --- Configuration --- (query_engine has loaded scripts/.env by now)
+SERVICE_HOST = os.getenv("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.getenv("SERVICE_PORT", "8765"))
+SERVICE_UDS = os.getenv("SERVICE_UDS")  # Unix socket path; when set the service listens there instead of SERVICE_HOST:SERVICE_PORT
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "2"))  # Worker processes, each with its own warm client, caches and pool
+SERVICE_MAX_CONCURRENCY = int(os.getenv("SERVICE_MAX_CONCURRENCY", "8"))  # Questions processed at once per worker
+SERVICE_MAX_QUEUE = int(os.getenv("SERVICE_MAX_QUEUE", "32"))  # Questions waiting per worker; more are rejected with 503
+SERVICE_QUEUE_TIMEOUT = float(os.getenv("SERVICE_QUEUE_TIMEOUT", "10"))  # Seconds a question may wait for a slot before a 503
+SERVICE_MAX_BODY_BYTES = int(os.getenv("SERVICE_MAX_BODY_BYTES", "65536"))
+SERVICE_SCHEMA_WATCH_INTERVAL = float(os.getenv("SERVICE_SCHEMA_WATCH_INTERVAL", str(query_engine.SCHEMA_REFRESH_INTERVAL)))  # 0 disables the watcher
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUESTS = Counter("hoopsense_http_requests_total", "HTTP requests served by this worker, by route and status.", ("route", "status"))
+HTTP_SECONDS = Histogram("hoopsense_http_request_duration_seconds", "HTTP request latency by route.", ("route",))
+IN_FLIGHT = Gauge("hoopsense_questions_in_flight", "Questions being processed by this worker.")
+QUEUED = Gauge("hoopsense_questions_queued", "Questions waiting for a processing slot on this worker.")
+REJECTED = Counter("hoopsense_questions_rejected_total", "Questions turned away by admission control, by reason.", ("reason",))
+SERVICE_METRICS = [HTTP_REQUESTS, HTTP_SECONDS, IN_FLIGHT, QUEUED, REJECTED]
+
+
+class Overloaded(Exception):
+    """Raised when a question cannot be admitted; the service answers 503 with Retry-After."""
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client goes away before its response is ready."""
+
+
+class AdmissionController:
+    """Bounds the work a worker takes on.
+
+    Up to ``max_concurrency`` questions run at once and up to ``max_queue`` more wait, each
+    for at most ``queue_timeout`` seconds. Anything beyond is rejected immediately, so callers
+    can back off instead of piling up behind a saturated LLM or database.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    @asynccontextmanager
+    async def admit(self):
+        if self.running + self.waiting >= self.max_concurrency + self.max_queue:
+            REJECTED.inc(reason="queue_full")
+            raise Overloaded(f"{self.waiting} questions are already waiting.")
+        self.waiting += 1
+        QUEUED.inc()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            REJECTED.inc(reason="queue_timeout")
+            raise Overloaded(f"No processing slot became free within {self.queue_timeout:g} seconds.") from None
+        finally:
+            self.waiting -= 1
+            QUEUED.dec()
+        self.running += 1
+        IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            self.running -= 1
+            IN_FLIGHT.dec()
+            self._slots.release()
+
+
+class QueryService:
+    """ASGI app serving process_nl_query from a long-lived worker.
+
+    Routes: ``POST /query`` with {"query", "backend"?, "profile"?} returns the pipeline
+    output; ``GET /healthz`` (liveness), ``GET /readyz`` (503 until warmed up) and
+    ``GET /metrics`` (Prometheus text, per worker). Startup warms the query engine. While
+    running, a watcher re-warms the schema-derived state when the schema fingerprint changes.
+    A question whose client disconnects is cancelled, SQL included.
+    """
+
+    def __init__(self, max_concurrency: int = SERVICE_MAX_CONCURRENCY, max_queue: int = SERVICE_MAX_QUEUE,
+                 queue_timeout: float = SERVICE_QUEUE_TIMEOUT, schema_watch_interval: float = SERVICE_SCHEMA_WATCH_INTERVAL):
+        self.admission = AdmissionController(max_concurrency, max_queue, queue_timeout)
+        self.schema_watch_interval = schema_watch_interval
+        self.ready = False
+        self.warm_up_timings: dict | None = None
+        self.schema_fingerprint: str | None = None
+        self._watcher: asyncio.Task | None = None
+        self._routes = {
+            ("POST", "/query"): self._query,
+            ("GET", "/healthz"): self._healthz,
+            ("GET", "/readyz"): self._readyz,
+            ("GET", "/metrics"): self._metrics,
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+
+    # --- Lifespan ---
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    await self.startup()
+                except Exception as e:
+                    logger.error(f"Query service failed to start: {e}", exc_info=True)
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def startup(self):
+        query_engine.configure_logging()
+        self.warm_up_timings = await asyncio.to_thread(query_engine.warm_up)
+        self.schema_fingerprint = await self._current_fingerprint()
+        self.ready = True
+        if self.schema_watch_interval > 0:
+            self._watcher = asyncio.create_task(self._watch_schema())
+        logger.info(f"Query service worker {os.getpid()} ready (schema {self.schema_fingerprint}).")
+
+    async def shutdown(self):
+        self.ready = False
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+        await asyncio.to_thread(query_engine.shutdown)
+        logger.info(f"Query service worker {os.getpid()} stopped.")
+
+    async def _current_fingerprint(self) -> str | None:
+        try:
+            return await asyncio.to_thread(query_engine.get_schema_fingerprint)
+        except Exception as e:
+            logger.warning(f"Could not read the schema fingerprint: {e}")
+            return None
+
+    async def _watch_schema(self):
+        """Re-warms the schema-derived state after a schema change; questions keep being served meanwhile."""
+        while True:
+            await asyncio.sleep(self.schema_watch_interval)
+            fingerprint = await self._current_fingerprint()
+            if fingerprint is None or fingerprint == self.schema_fingerprint:
+                continue
+            logger.info(f"Schema changed ({self.schema_fingerprint} -> {fingerprint}), rebuilding schema-derived state.")
+            self.warm_up_timings = await asyncio.to_thread(query_engine.warm_up)
+            self.schema_fingerprint = fingerprint
+
+    # --- HTTP ---
+
+    async def _http(self, scope, receive, send):
+        started = time.perf_counter()
+        handler = self._routes.get((scope["method"], scope["path"]))
+        if handler is not None:
+            route = scope["path"]
+            try:
+                status, body, headers = await handler(scope, receive)
+            except ClientDisconnected:
+                HTTP_REQUESTS.inc(route=route, status="disconnected")
+                return
+            except Exception as e:
+                logger.error(f"Unhandled error serving {scope['method']} {route}: {e}", exc_info=True)
+                status, body, headers = 500, {"error": f"Internal error: {e}"}, {}
+        elif any(path == scope["path"] for _, path in self._routes):
+            route = "method_not_allowed"
+            status, body, headers = 405, {"error": "Method not allowed."}, {}
+        else:
+            route = "not_found"
+            status, body, headers = 404, {"error": "Not found."}, {}
+        if isinstance(body, str):
+            payload, content_type = body.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            payload, content_type = json.dumps(body, default=str).encode("utf-8"), "application/json"
+        raw_headers = [(b"content-type", content_type.encode("latin-1")), (b"content-length", str(len(payload)).encode("latin-1"))]
+        raw_headers.extend((name.encode("latin-1"), value.encode("latin-1")) for name, value in headers.items())
+        await send({"type": "http.response.start", "status": status, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": payload})
+        HTTP_REQUESTS.inc(route=route, status=str(status))
+        HTTP_SECONDS.observe(time.perf_counter() - started, route=route)
+
+    @staticmethod
+    async def _read_body(receive, limit: int) -> bytes | None:
+        """The request body, or None when it exceeds ``limit`` bytes."""
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                raise ClientDisconnected()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > limit:
+                return None
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                return b"".join(chunks)
+
+    async def _query(self, scope, receive):
+        body = await self._read_body(receive, SERVICE_MAX_BODY_BYTES)
+        if body is None:
+            return 413, {"error": f"Request body exceeds {SERVICE_MAX_BODY_BYTES} bytes."}, {}
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            return 400, {"error": "Request body must be JSON."}, {}
+        question = request.get("query") if isinstance(request, dict) else None
+        if not isinstance(question, str) or not question.strip():
+            return 400, {"error": "Query string is required."}, {}
+        backend = request.get("backend")
+        if backend is not None and backend not in query_engine.EXECUTION_BACKENDS:
+            return 400, {"error": f"Unknown backend {backend!r}; expected one of {', '.join(query_engine.EXECUTION_BACKENDS)}."}, {}
+
+        try:
+            async with self.admission.admit():
+                result = await self._run_until_disconnect(
+                    query_engine.process_nl_query_async(question, backend=backend, profile=bool(request.get("profile"))),
+                    receive,
+                )
+        except Overloaded as e:
+            retry_after = max(1, round(self.admission.queue_timeout / 2))
+            return 503, {"error": "The query engine is overloaded, retry shortly.", "detail": str(e)}, {"retry-after": str(retry_after)}
+        return 200, result, {}
+
+    @staticmethod
+    async def _run_until_disconnect(coro, receive):
+        """Awaits ``coro``, cancelling it (and raising ClientDisconnected) if the client disconnects first."""
+        task = asyncio.ensure_future(coro)
+
+        async def wait_for_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        watcher = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watcher.cancel()
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        if task.cancelled():
+            logger.info("Client disconnected, cancelled its question.")
+            raise ClientDisconnected()
+        return task.result()
+
+    async def _healthz(self, scope, receive):
+        return 200, {
+            "status": "ok" if self.ready else "starting",
+            "worker": os.getpid(),
+            "in_flight": self.admission.running,
+            "queued": self.admission.waiting,
+            "schema_fingerprint": self.schema_fingerprint,
+        }, {}
+
+    async def _readyz(self, scope, receive):
+        if not self.ready:
+            return 503, {"status": "starting"}, {"retry-after": "1"}
+        return 200, {"status": "ready", "warm_up_seconds": self.warm_up_timings}, {}
+
+    async def _metrics(self, scope, receive):
+        return 200, render_prometheus(SERVICE_METRICS), {}
+
+
+app = QueryService()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the query engine over HTTP (or a Unix socket) with warm worker processes.")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--uds", default=SERVICE_UDS, help="Listen on this Unix socket instead of host:port.")
+    parser.add_argument("--workers", type=int, default=SERVICE_WORKERS)
+    parser.add_argument("--graceful-timeout", type=float, default=query_engine.SQL_STAGE_TIMEOUT,
+                        help="Seconds in-flight questions get to finish on shutdown or reload.")
+    args = parser.parse_args()
+    try:
+        import uvicorn  # Optional dependency, only needed to serve
+    except ImportError:
+        sys.exit("uvicorn is not installed; run `pip install uvicorn` to serve the query engine.")
+    query_engine.configure_logging()
+    uvicorn.run(
+        "service:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=args.host,
+        port=args.port,
+        uds=args.uds,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=query_engine.LOG_LEVEL.lower(),
+    )
+
+
+if __name__ == '__main__':
+    main()
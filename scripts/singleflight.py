@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import threading
+import concurrent.futures
+
+from telemetry import COALESCED, COALESCED_TIMEOUTS, set_attributes
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """One in-flight computation and the callers waiting for it."""
+
+    __slots__ = ("future", "waiters", "cancel")
+
+    def __init__(self):
+        self.future = concurrent.futures.Future()
+        self.future.set_running_or_notify_cancel()  # Waiters giving up must never cancel the shared result
+        self.waiters = 1
+        self.cancel = None  # Stops the computation once nobody waits for it (async leaders only)
+
+
+class SingleFlight:
+    """Runs one computation per key at a time; concurrent callers with the same key share its outcome.
+
+    The first caller for a key (the leader) runs the computation; callers arriving while it
+    runs wait for it and receive the same result, or the same exception. Nothing is cached:
+    a key is forgotten as soon as its computation finishes. Waiters may come from any thread
+    and any event loop. ``do()`` runs the computation on the leader's thread; ``do_async()``
+    runs it as a task on the leader's loop, which keeps going while anyone still waits (the
+    leader included) and is cancelled when the last waiter times out or is cancelled.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: dict = {}
+        self._lock = threading.Lock()
+        self._stats = {"leaders": 0, "coalesced": 0, "timeouts": 0}
+
+    def _leave(self, key, call: _Call, timed_out: bool = False):
+        with self._lock:
+            call.waiters -= 1
+            abandon = call.waiters == 0 and call.cancel is not None and not call.future.done()
+            if abandon and self._calls.get(key) is call:
+                del self._calls[key]  # Later callers start afresh instead of joining a cancelled call
+            if timed_out:
+                self._stats["timeouts"] += 1
+        if timed_out:
+            COALESCED_TIMEOUTS.inc(flight=self.name)
+        if abandon:
+            call.cancel()
+
+    def _finish(self, key, call: _Call, result=None, error: BaseException | None = None):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+        if error is not None:
+            call.future.set_exception(error)
+        else:
+            call.future.set_result(result)
+
+    def do(self, key, func, timeout: float | None = None):
+        """Returns ``func()``, or the outcome of the identical call in flight.
+
+        A waiter raises TimeoutError after ``timeout`` seconds; the leader always runs ``func`` to the end.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["leaders"] += 1
+            else:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+        if leader:
+            try:
+                result = func()
+            except BaseException as e:
+                self._finish(key, call, error=e)
+                raise
+            self._finish(key, call, result=result)
+            return result
+        COALESCED.inc(flight=self.name)
+        set_attributes(coalesced=True)
+        timed_out = False
+        try:
+            return call.future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self._leave(key, call, timed_out=timed_out)
+
+    async def do_async(self, key, coro_func, timeout: float | None = None):
+        """Returns ``await coro_func()``, or the outcome of the identical call in flight.
+
+        Raises asyncio.TimeoutError after ``timeout`` seconds. Timing out or being cancelled
+        only stops this caller's wait, unless it was the last one waiting.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["leaders"] += 1
+            else:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+            if leader:
+                loop = asyncio.get_running_loop()
+                task = loop.create_task(coro_func())
+                call.cancel = lambda: loop.call_soon_threadsafe(task.cancel)
+        if leader:
+            task.add_done_callback(lambda done: self._finish_task(key, call, done))
+        else:
+            COALESCED.inc(flight=self.name)
+            set_attributes(coalesced=True)
+        timed_out = False
+        try:
+            return await asyncio.wait_for(self._waiter(call), timeout)
+        except asyncio.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            self._leave(key, call, timed_out=timed_out)
+
+    @staticmethod
+    def _waiter(call: _Call) -> asyncio.Future:
+        """A future on the running loop that gets the call's outcome, unless it is cancelled first.
+
+        (asyncio.wrap_future would cancel the shared future along with a waiter that gives up,
+        and leave outcomes nobody retrieves in futures that log them as lost.)
+        """
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+
+        def copy_outcome(future: concurrent.futures.Future):
+            if waiter.done():
+                return
+            error = future.exception()
+            if isinstance(error, concurrent.futures.CancelledError):
+                waiter.cancel()
+            elif error is not None:
+                waiter.set_exception(error)
+            else:
+                waiter.set_result(future.result())
+
+        def notify(future: concurrent.futures.Future):
+            try:
+                loop.call_soon_threadsafe(copy_outcome, future)
+            except RuntimeError:  # The waiter's loop is already closed
+                pass
+
+        call.future.add_done_callback(notify)
+        return waiter
+
+    def _finish_task(self, key, call: _Call, task: asyncio.Task):
+        if task.cancelled():
+            self._finish(key, call, error=concurrent.futures.CancelledError())
+        elif task.exception() is not None:
+            self._finish(key, call, error=task.exception())
+        else:
+            self._finish(key, call, result=task.result())
+
+    def stats(self) -> dict:
+        """{"leaders", "coalesced", "timeouts", "in_flight"} since the process started."""
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
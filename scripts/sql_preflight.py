@@ -0,0 +1,206 @@
+import re
+import logging
+
+from result_cache import normalize_sql
+
+logger = logging.getLogger(__name__)
+
+_MASK_RE = re.compile(r"""'(?:[^']|'')*'|"(?:[^"]|"")*\"""")
+_STATEMENT_START_RE = re.compile(r"^\(*\s*(select|with)\b", re.I)
+_WRITE_RE = re.compile(
+    r"\b(insert|update|delete|merge|upsert|create|drop|alter|truncate|grant|revoke|copy|vacuum|analyze|cluster|reindex|"
+    r"call|do|lock|set|reset|comment|refresh|listen|notify|prepare|execute|deallocate|discard|import|export|attach|"
+    r"detach|install|load|pragma|checkpoint|into)\b"
+    r"|\bfor\s+(update|share|no\s+key\s+update|key\s+share)\b",
+    re.I,
+)
+# Functions that sleep, touch files, reach other servers, change settings or run SQL given as text.
+_BLOCKED_FUNCTION_RE = re.compile(
+    r"\b(pg_sleep\w*|pg_terminate_backend|pg_cancel_backend|pg_reload_conf|pg_read_\w+|pg_ls_\w+|pg_stat_file|"
+    r"pg_advisory\w*|lo_\w+|dblink\w*|set_config|nextval|setval|query_to_xml\w*|read_\w+|glob)\s*\(",
+    re.I,
+)
+_TABLE_REF_RE = re.compile(
+    r"\b(from|join)\s+(?!\()([a-z_][\w$]*(?:\s*\.\s*[a-z_][\w$]*)?)(?![\w$])(?!\s*\()(?:\s+(?:as\s+)?(?!(?:%s)\b)([a-z_][\w$]*))?",
+    re.I,
+)
+_CTE_NAME_RE = re.compile(r"(?:\bwith\s+(?:recursive\s+)?|,\s*)([a-z_][\w$]*)\s*(?:\([^)]*\)\s*)?as\s+(?:not\s+)?(?:materialized\s+)?\(", re.I)
+_QUALIFIED_RE = re.compile(r"(?<![\w$.])([a-z_][\w$]*)\s*\.\s*([a-z_][\w$]*|\*)(?![\w$])(?!\s*\()", re.I)
+_IDENT_RE = re.compile(r"(?<![\w$.:])([a-z_][\w$]*)(?![\w$])(?!\s*[.(])", re.I)
+_EXPLICIT_ALIAS_RE = re.compile(r"\bas\s+([a-z_][\w$]*)", re.I)
+# "expr alias" without AS: an identifier right after a closing parenthesis, literal, number, identifier or END.
+_IMPLICIT_ALIAS_RE = re.compile(r"(?=(\)|''|\b\d+(?:\.\d+)?|\b[a-z_][\w$]*)\s+([a-z_][\w$]*)(?![\w$])(?!\s*[.(]))", re.I)
+_TYPE_CAST_RE = re.compile(r"::\s*([a-z_][\w$]*(?:\s+precision)?)", re.I)
+# FROM inside EXTRACT(field FROM x), SUBSTRING(x FROM n) etc. and IS [NOT] DISTINCT FROM does not name a table.
+_NON_TABLE_FROM_RE = re.compile(r"\b(extract|substring|trim|overlay|position)\s*\(([^()]*?)\bfrom\b|\bdistinct\s+from\b", re.I)
+_TOP_LEVEL_LIMIT_RE = re.compile(r"\b(limit|fetch|offset)\b", re.I)
+
+SQL_KEYWORDS = frozenset("""
+    select from where group by order having limit offset fetch first next row rows only ties as and or not in is null
+    like ilike similar escape between case when then else end distinct on join inner left right full outer cross natural
+    using union all intersect except with recursive materialized asc desc nulls last true false unknown exists any some
+    array cast over partition range groups preceding following unbounded current filter within window lateral values
+    interval date time timestamp timestamptz zone at extract year month day hour minute second millisecond microsecond
+    epoch dow doy isodow isoyear week quarter decade century millennium numeric integer int int2 int4 int8 smallint
+    bigint float float4 float8 real double precision text varchar char character varying decimal boolean bool qualify
+    collate default to
+""".split())
+# Functions called without parentheses (WHERE game_date > CURRENT_DATE - INTERVAL '30 days').
+NILADIC_FUNCTIONS = frozenset({"current_date", "current_time", "current_timestamp", "localtime", "localtimestamp"})
+SQL_KEYWORDS = SQL_KEYWORDS | NILADIC_FUNCTIONS
+_NOT_ALIAS_AFTER = SQL_KEYWORDS - {"end", "true", "false", "null"} - NILADIC_FUNCTIONS
+
+
+def _mask(sql_text: str) -> str:
+    """Blanks out string literals ('') and quoted identifiers ("") so keywords inside them are not matched."""
+    return _MASK_RE.sub(lambda m: "''" if m.group(0).startswith("'") else '""', sql_text)
+
+
+def _depth_zero_text(masked: str) -> str:
+    """The parts of the statement outside any parentheses."""
+    out, depth = [], 0
+    for char in masked:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0:
+            out.append(char)
+    return "".join(out)
+
+
+def _table_refs(masked: str) -> tuple[dict[str, str], set[str]]:
+    """(alias -> table, referenced table names) for every FROM/JOIN item, including comma-separated FROM lists."""
+    aliases, tables = {}, set()
+    pattern = re.compile(_TABLE_REF_RE.pattern % "|".join(sorted(SQL_KEYWORDS)), re.I)
+    refs = [(m.group(2), m.group(3)) for m in pattern.finditer(masked)]
+    # Comma-separated items: FROM a x, b y
+    comma_item = re.compile(r",\s*(?!\()([a-z_][\w$]*(?:\s*\.\s*[a-z_][\w$]*)?)(?![\w$])(?!\s*\()(?:\s+(?:as\s+)?(?!(?:%s)\b)([a-z_][\w$]*))?"
+                            % "|".join(sorted(SQL_KEYWORDS)), re.I)
+    for from_list in re.findall(r"\bfrom\s+(.*?)(?=\bwhere\b|\bgroup\b|\border\b|\blimit\b|\bhaving\b|\bjoin\b|\bunion\b|\bwindow\b|\)|$)",
+                                masked, re.I | re.S):
+        refs.extend(comma_item.findall(from_list))
+    for name, alias in refs:
+        table = re.sub(r"\s+", "", name).lower()
+        if table.startswith("public."):  # The default schema; known_columns is keyed by bare table names
+            table = table[len("public."):]
+        tables.add(table)
+        short = table.split(".")[-1]
+        aliases[short] = table
+        if alias:
+            aliases[alias.lower()] = table
+    return aliases, tables
+
+
+def validate_sql(sql_query: str, known_columns: dict[str, set[str]]) -> str | None:
+    """Static checks before anything reaches the database; returns the rejection reason or None.
+
+    Accepts a single read-only SELECT (or WITH ... SELECT) that only reads tables in
+    ``known_columns`` (table -> column names, lower-case) and whose column references
+    exist there. Column checks are deliberately lenient where SQL allows output names to
+    be introduced (aliases, CTEs): an unqualified name is only reported when it is not a
+    column of any referenced table and not defined anywhere in the query.
+    """
+    sql_text = normalize_sql(sql_query)
+    masked = _mask(sql_text)
+    masked = _NON_TABLE_FROM_RE.sub(lambda m: f"{m.group(1)}({m.group(2)} " if m.group(1) else "distinct ", masked)
+    if not sql_text:
+        return "The SQL query is empty."
+    if ";" in masked:
+        return "Only a single SQL statement is allowed; remove the extra statements."
+    if not _STATEMENT_START_RE.match(masked):
+        return "Only read-only SELECT queries (optionally starting with WITH) are allowed."
+    write = _WRITE_RE.search(masked)
+    if write:
+        return f"The query must be read-only; '{write.group(0).upper()}' is not allowed."
+    blocked = _BLOCKED_FUNCTION_RE.search(masked)
+    if blocked:
+        return f"The function {blocked.group(1)}() is not allowed."
+
+    cte_names = {name.lower() for name in _CTE_NAME_RE.findall(masked)}
+    aliases, tables = _table_refs(masked)
+    unknown_tables = sorted(t for t in tables if t not in cte_names and t not in known_columns)
+    if unknown_tables:
+        return (f"Unknown table(s): {', '.join(unknown_tables)}. "
+                f"Available tables: {', '.join(sorted(known_columns))}.")
+
+    read_tables = {t for t in tables if t in known_columns}
+    unknown = []
+    for qualifier, column in _QUALIFIED_RE.findall(masked):
+        table = aliases.get(qualifier.lower())
+        if table in known_columns and column != "*" and column.lower() not in known_columns[table]:
+            unknown.append(f"{qualifier}.{column} ({table} has no column '{column.lower()}')")
+
+    defined = set(aliases) | cte_names | {a.lower() for a in _EXPLICIT_ALIAS_RE.findall(masked)}
+    for previous, alias in _IMPLICIT_ALIAS_RE.findall(masked):
+        if previous.lower() not in _NOT_ALIAS_AFTER:
+            defined.add(alias.lower())
+    cast_types = {t.lower() for t in _TYPE_CAST_RE.findall(masked)}
+    available = set().union(*(known_columns[t] for t in read_tables)) if read_tables else set()
+    for identifier in dict.fromkeys(i.lower() for i in _IDENT_RE.findall(masked)):
+        if identifier in SQL_KEYWORDS or identifier in defined or identifier in available or identifier in cast_types:
+            continue
+        if identifier in tables or identifier in known_columns:
+            continue
+        unknown.append(f"{identifier} (not a column of {', '.join(sorted(read_tables)) or 'any referenced table'})")
+    if unknown:
+        return f"Unknown column(s): {'; '.join(unknown)}."
+    return None
+
+
+def has_top_level_limit(sql_query: str) -> bool:
+    return bool(_TOP_LEVEL_LIMIT_RE.search(_depth_zero_text(_mask(normalize_sql(sql_query)))))
+
+
+def apply_row_limit(sql_query: str, max_rows: int) -> str:
+    """Caps the result at ``max_rows`` rows, keeping any ORDER BY; queries that already page their result are wrapped."""
+    sql_text = normalize_sql(sql_query)
+    if has_top_level_limit(sql_text):
+        return f"SELECT * FROM ({sql_text}) AS preflight_limited LIMIT {int(max_rows)}"
+    return f"{sql_text} LIMIT {int(max_rows)}"
+
+
+def check_plan(plan: dict, max_cost: float, max_rows: float) -> tuple[str | None, bool]:
+    """Judges an EXPLAIN estimate ({"total_cost", "plan_rows"}; either may be None).
+
+    Returns (rejection reason, needs row limit). ``max_cost``/``max_rows`` <= 0 disable a check.
+    """
+    cost, rows = plan.get("total_cost"), plan.get("plan_rows")
+    if max_cost > 0 and cost is not None and cost > max_cost:
+        return (f"The query plan is too expensive (estimated cost {cost:,.0f}, limit {max_cost:,.0f}). "
+                "Check for missing join conditions or cross joins, filter earlier, or aggregate the data."), False
+    return None, max_rows > 0 and rows is not None and rows > max_rows
+
+
+def preflight(sql_query: str, known_columns: dict[str, set[str]] | None, explain, max_cost: float, max_rows: float,
+              row_limit_action: str = "limit") -> tuple[str, dict, str | None]:
+    """Validates ``sql_query`` statically, then gates it on its EXPLAIN estimate.
+
+    ``explain(sql)`` returns {"total_cost", "plan_rows"} and may raise for invalid SQL (the
+    caller decides which errors are rejections). Plans estimated to return more than
+    ``max_rows`` rows are given a LIMIT (``row_limit_action='limit'``) or rejected
+    (``'reject'``). The LIMIT lets one row past ``info["row_limit"]`` through, so the caller
+    can tell a result that was cut from one that merely fits. Returns (sql to execute, info,
+    rejection reason or None).
+    """
+    info = {"plan_cost": None, "plan_rows": None, "row_limit": None}
+    if known_columns is not None:
+        rejection = validate_sql(sql_query, known_columns)
+        if rejection:
+            return sql_query, info, rejection
+    plan = explain(sql_query)
+    info.update(plan_cost=plan.get("total_cost"), plan_rows=plan.get("plan_rows"))
+    rejection, needs_limit = check_plan(plan, max_cost, max_rows)
+    if rejection:
+        return sql_query, info, rejection
+    if needs_limit:
+        if row_limit_action == "reject":
+            return sql_query, info, (f"The query would return about {info['plan_rows']:,.0f} rows (limit {max_rows:,.0f}). "
+                                     "Aggregate the data or add filters.")
+        limited = apply_row_limit(sql_query, int(max_rows) + 1)
+        plan = explain(limited)
+        info.update(plan_cost=plan.get("total_cost"), plan_rows=plan.get("plan_rows"), row_limit=int(max_rows))
+        rejection, _ = check_plan(plan, max_cost, 0)
+        logger.info(f"Pre-flight capped the result at {int(max_rows)} rows.")
+        return limited, info, rejection
+    return sql_query, info, None
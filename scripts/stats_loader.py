@@ -0,0 +1,368 @@
+import io
+import os
+import sys
+import time
+import hashlib
+import logging
+import argparse
+
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+
+from table_versions import VERSIONS_SCHEMA, bump_table_versions
+from rollups import refresh_rollups
+
+logger = logging.getLogger(__name__)
+
+# Content hash of every loaded partition, so unchanged partitions are skipped on the next refresh.
+LOADED_PARTITIONS_TABLE = f"{VERSIONS_SCHEMA}.loaded_partitions"
+
+# A partition of a stats table is one (season, season type, per-mode) snapshot from the ingest.
+PARTITION_KEY_COLUMNS = ["season", "season_type", "per_mode"]
+# Natural row keys within a partition, per dataset.
+DATASET_ROW_KEYS = {
+    "player": ["player_id", "team_id"],
+    "team": ["team_id"],
+}
+# Columns the generated SQL filters, joins or groups on most; indexed when present.
+# (season, season_type, per_mode) filters are served by the natural-key index, which leads with them.
+INDEXED_COLUMN_SETS = [
+    ("player_id",),
+    ("player_name",),
+    ("team_id",),
+    ("team_abbreviation",),
+]
+COPY_CHUNK_ROWS = 10000
+
+
+def table_name_for(base_table: str, measure_type: str) -> str:
+    """'player_stats' for the Base measure, 'player_stats_advanced' etc. for the others (their columns differ)."""
+    if measure_type == "Base":
+        return base_table
+    return f"{base_table}_{measure_type.lower().replace(' ', '_').replace('-', '_')}"
+
+
+def _pg_type(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "BIGINT"
+    if pd.api.types.is_float_dtype(dtype):
+        return "DOUBLE PRECISION"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMPTZ" if getattr(dtype, "tz", None) is not None else "TIMESTAMP"
+    return "TEXT"
+
+
+def prepare_partition_frame(df: pd.DataFrame, row_keys: list[str], **partition_values) -> pd.DataFrame:
+    """Lower-cased columns plus the partition columns, one row per natural key, in key order."""
+    frame = df.rename(columns=str.lower).drop(columns=PARTITION_KEY_COLUMNS + ["measure_type"], errors="ignore")
+    for column in reversed(PARTITION_KEY_COLUMNS):
+        frame.insert(0, column, partition_values[column])
+    keys = PARTITION_KEY_COLUMNS + row_keys
+    missing_keys = frame[row_keys].isna().any(axis=1)
+    if missing_keys.any():
+        logger.warning(f"Dropping {int(missing_keys.sum())} rows without a {'/'.join(row_keys)}.")
+        frame = frame[~missing_keys]
+    for column in row_keys:
+        # IDs that were floats only because of the dropped nulls become integers again.
+        if pd.api.types.is_float_dtype(frame[column].dtype) and (frame[column] % 1 == 0).all():
+            frame[column] = frame[column].astype("int64")
+    duplicated = frame.duplicated(subset=keys, keep="last")
+    if duplicated.any():
+        logger.warning(f"Dropping {int(duplicated.sum())} rows with duplicate keys (keeping the last).")
+        frame = frame[~duplicated]
+    return frame.sort_values(keys, kind="stable").reset_index(drop=True)
+
+
+def content_hash(frame: pd.DataFrame) -> str:
+    """Hash of a prepared partition's column names and values."""
+    digest = hashlib.sha256("\x1f".join(map(str, frame.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class _CsvChunkReader(io.TextIOBase):
+    """File-like CSV view of a DataFrame, rendered COPY_CHUNK_ROWS rows at a time so COPY can stream it."""
+
+    def __init__(self, frame: pd.DataFrame, chunk_rows: int = COPY_CHUNK_ROWS):
+        self._chunks = (
+            frame.iloc[start:start + chunk_rows].to_csv(index=False, header=False, na_rep="")
+            for start in range(0, len(frame), chunk_rows)
+        )
+        self._buffer = ""
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size is None or size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size is None or size < 0:
+            data, self._buffer = self._buffer, ""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def ensure_loader_tables(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {VERSIONS_SCHEMA}")
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {LOADED_PARTITIONS_TABLE} (
+                table_name TEXT NOT NULL,
+                season TEXT NOT NULL,
+                season_type TEXT NOT NULL,
+                per_mode TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                row_count BIGINT NOT NULL,
+                loaded_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (table_name, season, season_type, per_mode)
+            )
+        """)
+    conn.commit()
+
+
+def _existing_column_types(cursor, table_name: str) -> dict[str, str]:
+    cursor.execute(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = 'public' AND table_name = %s",
+        (table_name,),
+    )
+    return dict(cursor.fetchall())
+
+
+def ensure_stats_table(cursor, table_name: str, frame: pd.DataFrame, row_keys: list[str]) -> dict[str, str]:
+    """Creates the table (or adds columns new to this frame) and its indexes. Returns column -> data_type."""
+    existing = _existing_column_types(cursor, table_name)
+    table = sql.Identifier(table_name)
+    if not existing:
+        keys = PARTITION_KEY_COLUMNS + row_keys
+        cursor.execute(sql.SQL("CREATE TABLE IF NOT EXISTS {} ({}, PRIMARY KEY ({}))").format(
+            table,
+            sql.SQL(", ").join(
+                sql.SQL("{} {}{}").format(
+                    sql.Identifier(column), sql.SQL(_pg_type(frame[column].dtype)),
+                    sql.SQL(" NOT NULL" if column in keys else ""),
+                )
+                for column in frame.columns
+            ),
+            sql.SQL(", ").join(map(sql.Identifier, keys)),
+        ))
+        logger.info(f"Created table {table_name} with {len(frame.columns)} columns.")
+    else:
+        # Tables created by hand may lack the primary key ON CONFLICT needs.
+        cursor.execute(sql.SQL("CREATE UNIQUE INDEX IF NOT EXISTS {} ON {} ({})").format(
+            sql.Identifier(f"{table_name}_natural_key_idx"), table,
+            sql.SQL(", ").join(map(sql.Identifier, PARTITION_KEY_COLUMNS + row_keys)),
+        ))
+        for column in frame.columns:
+            if column not in existing:
+                cursor.execute(sql.SQL("ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} {}").format(
+                    table, sql.Identifier(column), sql.SQL(_pg_type(frame[column].dtype))
+                ))
+                logger.info(f"Added column {table_name}.{column}.")
+    for columns in INDEXED_COLUMN_SETS:
+        if all(column in frame.columns for column in columns):
+            cursor.execute(sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} ({})").format(
+                sql.Identifier(f"{table_name}_{'_'.join(columns)}_idx"), table,
+                sql.SQL(", ").join(map(sql.Identifier, columns)),
+            ))
+    return _existing_column_types(cursor, table_name)
+
+
+def _format_for_copy(frame: pd.DataFrame, column_types: dict[str, str]) -> pd.DataFrame:
+    """Renders integral floats (ints that picked up NaNs) without a '.0' for BIGINT/INTEGER target columns."""
+    frame = frame.copy(deep=False)
+    for column in frame.columns:
+        if column_types.get(column) in ("bigint", "integer", "smallint") and pd.api.types.is_float_dtype(frame[column].dtype):
+            frame[column] = frame[column].astype("Int64")
+    return frame
+
+
+def load_partition(conn, df: pd.DataFrame, table_name: str, row_keys: list[str], force: bool = False,
+                   **partition_values) -> dict:
+    """Merges one partition snapshot into ``table_name`` via COPY into a staging table.
+
+    New keys are inserted, changed rows updated (rows whose values are identical are not
+    touched) and keys missing from the snapshot deleted. The partition is skipped without
+    any writes when its content hash matches the last load. Runs in a single transaction.
+    """
+    frame = prepare_partition_frame(df, row_keys, **partition_values)
+    digest = content_hash(frame)
+    partition = [partition_values[column] for column in PARTITION_KEY_COLUMNS]
+    result = {"table": table_name, "partition": tuple(partition), "status": "skipped", "rows": len(frame),
+              "inserted": 0, "updated": 0, "deleted": 0, "seconds": 0.0}
+    started = time.perf_counter()
+    try:
+        with conn.cursor() as cursor:
+            if not force:
+                cursor.execute(
+                    f"SELECT content_hash FROM {LOADED_PARTITIONS_TABLE} "
+                    "WHERE table_name = %s AND season = %s AND season_type = %s AND per_mode = %s",
+                    [table_name] + partition,
+                )
+                row = cursor.fetchone()
+                if row is not None and row[0] == digest:
+                    conn.rollback()
+                    return result
+
+            column_types = ensure_stats_table(cursor, table_name, frame, row_keys)
+            target = sql.Identifier(table_name)
+            stage = sql.Identifier(f"stage_{table_name}")
+            columns = [sql.Identifier(column) for column in frame.columns]
+            column_list = sql.SQL(", ").join(columns)
+            keys = PARTITION_KEY_COLUMNS + row_keys
+            key_list = sql.SQL(", ").join(map(sql.Identifier, keys))
+            value_columns = [sql.Identifier(column) for column in frame.columns if column not in keys]
+
+            cursor.execute(sql.SQL("CREATE TEMP TABLE {} (LIKE {} INCLUDING DEFAULTS) ON COMMIT DROP").format(stage, target))
+            cursor.copy_expert(
+                sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(stage, column_list).as_string(conn),
+                _CsvChunkReader(_format_for_copy(frame, column_types)),
+            )
+
+            if value_columns:
+                on_conflict = sql.SQL("DO UPDATE SET {} WHERE ({}) IS DISTINCT FROM ({})").format(
+                    sql.SQL(", ").join(sql.SQL("{} = EXCLUDED.{}").format(c, c) for c in value_columns),
+                    sql.SQL(", ").join(sql.SQL("t.{}").format(c) for c in value_columns),
+                    sql.SQL(", ").join(sql.SQL("EXCLUDED.{}").format(c) for c in value_columns),
+                )
+            else:
+                on_conflict = sql.SQL("DO NOTHING")
+            cursor.execute(sql.SQL("""
+                WITH merged AS (
+                    INSERT INTO {target} AS t ({columns}) SELECT {columns} FROM {stage}
+                    ON CONFLICT ({keys}) {on_conflict}
+                    RETURNING (xmax = 0) AS inserted
+                )
+                SELECT count(*) FILTER (WHERE inserted), count(*) FILTER (WHERE NOT inserted) FROM merged
+            """).format(target=target, columns=column_list, stage=stage, keys=key_list, on_conflict=on_conflict))
+            result["inserted"], result["updated"] = cursor.fetchone()
+
+            cursor.execute(sql.SQL("""
+                DELETE FROM {target} AS t
+                WHERE t.season = %s AND t.season_type = %s AND t.per_mode = %s
+                  AND NOT EXISTS (SELECT 1 FROM {stage} AS s WHERE {key_match})
+            """).format(
+                target=target, stage=stage,
+                key_match=sql.SQL(" AND ").join(sql.SQL("s.{} = t.{}").format(sql.Identifier(k), sql.Identifier(k)) for k in keys),
+            ), partition)
+            result["deleted"] = cursor.rowcount
+
+            cursor.execute(f"""
+                INSERT INTO {LOADED_PARTITIONS_TABLE} (table_name, season, season_type, per_mode, content_hash, row_count, loaded_at)
+                VALUES (%s, %s, %s, %s, %s, %s, now())
+                ON CONFLICT (table_name, season, season_type, per_mode)
+                DO UPDATE SET content_hash = EXCLUDED.content_hash, row_count = EXCLUDED.row_count, loaded_at = now()
+            """, [table_name] + partition + [digest, len(frame)])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    result["status"] = "loaded"
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def analyze_tables(conn, table_names):
+    """Refreshes planner statistics after a load."""
+    with conn.cursor() as cursor:
+        for table_name in sorted(set(table_names)):
+            cursor.execute(sql.SQL("ANALYZE {}").format(sql.Identifier(table_name)))
+    conn.commit()
+
+
+def load_from_storage(conn, root: str, base_tables: dict[str, str], filters: dict | None = None,
+                      force: bool = False) -> list[dict]:
+    """Loads every Parquet partition under ``root`` (see stats_storage) matching ``filters``.
+
+    ``base_tables`` maps dataset -> base table name (e.g. {"player": "player_stats"}). Tables
+    that changed are ANALYZEd and get their version bumped so query_engine's caches refresh.
+    """
+    from stats_storage import list_partitions, read_partition
+
+    ensure_loader_tables(conn)
+    results = []
+    for dataset, base_table in base_tables.items():
+        for partition_values in list_partitions(root, dataset, filters=filters):
+            frame = read_partition(root, dataset, **partition_values)
+            table_name = table_name_for(base_table, partition_values["measure_type"])
+            try:
+                result = load_partition(conn, frame, table_name, DATASET_ROW_KEYS[dataset], force=force, **partition_values)
+            except psycopg2.Error as e:
+                logger.error(f"Failed to load {table_name} {partition_values}: {e}")
+                result = {"table": table_name, "partition": tuple(partition_values[c] for c in PARTITION_KEY_COLUMNS),
+                          "status": "failed", "error": str(e)}
+            results.append(result)
+            logger.info(
+                f"{result['status']:>7} {table_name} {' / '.join(result['partition'])}"
+                + (f": +{result['inserted']} ~{result['updated']} -{result['deleted']} in {result['seconds']:.2f}s"
+                   if result["status"] == "loaded" else "")
+            )
+    changed = sorted({r["table"] for r in results if r["status"] == "loaded"})
+    if changed:
+        analyze_tables(conn, changed)
+        bump_table_versions(conn, changed)
+        try:
+            refresh_rollups(conn, changed)
+        except psycopg2.Error as e:
+            conn.rollback()
+            logger.error(f"Failed to refresh rollups: {e}")
+    return results
+
+
+def connect_from_env():
+    """Connects with the same DB_* settings (scripts/.env) as query_engine."""
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+    return psycopg2.connect(
+        dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"),
+        host=os.getenv("DB_HOST", "localhost"),
+        port=os.getenv("DB_PORT", "5432")
+    )
+
+
+def main(argv=None) -> int:
+    from fetch_nba_stats import DATA_DIR, DATASETS, PARQUET_SUBDIR, expand_seasons
+
+    parser = argparse.ArgumentParser(description="Load fetched Parquet stats into PostgreSQL (COPY + upsert).")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--datasets', nargs='+', choices=sorted(DATASETS), default=sorted(DATASETS))
+    parser.add_argument('--seasons', nargs='+', help="Only these seasons (ranges such as 2004-05:2023-24 allowed).")
+    parser.add_argument('--season-types', nargs='+')
+    parser.add_argument('--measure-types', nargs='+')
+    parser.add_argument('--force', action='store_true', help="Reload partitions even if their content is unchanged.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    filters = {}
+    if args.seasons:
+        filters["season"] = expand_seasons(args.seasons)
+    if args.season_types:
+        filters["season_type"] = args.season_types
+    if args.measure_types:
+        filters["measure_type"] = args.measure_types
+
+    conn = connect_from_env()
+    try:
+        results = load_from_storage(
+            conn, os.path.join(args.data_dir, PARQUET_SUBDIR),
+            {dataset: DATASETS[dataset][1] for dataset in args.datasets},
+            filters=filters, force=args.force,
+        )
+    finally:
+        conn.close()
+    counts = {status: sum(r["status"] == status for r in results) for status in ("loaded", "skipped", "failed")}
+    print(f"{len(results)} partitions: {counts['loaded']} loaded, {counts['skipped']} unchanged, {counts['failed']} failed.")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
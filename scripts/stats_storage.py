@@ -0,0 +1,157 @@
+import os
+import uuid
+import logging
+from urllib.parse import quote, unquote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# Hive-style partition keys, outermost first: <root>/<dataset>/season=.../season_type=.../measure_type=.../per_mode=...
+PARTITION_COLUMNS = ["season", "season_type", "measure_type", "per_mode"]
+PARTITION_FILENAME = "part-0.parquet"
+DEFAULT_COMPRESSION = "zstd"
+
+
+def partition_dir(root: str, dataset: str, **partition_values) -> str:
+    """Directory holding one partition; values are URI-encoded the way pyarrow's hive partitioning decodes them."""
+    parts = [root, dataset]
+    for column in PARTITION_COLUMNS:
+        parts.append(f"{column}={quote(str(partition_values[column]), safe='')}")
+    return os.path.join(*parts)
+
+
+def partition_path(root: str, dataset: str, **partition_values) -> str:
+    return os.path.join(partition_dir(root, dataset, **partition_values), PARTITION_FILENAME)
+
+
+def _normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Lower-cases column names (as the database does) and gives object columns a concrete Arrow type."""
+    df = df.rename(columns=str.lower)
+    for column in df.columns:
+        if df[column].dtype == object and df[column].notna().any():  # All-null columns stay Arrow nulls
+            converted = pd.to_numeric(df[column], errors="coerce")
+            # Keep numbers that merely arrived as strings numeric; anything else is text.
+            if converted.notna().sum() == df[column].notna().sum():
+                df[column] = converted
+            else:
+                df[column] = df[column].astype("string")
+    return df
+
+
+def write_partition(df: pd.DataFrame, root: str, dataset: str, compression: str = DEFAULT_COMPRESSION,
+                    **partition_values) -> str:
+    """Writes one fetched dataset as a single typed, compressed Parquet file, replacing the partition atomically.
+
+    Partition columns are encoded in the directory names rather than stored in the file.
+    """
+    path = partition_path(root, dataset, **partition_values)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    frame = _normalize_frame(df).drop(columns=PARTITION_COLUMNS, errors="ignore")
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    pq.write_table(table, tmp_path, compression=compression)
+    os.replace(tmp_path, path)
+    logger.debug(f"Wrote {table.num_rows} rows to {path}")
+    return path
+
+
+def export_csv(df: pd.DataFrame, output_path: str) -> str:
+    """Writes a dataset to CSV (the original flat-file format), e.g. for spreadsheets or ad-hoc sharing."""
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    df.to_csv(output_path, index=False)
+    return output_path
+
+
+def _filter_expression(filters: dict | None):
+    """{"season": "2023-24", "season_type": ["Regular Season", "Playoffs"]} -> a pyarrow dataset expression."""
+    expression = None
+    for column, value in (filters or {}).items():
+        if isinstance(value, (list, tuple, set)):
+            term = ds.field(column).isin(list(value))
+        else:
+            term = ds.field(column) == value
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def _partition_files(source: str) -> list[str]:
+    return sorted(
+        os.path.join(directory, name)
+        for directory, _, names in os.walk(source)
+        for name in names if name.endswith(".parquet")
+    )
+
+
+def _partition_values(path: str, source: str) -> dict:
+    segments = os.path.relpath(os.path.dirname(path), source).split(os.sep)
+    return dict(unquote(segment).split("=", 1) for segment in segments if "=" in segment)
+
+
+def _matches_partition_filters(values: dict, filters: dict | None) -> bool:
+    for column, value in (filters or {}).items():
+        if column not in PARTITION_COLUMNS:
+            continue
+        allowed = value if isinstance(value, (list, tuple, set)) else [value]
+        if values.get(column) not in allowed:
+            return False
+    return True
+
+
+def open_dataset(root: str, dataset: str, memory_map: bool = True, filters: dict | None = None) -> ds.Dataset:
+    """Arrow dataset over the partitions of ``dataset`` matching the partition keys in ``filters``.
+
+    Partition columns come from the directory names, so non-matching partitions are pruned
+    before any file is opened. Measure types have different columns and a stat can be
+    integral in one season and fractional in another, so the dataset schema is the union of
+    the remaining partitions' schemas (read from the Parquet footers only).
+    """
+    filesystem = pafs.LocalFileSystem(use_mmap=memory_map)
+    partition_schema = pa.schema([(column, pa.string()) for column in PARTITION_COLUMNS])
+    partitioning = ds.partitioning(partition_schema, flavor="hive")
+    source = os.path.join(root, dataset)
+    files = [path for path in _partition_files(source) if _matches_partition_filters(_partition_values(path, source), filters)]
+    schema = pa.unify_schemas(
+        [pq.read_schema(path, memory_map=memory_map) for path in files] + [partition_schema],
+        promote_options="permissive",
+    )
+    return ds.dataset(files, schema=schema, format="parquet", partitioning=partitioning,
+                      partition_base_dir=source, filesystem=filesystem)
+
+
+def list_partitions(root: str, dataset: str, filters: dict | None = None) -> list[dict]:
+    """Partition values ({"season": ..., "season_type": ..., ...}) of every stored partition matching ``filters``."""
+    source = os.path.join(root, dataset)
+    partitions = [_partition_values(path, source) for path in _partition_files(source)]
+    return [values for values in partitions if _matches_partition_filters(values, filters)]
+
+
+def read_partition(root: str, dataset: str, memory_map: bool = True, **partition_values) -> pd.DataFrame:
+    """One partition's rows, with only the columns stored for it (no partition columns)."""
+    path = partition_path(root, dataset, **partition_values)
+    return pq.read_table(path, memory_map=memory_map).to_pandas(split_blocks=True, self_destruct=True)
+
+
+def read_table(root: str, dataset: str, columns: list[str] | None = None, filters: dict | None = None,
+               memory_map: bool = True) -> pa.Table:
+    """Reads only the requested columns of the partitions matching ``filters``.
+
+    Partition filters prune whole directories before any file is opened; filters on other
+    columns are pushed down to the Parquet row-group statistics. With ``memory_map``
+    the files are mapped rather than read into buffers; column chunks written with
+    ``compression="none"`` are then handed to Arrow without copying.
+    """
+    return open_dataset(root, dataset, memory_map=memory_map, filters=filters).to_table(
+        columns=columns, filter=_filter_expression(filters)
+    )
+
+
+def load_stats(root: str, dataset: str, columns: list[str] | None = None, filters: dict | None = None,
+               memory_map: bool = True) -> pd.DataFrame:
+    """Like read_table(), converted to pandas (Arrow-backed strings, no per-column copies where possible)."""
+    table = read_table(root, dataset, columns=columns, filters=filters, memory_map=memory_map)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
@@ -0,0 +1,89 @@
+import logging
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from summary_stats import SummaryStatsAccumulator
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingResultCollector:
+    """Consumes a query result chunk by chunk, keeping only bounded state.
+
+    Retains the first ``preview_rows`` rows, a uniform reservoir sample of at most
+    ``sample_rows`` rows for charting, and per-column summary statistics accumulated by
+    ``stats`` (a SummaryStatsAccumulator with default budgets when omitted). ``coerce``
+    converts each chunk to its final column types first (e.g. DtypeInferenceEngine.coerce),
+    so numbers fetched as text are summarized as numbers.
+    """
+
+    def __init__(self, preview_rows: int = 5, sample_rows: int = 5000, seed: int = 0,
+                 stats: SummaryStatsAccumulator | None = None,
+                 coerce: Callable[[pd.DataFrame], pd.DataFrame] | None = None):
+        self.preview_rows = preview_rows
+        self.sample_rows = sample_rows
+        self.row_count = 0
+        self.bytes_fetched = 0
+        self.columns: list[str] | None = None
+        self.column_type_oids: dict[str, int] = {}
+        self._rng = np.random.default_rng(seed)
+        self._preview: pd.DataFrame | None = None
+        self._sample: pd.DataFrame | None = None
+        self._stats = stats if stats is not None else SummaryStatsAccumulator(seed=seed)
+        self._coerce = coerce
+
+    def add_chunk(self, chunk: pd.DataFrame):
+        if chunk.empty:
+            return
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+        self.bytes_fetched += int(chunk.memory_usage(deep=True).sum())
+        if self._coerce is not None:
+            chunk = self._coerce(chunk)
+        self._update_preview(chunk)
+        self._update_sample(chunk)
+        self._stats.update(chunk)
+        self.row_count += len(chunk)
+
+    def _update_preview(self, chunk: pd.DataFrame):
+        have = 0 if self._preview is None else len(self._preview)
+        if have >= self.preview_rows:
+            return
+        head = chunk.head(self.preview_rows - have)
+        self._preview = head if self._preview is None else pd.concat([self._preview, head], ignore_index=True)
+
+    def _update_sample(self, chunk: pd.DataFrame):
+        """Vectorized reservoir sampling (Algorithm R) over the stream of rows."""
+        have = 0 if self._sample is None else len(self._sample)
+        fill = min(len(chunk), self.sample_rows - have)
+        if fill > 0:
+            head = chunk.iloc[:fill]
+            self._sample = head.reset_index(drop=True) if self._sample is None else pd.concat([self._sample, head], ignore_index=True)
+        rest = chunk.iloc[fill:]
+        if rest.empty:
+            return
+        positions = self.row_count + fill + np.arange(len(rest))  # 0-based stream position of each row
+        slots = (self._rng.random(len(rest)) * (positions + 1)).astype(np.int64)
+        accepted = slots < self.sample_rows
+        if not accepted.any():
+            return
+        # Later rows overwrite earlier ones that drew the same slot, as in sequential Algorithm R.
+        replacements = pd.Series(np.flatnonzero(accepted), index=slots[accepted])
+        replacements = replacements[~replacements.index.duplicated(keep="last")]
+        incoming = rest.iloc[replacements.to_numpy()]
+        target_rows = replacements.index.to_numpy()
+        for j in range(incoming.shape[1]):
+            self._sample.iloc[target_rows, j] = incoming.iloc[:, j].to_numpy()
+
+    @property
+    def preview(self) -> pd.DataFrame:
+        return self._preview if self._preview is not None else pd.DataFrame(columns=self.columns or [])
+
+    @property
+    def sample(self) -> pd.DataFrame:
+        return self._sample if self._sample is not None else pd.DataFrame(columns=self.columns or [])
+
+    def summary_stats(self) -> dict:
+        return self._stats.to_dict()
@@ -0,0 +1,341 @@
+import math
+import datetime
+import logging
+from numbers import Number
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.25, 0.5, 0.75)
+_QUANTILE_KEYS = tuple(f"{int(q * 100)}%" for q in QUANTILES)  # The keys DataFrame.describe() uses
+
+
+class _RunningMoments:
+    """Count/mean/variance/min/max of a numeric column, merged chunk by chunk (Chan et al.)."""
+    __slots__ = ("count", "mean", "m2", "min", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values: np.ndarray):
+        values = values[~np.isnan(values)]
+        n = values.size
+        if n == 0:
+            return
+        chunk_mean = float(values.mean())
+        chunk_m2 = float(((values - chunk_mean) ** 2).sum())
+        total = self.count + n
+        delta = chunk_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += chunk_m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def to_dict(self) -> dict:
+        if self.count == 0:
+            return {"count": 0}
+        std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None
+        return {"count": self.count, "mean": self.mean, "std": std, "min": self.min, "max": self.max}
+
+
+class _QuantileReservoir:
+    """Uniform sample of at most ``size`` values (vectorized Algorithm R); quantiles are exact until it overflows."""
+    __slots__ = ("size", "seen", "values", "_rng")
+
+    def __init__(self, size: int, rng: np.random.Generator):
+        self.size = size
+        self.seen = 0
+        self.values = np.empty(0, dtype="float64")
+        self._rng = rng
+
+    @property
+    def exact(self) -> bool:
+        return self.seen <= self.size
+
+    def update(self, values: np.ndarray):
+        fill = min(values.size, self.size - self.values.size)
+        if fill > 0:
+            self.values = np.concatenate([self.values, values[:fill]])
+        rest = values[fill:]
+        if rest.size:
+            positions = self.seen + fill + np.arange(rest.size)  # 0-based stream position of each value
+            slots = (self._rng.random(rest.size) * (positions + 1)).astype(np.int64)
+            accepted = np.flatnonzero(slots < self.size)[::-1]
+            # Later values overwrite earlier ones that drew the same slot, as in sequential Algorithm R.
+            targets, last = np.unique(slots[accepted], return_index=True)
+            self.values[targets] = rest[accepted[last]]
+        self.seen += values.size
+
+    def quantiles(self) -> list[float | None]:
+        if self.values.size == 0:
+            return [None] * len(QUANTILES)
+        return [float(v) for v in np.quantile(self.values, QUANTILES)]
+
+
+class _DistinctSketch:
+    """K-minimum-values distinct count: exact below ``k`` distinct values, ~1/sqrt(k) relative error above."""
+    __slots__ = ("k", "hashes", "saturated")
+
+    def __init__(self, k: int):
+        self.k = k
+        self.hashes = np.empty(0, dtype="uint64")
+        self.saturated = False
+
+    def update(self, values: pd.Index):
+        """Adds distinct ``values`` (duplicates are harmless, just slower)."""
+        hashes = pd.util.hash_array(np.asarray(values, dtype=object))
+        hashes = np.unique(np.concatenate([self.hashes, hashes]))
+        if hashes.size > self.k:
+            hashes, self.saturated = hashes[:self.k], True
+        self.hashes = hashes
+
+    def estimate(self) -> int:
+        if not self.saturated:
+            return int(self.hashes.size)
+        return int(round((self.k - 1) * 2.0 ** 64 / float(self.hashes[-1])))
+
+
+class _FrequentItems:
+    """Misra-Gries heavy hitters with ``capacity`` counters, merged one chunk's value counts at a time.
+
+    Counts are lower bounds, each short by at most ``error``; values seen more often than
+    rows / (capacity + 1) times are guaranteed to be kept.
+    """
+    __slots__ = ("capacity", "counts", "error")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype="int64")
+        self.error = 0
+
+    def update(self, counts: pd.Series):
+        """Merges one chunk's value -> count Series."""
+        merged = counts if self.counts.empty else self.counts.add(counts, fill_value=0).astype("int64")
+        if len(merged) > self.capacity:
+            cut = int(merged.nlargest(self.capacity + 1).iloc[-1])
+            merged = merged[merged > cut] - cut
+            self.error += cut
+        self.counts = merged
+
+    def top(self, k: int) -> list[tuple]:
+        return list(self.counts.nlargest(k).items())
+
+
+def _column_kind(series: pd.Series) -> str | None:
+    """'numeric', 'boolean', 'datetime' or 'categorical'; None while an object column has only nulls."""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return "boolean"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "numeric"
+    if dtype != object:
+        return "categorical"
+    non_null = series.dropna()
+    if non_null.empty:
+        return None
+    first = non_null.iloc[0]
+    if isinstance(first, (bool, np.bool_)):
+        return "boolean"
+    if isinstance(first, datetime.date):
+        return "datetime"
+    if isinstance(first, Number):  # Includes Decimal, which PostgreSQL NUMERIC columns arrive as
+        return "numeric"
+    return "categorical"
+
+
+def _json_value(value):
+    """Compact JSON-safe form: NaN/inf become None, floats keep 10 significant digits, timestamps are ISO strings."""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float):
+        return float(f"{value:.10g}") if math.isfinite(value) else None
+    if isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)
+
+
+class _ColumnStats:
+    """Statistics for one column. The kind is fixed by the first chunk holding a non-null value."""
+
+    def __init__(self, sample_size: int, distinct_k: int, top_k: int, rng: np.random.Generator):
+        self.kind: str | None = None
+        self.rows = 0
+        self.nulls = 0
+        self.sketched_rows = 0
+        self._sample_size = sample_size
+        self._distinct_k = distinct_k
+        self._top_k = top_k
+        self._rng = rng
+        self._moments: _RunningMoments | None = None
+        self._reservoir: _QuantileReservoir | None = None
+        self._distinct: _DistinctSketch | None = None
+        self._frequent: _FrequentItems | None = None
+        self._true = 0
+        self._min = None
+        self._max = None
+
+    def update(self, series: pd.Series, sketch_rows: np.ndarray | None, summarize: bool = True):
+        """Adds a chunk; sketches only see the rows at ``sketch_rows`` (all rows when None)."""
+        self.rows += len(series)
+        if not summarize:
+            self.nulls += int(series.isna().sum())
+            return
+        if self.kind is None:
+            self.kind = _column_kind(series)
+            if self.kind is None:
+                self.nulls += len(series)
+                return
+        getattr(self, f"_update_{self.kind}")(series, sketch_rows)
+
+    def _update_numeric(self, series: pd.Series, sketch_rows: np.ndarray | None):
+        if series.dtype == object:
+            try:
+                series = series.astype("float64")  # Fast path for Decimal/int/float objects
+            except (TypeError, ValueError):
+                series = pd.to_numeric(series, errors="coerce")
+        values = series.to_numpy(dtype="float64", na_value=np.nan)
+        if self._moments is None:
+            self._moments = _RunningMoments()
+            self._reservoir = _QuantileReservoir(self._sample_size, self._rng)
+        self._moments.update(values)
+        self.nulls += int(np.isnan(values).sum())
+        sketched = values if sketch_rows is None else values[sketch_rows]
+        self._reservoir.update(sketched[~np.isnan(sketched)])
+        self.sketched_rows += sketched.size
+
+    def _update_boolean(self, series: pd.Series, sketch_rows: np.ndarray | None):
+        non_null = series.dropna()
+        self.nulls += len(series) - len(non_null)
+        self._true += int(non_null.astype(bool).sum())
+
+    def _update_datetime(self, series: pd.Series, sketch_rows: np.ndarray | None):
+        if not pd.api.types.is_datetime64_any_dtype(series.dtype):
+            series = pd.to_datetime(series, errors="coerce")
+        non_null = series.dropna()
+        self.nulls += len(series) - len(non_null)
+        if non_null.empty:
+            return
+        low, high = non_null.min(), non_null.max()
+        self._min = low if self._min is None else min(self._min, low)
+        self._max = high if self._max is None else max(self._max, high)
+
+    def _update_categorical(self, series: pd.Series, sketch_rows: np.ndarray | None):
+        self.nulls += int(series.isna().sum())
+        sketched = series if sketch_rows is None else series.iloc[sketch_rows]
+        self.sketched_rows += len(sketched)
+        codes, uniques = pd.factorize(sketched)  # One hashing pass feeds both sketches
+        if len(uniques) == 0:
+            return
+        if self._distinct is None:
+            self._distinct = _DistinctSketch(self._distinct_k)
+            self._frequent = _FrequentItems(max(64, 8 * self._top_k))
+        self._distinct.update(uniques)
+        self._frequent.update(pd.Series(np.bincount(codes[codes >= 0], minlength=len(uniques)), index=uniques))
+
+    def to_dict(self) -> dict:
+        count = self.rows - self.nulls
+        stats = {"type": self.kind or "empty", "count": count, "nulls": self.nulls}
+        approximate = False
+        if self.kind == "numeric" and self._moments is not None and self._moments.count:
+            moments = self._moments.to_dict()
+            stats.update({"mean": moments["mean"], "std": moments["std"], "min": moments["min"]})
+            stats.update(zip(_QUANTILE_KEYS, self._reservoir.quantiles()))
+            stats["max"] = moments["max"]
+            approximate = not self._reservoir.exact
+        elif self.kind == "boolean":
+            stats.update({"true": self._true, "false": count - self._true})
+        elif self.kind == "datetime":
+            stats.update({"min": self._min, "max": self._max})
+        elif self.kind == "categorical" and self._distinct is not None:
+            stats["unique"] = self._distinct.estimate()
+            top = self._frequent.top(self._top_k)
+            if top:  # Empty when no value stands out from a long tail of equally rare ones
+                stats.update({"top": top[0][0], "freq": top[0][1], "top_values": [[value, freq] for value, freq in top]})
+            approximate = self._distinct.saturated or self._frequent.error > 0
+        if self.kind in ("numeric", "categorical") and self.sketched_rows < count:
+            stats["sketched_rows"] = self.sketched_rows
+            approximate = True
+        if approximate:
+            stats["approximate"] = True
+        return {key: [[_json_value(v), f] for v, f in value] if key == "top_values" else _json_value(value)
+                for key, value in stats.items()}
+
+
+def unique_labels(columns) -> list[str]:
+    """Column names made unique for use as keys: a repeated name (e.g. from a join) becomes 'name_2', 'name_3', ..."""
+    taken = {str(col) for col in columns}
+    seen: set[str] = set()
+    labels = []
+    for col in map(str, columns):
+        label, n = col, 1
+        while label in seen or (n > 1 and label in taken):  # Never reuse another column's real name
+            n += 1
+            label = f"{col}_{n}"
+        seen.add(label)
+        labels.append(label)
+    return labels
+
+
+class SummaryStatsAccumulator:
+    """Type-appropriate per-column summary statistics over a result delivered in chunks.
+
+    Numeric columns get count/mean/std/min/max plus quartiles from a bounded reservoir;
+    categorical columns an approximate distinct count (KMV) and top values (Misra-Gries);
+    booleans true/false counts; datetimes min/max. Cost is bounded by the budget: only the
+    first ``max_columns`` columns are summarized (the rest just get counts), and at most
+    ``cell_budget`` values (rows x summarized columns, 0 for no limit) feed the sketches.
+    Once it is spent, later chunks only update the cheap aggregates and the affected
+    columns report ``sketched_rows``. Estimated statistics are flagged ``approximate``.
+    Columns are tracked by position, so repeated names (from joins) are summarized
+    separately and reported under unique_labels().
+    """
+
+    def __init__(self, max_columns: int = 50, cell_budget: int = 2_000_000, sample_size: int = 1024,
+                 distinct_k: int = 1024, top_k: int = 5, seed: int = 0):
+        self.max_columns = max_columns
+        self.cell_budget = cell_budget
+        self.sample_size = sample_size
+        self.distinct_k = distinct_k
+        self.top_k = top_k
+        self.columns: list[str] | None = None
+        self.cells_sketched = 0
+        self._rng = np.random.default_rng(seed)
+        self._stats: list[_ColumnStats] = []
+
+    def _sketch_rows(self, rows: int, summarized: int) -> np.ndarray | None:
+        """Positions of the chunk rows the sketches may see (None for all): a uniform subset once the budget runs low."""
+        if self.cell_budget <= 0 or summarized == 0:
+            return None
+        allowed = max(0, (self.cell_budget - self.cells_sketched) // summarized)
+        if allowed >= rows:
+            return None
+        return np.sort(self._rng.choice(rows, size=allowed, replace=False))
+
+    def update(self, chunk: pd.DataFrame):
+        if chunk.empty:
+            return
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self._stats = [_ColumnStats(self.sample_size, self.distinct_k, self.top_k, self._rng) for _ in self.columns]
+        summarized = min(len(self.columns), self.max_columns)
+        sketch_rows = self._sketch_rows(len(chunk), summarized)
+        for i, stats in enumerate(self._stats):
+            stats.update(chunk.iloc[:, i], sketch_rows, summarize=i < summarized)
+        self.cells_sketched += (len(chunk) if sketch_rows is None else len(sketch_rows)) * summarized
+
+    def to_dict(self) -> dict:
+        return {label: stats.to_dict() for label, stats in zip(unique_labels(self.columns or []), self._stats)}
+
@@ -0,0 +1,65 @@
+import logging
+
+import psycopg2
+from psycopg2 import errors
+
+logger = logging.getLogger(__name__)
+
+# Kept outside the 'public' schema so it never shows up in the schema described to the LLM.
+VERSIONS_SCHEMA = "hoopsense_meta"
+VERSIONS_TABLE = f"{VERSIONS_SCHEMA}.table_versions"
+
+
+def ensure_table_versions_table(conn):
+    """Creates the per-table version (ETag) table if it does not exist yet."""
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {VERSIONS_SCHEMA}")
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} (
+                table_name TEXT PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 1,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+    conn.commit()
+
+
+def bump_table_versions(conn, table_names) -> dict:
+    """Increments the version of each table after new data was written to it. Returns the new versions."""
+    table_names = sorted({name.lower() for name in table_names})
+    if not table_names:
+        return {}
+    ensure_table_versions_table(conn)
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO {VERSIONS_TABLE} AS tv (table_name, version, updated_at)
+            SELECT unnest(%s::text[]), 1, now()
+            ON CONFLICT (table_name) DO UPDATE SET version = tv.version + 1, updated_at = now()
+            RETURNING table_name, version
+        """, (table_names,))
+        versions = dict(cursor.fetchall())
+    conn.commit()
+    logger.info(f"Bumped table versions: {versions}")
+    return versions
+
+
+def fetch_table_versions(conn, table_names) -> dict:
+    """Returns the current version of each table; tables never bumped report version 0."""
+    table_names = sorted({name.lower() for name in table_names})
+    versions = dict.fromkeys(table_names, 0)
+    if not table_names:
+        return versions
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"SELECT table_name, version FROM {VERSIONS_TABLE} WHERE table_name = ANY(%s)",
+                (table_names,),
+            )
+            versions.update(dict(cursor.fetchall()))
+        conn.rollback()  # Read-only; end the implicit transaction so the snapshot is fresh next time.
+    except errors.UndefinedTable:
+        conn.rollback()
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+    return versions
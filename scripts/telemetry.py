@@ -0,0 +1,319 @@
+import sys
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from collections import Counter as _StackCounter
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def _format_labels(labelnames: tuple, values: tuple, **extra) -> str:
+    pairs = list(zip(labelnames, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels, rendered in the Prometheus text exposition format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple, list] = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le=f'{bound:g}')} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le='+Inf')} {values[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {values[-2]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {values[-1]}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter with labels, rendered in the Prometheus text exposition format."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        lines.extend(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}" for key, value in sorted(values.items()))
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can go up and down (e.g. requests in flight), rendered in the Prometheus text exposition format."""
+
+    def set(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+STAGE_SECONDS = Histogram("hoopsense_stage_duration_seconds", "Time spent in each query pipeline stage.", ("stage",))
+RESULT_ROWS = Histogram("hoopsense_result_rows", "Rows returned by executed SQL queries.", ("backend",), SIZE_BUCKETS)
+PROMPT_TOKENS = Histogram("hoopsense_prompt_tokens", "Estimated tokens in prompts sent to the LLM.", (), SIZE_BUCKETS)
+CACHE_LOOKUPS = Counter("hoopsense_cache_lookups_total", "Cache lookups by cache and outcome.", ("cache", "result"))
+QUERIES = Counter("hoopsense_queries_total", "Processed natural language questions by outcome.", ("status",))
+INTENT_MATCHES = Counter(
+    "hoopsense_intent_matches_total", 'Questions answered by an SQL template (template="none": sent to the LLM).', ("template",)
+)
+COALESCED = Counter(
+    "hoopsense_coalesced_calls_total", "Calls that waited for an identical call already in flight instead of running their own.", ("flight",)
+)
+COALESCED_TIMEOUTS = Counter(
+    "hoopsense_coalesced_timeouts_total", "Coalesced calls that stopped waiting after their timeout.", ("flight",)
+)
+METRICS = [STAGE_SECONDS, RESULT_ROWS, PROMPT_TOKENS, CACHE_LOOKUPS, QUERIES, INTENT_MATCHES, COALESCED, COALESCED_TIMEOUTS]
+
+
+def render_prometheus(extra_metrics: list | None = None) -> str:
+    """All metrics (plus ``extra_metrics``) in the Prometheus text exposition format."""
+    lines = []
+    for metric in METRICS + list(extra_metrics or []):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Counts a cache lookup and flags it on the current span (``<cache>_cache_hit``)."""
+    CACHE_LOOKUPS.inc(cache=cache, result="hit" if hit else "miss")
+    set_attributes(**{f"{cache}_cache_hit": hit})
+
+
+_tracer = None
+
+
+def enable_opentelemetry(service_name: str = "hoopsense") -> bool:
+    """Also emits every span through the OpenTelemetry API when the package is installed.
+
+    Exporters are configured by the application (or the ``opentelemetry-instrument``
+    wrapper); without one the API's no-op tracer is used.
+    """
+    global _tracer
+    try:
+        from opentelemetry import trace as otel_trace  # Optional dependency
+    except ImportError:
+        logger.warning("opentelemetry-api is not installed; spans are only recorded locally.")
+        return False
+    _tracer = otel_trace.get_tracer(service_name)
+    return True
+
+
+class SamplingProfiler:
+    """Samples the stacks of the threads working on one trace every ``interval`` seconds.
+
+    Threads are sampled only while they are inside one of the trace's spans. The event-loop
+    thread is shared by concurrent requests, so its samples can include other requests'
+    coroutines. Results are collapsed stacks ("outer;...;inner" -> samples), the input
+    format of flame graph tools.
+    """
+
+    def __init__(self, active_threads: dict, interval: float = 0.005, max_depth: int = 40):
+        self.active_threads = active_threads
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: _StackCounter = _StackCounter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="hoopsense-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.active_threads):
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def to_dict(self, top: int = 25) -> dict:
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "stacks": [{"stack": stack, "samples": count} for stack, count in self.stacks.most_common(top)],
+        }
+
+
+class Trace:
+    """Spans recorded for one request, from any thread its work runs on."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: list[dict] = []
+        self.active_threads: dict[int, int] = {}  # thread id -> open spans, for the profiler
+        self.profiler: SamplingProfiler | None = None
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self.active_threads[thread_id] = self.active_threads.get(thread_id, 0) + 1
+
+    def _exit(self, record: dict):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self.spans.append(record)
+            if self.active_threads.get(thread_id, 0) <= 1:
+                self.active_threads.pop(thread_id, None)
+            else:
+                self.active_threads[thread_id] -= 1
+
+    def to_dict(self) -> dict:
+        """{"total_ms", "stages": name -> summed ms, "spans": [...] in start order, "profile" if sampled}."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda record: record["start_ms"])
+        stages: dict[str, float] = {}
+        for record in spans:
+            stages[record["name"]] = round(stages.get(record["name"], 0.0) + record["duration_ms"], 3)
+        result = {"total_ms": round((time.perf_counter() - self.started) * 1000, 3), "stages": stages, "spans": spans}
+        if self.profiler is not None:
+            result["profile"] = self.profiler.to_dict()
+        return result
+
+
+class Span:
+    __slots__ = ("name", "attributes", "_otel_span")
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self._otel_span = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        if self._otel_span is not None:
+            for key, value in attributes.items():
+                if isinstance(value, (bool, int, float, str)):
+                    self._otel_span.set_attribute(key, value)
+
+
+_current_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("_current_trace", default=None)
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar("_current_span", default=None)
+
+
+def set_attributes(**attributes):
+    """Adds attributes (row counts, sizes, cache flags, ...) to the innermost open span, if any."""
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Times a pipeline stage: feeds STAGE_SECONDS, the current trace and, if enabled, OpenTelemetry.
+
+    Works the same in coroutines and in worker threads that run in a copy of the caller's
+    context (asyncio.to_thread, run_in_executor with contextvars.copy_context()).
+    """
+    current_trace = _current_trace.get()
+    parent = _current_span.get()
+    current = Span(name, dict(attributes))
+    otel_context = _tracer.start_as_current_span(name) if _tracer is not None else None
+    if otel_context is not None:
+        current._otel_span = otel_context.__enter__()
+        current.set(**attributes)
+    if current_trace is not None:
+        current_trace._enter()
+    token = _current_span.set(current)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield current
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        _current_span.reset(token)
+        STAGE_SECONDS.observe(duration, stage=name)
+        if error is not None:
+            current.attributes["error"] = error
+        if current_trace is not None:
+            current_trace._exit({
+                "name": name,
+                "parent": parent.name if parent is not None else None,
+                "start_ms": round((started - current_trace.started) * 1000, 3),
+                "duration_ms": round(duration * 1000, 3),
+                "attributes": current.attributes,
+            })
+        if otel_context is not None:
+            otel_context.__exit__(*sys.exc_info())
+
+
+@contextmanager
+def trace(profile: bool = False, profile_interval: float = 0.005):
+    """Collects the spans of one request; ``profile`` also runs a SamplingProfiler over it."""
+    current_trace = Trace()
+    token = _current_trace.set(current_trace)
+    if profile:
+        current_trace.profiler = SamplingProfiler(current_trace.active_threads, interval=profile_interval)
+        current_trace.profiler.start()
+    try:
+        yield current_trace
+    finally:
+        if current_trace.profiler is not None:
+            current_trace.profiler.stop()
+        _current_trace.reset(token)
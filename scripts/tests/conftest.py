@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts are flat modules that import each other by name.
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from chart_reduction import COUNT_COLUMN, bin_scatter, reduce_line
+
+
+def test_bin_scatter_keeps_a_count_axis():
+    # SELECT pts, COUNT(*) FROM player_stats GROUP BY pts: PostgreSQL names the second column "count".
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"pts": rng.normal(12, 5, 5000), COUNT_COLUMN: rng.integers(100, 200, 5000)})
+    binned, info = bin_scatter(df, "pts", COUNT_COLUMN, max_points=100)
+    assert info["count_column"] == "_count" and list(binned.columns) == ["pts", "count", "_count"]
+    assert binned["_count"].sum() == 5000
+    assert binned["count"].between(100, 200).all()  # Means of the axis, not bin sizes
+
+
+def test_bin_scatter_row_counts_and_small_inputs():
+    df = pd.DataFrame({"x": np.arange(1000.0), "y": np.arange(1000.0) % 7})
+    binned, info = bin_scatter(df, "x", "y", max_points=50)
+    assert info["method"] == "bin2d" and binned[info["count_column"]].sum() == 1000 and len(binned) <= 50
+    small, info = bin_scatter(df.head(10), "x", "y", max_points=50)
+    assert info is None and len(small) == 10
+
+
+def test_reduce_line_keeps_endpoints():
+    df = pd.DataFrame({"x": np.arange(10_000), "y": np.sin(np.arange(10_000) / 100)})
+    reduced, info = reduce_line(df, "x", "y", max_points=200)
+    assert len(reduced) == 200 and info["method"] == "lttb"
+    assert reduced["x"].iloc[0] == 0 and reduced["x"].iloc[-1] == 9_999
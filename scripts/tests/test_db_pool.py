@@ -0,0 +1,156 @@
+import threading
+
+import psycopg2
+import pytest
+from psycopg2 import extensions
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query):
+        self.conn.pings += 1
+        if self.conn.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection for the pool: cursor, rollback, close, transaction status."""
+
+    def __init__(self):
+        self.closed = 0
+        self.broken = False
+        self.pings = 0
+        self.rollbacks = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def get_transaction_status(self):
+        return self.status
+
+
+def make_pool(**options):
+    created = []
+
+    def connect():
+        created.append(FakeConnection())
+        return created[-1]
+
+    options = {"min_size": 1, "max_size": 2, "timeout": 0.05, "ping_interval": 0, **options}
+    pool = ConnectionPool(connect, **options)
+    pool.open()
+    return pool, created
+
+
+def test_reuses_warm_connections():
+    pool, created = make_pool()
+    assert len(created) == 1
+    for _ in range(3):
+        with pool.connection() as conn:
+            assert conn is created[0]
+    metrics = pool.metrics()
+    assert (metrics["created"], metrics["checkouts"], metrics["idle"], metrics["in_use"]) == (1, 3, 1, 0)
+
+
+def test_overflow_then_timeout_when_exhausted():
+    pool, created = make_pool(max_overflow=1)
+    held = [pool.getconn() for _ in range(3)]
+    assert pool.metrics()["overflow_active"] == 1
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    for conn in held:
+        pool.putconn(conn)
+    metrics = pool.metrics()
+    assert metrics["timeouts"] == 1 and metrics["size"] == 2 and metrics["overflow_active"] == 0
+    assert held[2].closed  # Overflow connections are not kept
+
+
+def test_waiter_gets_returned_connection():
+    pool, _ = make_pool(max_size=1, timeout=5)
+    conn = pool.getconn()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    waiter.start()
+    pool.putconn(conn)
+    waiter.join(5)
+    assert got == [conn] and pool.metrics()["waits"] == 1
+
+
+def test_broken_connections_are_replaced():
+    pool, created = make_pool()
+    created[0].broken = True
+    with pool.connection() as conn:
+        assert conn is created[1]
+    assert created[0].closed and pool.metrics()["failed_health_checks"] == 1
+
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.connection() as conn:
+            raise psycopg2.OperationalError("connection lost")
+    assert conn.closed and pool.metrics()["size"] == 0
+
+
+def test_open_transactions_are_rolled_back_on_return():
+    pool, created = make_pool(ping_interval=60)
+    with pool.connection() as conn:
+        conn.status = extensions.TRANSACTION_STATUS_INTRANS
+    assert conn.rollbacks == 1 and conn.pings == 0 and not conn.closed
+
+
+def test_connection_info_lives_with_the_physical_connection():
+    pool, _ = make_pool()
+    with pool.connection() as conn:
+        pool.connection_info(conn)["prepared"] = {"top_scorers"}
+    with pool.connection() as conn:
+        assert pool.connection_info(conn) == {"prepared": {"top_scorers"}}
+    with pytest.raises(ValueError):
+        pool.connection_info(conn)
+
+
+def test_closeall_closes_idle_and_returned_connections():
+    pool, created = make_pool(min_size=2)
+    conn = pool.getconn()
+    pool.closeall()
+    assert sorted(c.closed for c in created) == [0, 1]
+    pool.putconn(conn)
+    assert all(c.closed for c in created)
+    with pytest.raises(psycopg2.InterfaceError):
+        pool.getconn()
+
+
+def test_concurrent_checkouts_stay_within_max_size():
+    pool, created = make_pool(max_size=3, timeout=5)
+    peak, in_use, lock = [0], [0], threading.Lock()
+
+    def worker():
+        for _ in range(50):
+            with pool.connection():
+                with lock:
+                    in_use[0] += 1
+                    peak[0] = max(peak[0], in_use[0])
+                with lock:
+                    in_use[0] -= 1
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak[0] <= 3 and len(created) <= 3 and pool.metrics()["checkouts"] == 400
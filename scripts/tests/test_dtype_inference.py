@@ -0,0 +1,34 @@
+import pandas as pd
+
+from dtype_inference import DtypeInferenceEngine
+
+SQL = "SELECT player_name, pts, game_date FROM player_stats WHERE season = '2023-24'"
+
+
+def test_text_numbers_and_dates_are_converted():
+    df = pd.DataFrame({"player_name": [" A ", "B"], "pts": ["10.5", " 7 "], "game_date": ["2024-01-02", None]})
+    coerced = DtypeInferenceEngine().coerce(df, sql_query=SQL)
+    assert coerced["pts"].tolist() == [10.5, 7.0]
+    assert pd.api.types.is_datetime64_any_dtype(coerced["game_date"]) and coerced["game_date"].isna().tolist() == [False, True]
+    assert coerced["player_name"].tolist() == ["A", "B"]
+    assert df["pts"].tolist() == ["10.5", " 7 "]  # The input frame is left alone
+
+
+def test_values_that_do_not_fit_the_cached_type_are_kept():
+    engine = DtypeInferenceEngine()
+    numbers = pd.DataFrame({"player_name": ["A"], "pts": ["10"], "game_date": ["2024-01-02"]})
+    assert engine.coerce(numbers, sql_query=SQL)["pts"].tolist() == [10.0]
+    # Same SQL shape, different literal: the cached schema says numeric, but this season stores text.
+    other = SQL.replace("2023-24", "1999-00")
+    text = pd.DataFrame({"player_name": ["A", "B"], "pts": ["10", "DNP"], "game_date": ["2024-01-02", "n/a"]})
+    coerced = engine.coerce(text, sql_query=other)
+    assert coerced["pts"].tolist() == ["10", "DNP"] and coerced["game_date"].tolist() == ["2024-01-02", "n/a"]
+    assert engine.schema_cache_hits == 1
+    engine.coerce(text, sql_query=other)
+    assert engine.schema_cache_misses == 2  # The mismatched schema was evicted and inferred again
+
+
+def test_duplicate_column_names_keep_their_own_kinds():
+    df = pd.DataFrame([["2020", "Lakers"], ["2021", "Celtics"]], columns=["season", "season"])
+    coerced = DtypeInferenceEngine().coerce(df)
+    assert coerced.iloc[:, 0].tolist() == [2020.0, 2021.0] and coerced.iloc[:, 1].tolist() == ["Lakers", "Celtics"]
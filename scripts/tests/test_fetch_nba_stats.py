@@ -0,0 +1,79 @@
+import os
+
+import pandas as pd
+import pytest
+
+import fetch_nba_stats
+from benchmarks import stub_endpoints
+from fetch_nba_stats import IngestJob, build_jobs, current_season, expand_seasons, load_endpoints, output_paths, run_ingest
+
+PAST_SEASON = "2021-22"
+OPTIONS = {"workers": 3, "requests_per_second": None, "backoff": 0.0}
+
+
+@pytest.fixture
+def endpoints():
+    stub_endpoints.reset()
+    yield load_endpoints("benchmarks.stub_endpoints")
+    stub_endpoints.reset()
+
+
+def by_status(results):
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return counts
+
+
+def test_job_matrix_is_fetched_and_partitioned(tmp_path, endpoints):
+    jobs = build_jobs(["player", "team"], expand_seasons(["2020-21:2021-22"]), ["Regular Season", "Playoffs"],
+                      ["PerGame"], ["Base", "Advanced"])
+    assert len(jobs) == 16
+    results = run_ingest(jobs, endpoints, data_dir=str(tmp_path), **OPTIONS)
+    assert by_status(results) == {"fetched": 16}
+    called = {(c["endpoint"], c["season"], c["season_type"], c["measure_type"]) for c in stub_endpoints.calls}
+    assert len(called) == 16
+    job = IngestJob("player", "2021-22", "Playoffs", "PerGame", "Advanced")
+    frame = pd.read_parquet(output_paths(job, str(tmp_path))[0])
+    assert {"player_name", "off_rating"} <= set(frame.columns) and len(frame) == len(stub_endpoints.PLAYERS)
+
+
+def test_failures_are_retried(tmp_path, endpoints):
+    jobs = build_jobs(["player"], [PAST_SEASON, "2022-23"], ["Regular Season"], ["PerGame"], ["Base"])
+    stub_endpoints.fail_next(2, season=PAST_SEASON)
+    stub_endpoints.fail_next(5, season="2022-23")
+    results = {r["job"].season: r for r in run_ingest(jobs, endpoints, data_dir=str(tmp_path), retries=3, **OPTIONS)}
+    assert results[PAST_SEASON]["status"] == "fetched" and results[PAST_SEASON]["attempts"] == 3
+    assert results["2022-23"]["status"] == "failed" and "Simulated failure" in results["2022-23"]["error"]
+    assert not os.path.exists(output_paths(results["2022-23"]["job"], str(tmp_path))[0])
+
+
+def test_manifest_skips_fetched_past_seasons(tmp_path, endpoints):
+    jobs = build_jobs(["team"], [PAST_SEASON, current_season()], ["Regular Season"], ["PerGame"], ["Base"])
+    assert by_status(run_ingest(jobs, endpoints, data_dir=str(tmp_path), **OPTIONS)) == {"fetched": 2}
+    assert by_status(run_ingest(jobs, endpoints, data_dir=str(tmp_path), **OPTIONS)) == {"skipped": 2}
+    # Stale current-season outputs are re-fetched; past seasons never change.
+    results = run_ingest(jobs, endpoints, data_dir=str(tmp_path), max_age_hours=0, **OPTIONS)
+    assert {r["job"].season: r["status"] for r in results} == {PAST_SEASON: "skipped", current_season(): "fetched"}
+    assert by_status(run_ingest(jobs, endpoints, data_dir=str(tmp_path), force=True, **OPTIONS)) == {"fetched": 2}
+    os.remove(output_paths(jobs[0], str(tmp_path))[0])
+    results = run_ingest(jobs, endpoints, data_dir=str(tmp_path), **OPTIONS)
+    assert {r["job"].season: r["status"] for r in results} == {PAST_SEASON: "fetched", current_season(): "skipped"}
+
+
+def test_main_runs_against_stub_without_touching_the_database(tmp_path, endpoints, monkeypatch):
+    loads = []
+    monkeypatch.setattr(fetch_nba_stats, "load_into_database", lambda jobs, data_dir: loads.append(jobs) or True)
+    argv = ["--endpoints-module", "benchmarks.stub_endpoints", "--data-dir", str(tmp_path), "--seasons", PAST_SEASON,
+            "--measure-types", "Base", "Advanced", "--requests-per-second", "0", "--format", "parquet", "csv"]
+    assert fetch_nba_stats.main(argv) == 0
+    assert loads == []  # Nothing was loaded, so no table versions may change
+    assert os.path.exists(tmp_path / "nba_player_stats_2021_22_regular_season.csv")
+    assert fetch_nba_stats.main(argv + ["--load"]) == 0
+    assert len(loads) == 1 and {job.measure_type for job in loads[0]} == {"Base", "Advanced"}
+
+
+def test_load_requires_parquet_output(capsys):
+    with pytest.raises(SystemExit):
+        fetch_nba_stats.parse_args(["--load", "--format", "csv"])
+    assert "add parquet to --format" in capsys.readouterr().err
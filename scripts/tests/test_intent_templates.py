@@ -0,0 +1,49 @@
+import pytest
+
+from intent_templates import IntentParser, NameIndex, NamedEntity
+
+ENTITIES = [
+    NamedEntity("player", 1, "Trae Young", "2023-24"),
+    NamedEntity("player", 2, "Stephen Curry", "2023-24"),
+    NamedEntity("team", 11, "Los Angeles Lakers", "2023-24"),
+    NamedEntity("team", 12, "Boston Celtics", "2023-24"),
+]
+COLUMNS = {"player_stats": {"pts", "reb", "ast", "gp"}, "team_stats": {"pts", "reb", "w", "gp"}}
+
+
+@pytest.fixture
+def parser():
+    names = NameIndex(ENTITIES, {"LAL": ENTITIES[2], "BOS": ENTITIES[3]})
+    return IntentParser(names, COLUMNS, {"PerGame", "Totals"})
+
+
+@pytest.mark.parametrize("question, template", [
+    ("Compare Stephen Curry and Trae Young points in 2022-23", "player_stat_range"),
+    ("stephen cury rebounds last 3 seasons", "player_stat_last_n"),
+    ("Top 5 scorers in 2023", "player_leaders_range"),
+    ("Which teams had the most wins this season?", "team_leaders_latest"),
+    ("LAL vs BOS rebounds", "team_stat_all"),
+])
+def test_matches_template(parser, question, template):
+    assert parser.parse(question).template == template
+
+
+@pytest.mark.parametrize("question", [
+    "Who led the Lakers in rebounds in 2023-24?",
+    "Top 5 scorers on the Celtics",
+    "Lakers leading scorer last season",
+    "Stephen Curry career points",
+    "Stephen Curry points and rebounds",
+    "Michael Jordan points per game",
+    "which young players scored the most points against Boston",
+])
+def test_falls_through_to_llm(parser, question):
+    assert parser.parse(question) is None
+
+
+def test_display_sql_inlines_parameters(parser):
+    match = parser.parse("Trae Young assists in the 2021 playoffs")
+    assert match.params[:3] == ["Playoffs", "PerGame", 1]
+    assert "$" not in match.display_sql
+    assert "season_type = 'Playoffs'" in match.display_sql
+    assert match.statement_name == "hoopsense_player_stat_range_ast_desc"
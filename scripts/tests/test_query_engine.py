@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("google.generative_ai")
+pytest.importorskip("altair")
+
+import query_engine  # noqa: E402
+
+
+class _Backend:
+    def __init__(self, name):
+        self.name = name
+
+
+def test_translation_caches_are_kept_per_backend(monkeypatch):
+    monkeypatch.setattr(query_engine, "NL_CACHE_BACKEND", "memory")
+    monkeypatch.setattr(query_engine, "_translation_caches", {})
+    postgres, duckdb = _Backend("postgres"), _Backend("duckdb")
+
+    query_engine.get_translation_cache(postgres).put("top scorers", "fp-postgres", "SELECT 1", None)
+    assert query_engine.get_translation_cache(duckdb).get("top scorers", "fp-duckdb") is None
+    assert query_engine.get_translation_cache(postgres).get("top scorers", "fp-postgres") == ("SELECT 1", None)
+
+
+class _ChunkBackend(_Backend):
+    errors = (RuntimeError,)
+
+    def __init__(self, rows):
+        super().__init__("fake")
+        self.rows = rows
+
+    def iter_chunks(self, sql_query, chunk_rows, canceller=None):
+        frame = query_engine.pd.DataFrame({"pts": range(self.rows)})
+        for start in range(0, self.rows, chunk_rows):
+            yield frame.iloc[start:start + chunk_rows]
+
+
+@pytest.mark.parametrize("rows, expected_rows, truncated", [(5, 5, False), (6, 5, True), (3, 3, False)])
+def test_row_limit_flags_only_results_that_were_cut(monkeypatch, rows, expected_rows, truncated):
+    # Pre-flight's LIMIT lets row_limit + 1 rows through; a result of exactly row_limit rows is complete.
+    frame = query_engine.pd.DataFrame({"pts": range(rows)})
+    monkeypatch.setattr(query_engine, "STREAMING_EXECUTION", False)
+    monkeypatch.setattr(query_engine, "execute_sql_query", lambda sql_query: (frame, None))
+    df, info, _ = query_engine._execute_for_pipeline("SELECT pts FROM player_stats LIMIT 6", max_rows=5)
+    assert (len(df), info["row_count"], info["truncated"]) == (expected_rows, expected_rows, truncated)
+
+    monkeypatch.setattr(query_engine, "STREAM_CHUNK_ROWS", 2)
+    collector, streamed_truncated, _ = query_engine._run_sql_query_streaming("SELECT 1", _ChunkBackend(rows), max_rows=5)
+    assert (collector.row_count, streamed_truncated) == (expected_rows, truncated)
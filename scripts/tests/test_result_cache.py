@@ -0,0 +1,66 @@
+import pandas as pd
+
+from result_cache import ResultCache, normalize_sql, referenced_tables
+
+SQL = "SELECT player_name, pts FROM player_stats WHERE season = '2023-24'"
+
+
+class Versions:
+    """Version provider whose table versions the test bumps like an ingest would."""
+
+    def __init__(self):
+        self.versions = {}
+
+    def __call__(self, tables):
+        return {table: self.versions.get(table, 0) for table in tables}
+
+    def bump(self, table):
+        self.versions[table] = self.versions.get(table, 0) + 1
+
+
+def make_cache(versions):
+    return ResultCache(max_bytes=10_000_000, version_provider=versions, version_check_interval=0)
+
+
+def test_referenced_tables_skips_ctes_and_schemas():
+    sql_query = "WITH t AS (SELECT * FROM public.player_stats) SELECT * FROM t JOIN team_stats ON true"
+    assert referenced_tables(sql_query) == {"player_stats", "team_stats"}
+    assert normalize_sql("SELECT  1 -- note\n ;") == "SELECT 1"
+
+
+def test_hit_until_table_is_bumped():
+    versions = Versions()
+    cache = make_cache(versions)
+    df = pd.DataFrame({"player_name": ["A"], "pts": [30]})
+    assert cache.put(SQL, df)
+    pd.testing.assert_frame_equal(cache.get(SQL), df)
+    versions.bump("player_stats")
+    assert cache.get(SQL) is None
+
+
+def test_ingest_during_execution_invalidates_result():
+    versions = Versions()
+    cache = make_cache(versions)
+    before = cache.versions_for(SQL)
+    versions.bump("player_stats")  # Lands while the query runs: its result may predate the new rows
+    cache.put(SQL, pd.DataFrame({"pts": [1]}), versions=before)
+    assert cache.get(SQL) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_volatile_queries_are_not_cached():
+    cache = make_cache(Versions())
+    assert not cache.put("SELECT now(), pts FROM player_stats", pd.DataFrame({"pts": [1]}))
+
+
+def test_samples_are_kept_apart_from_full_results():
+    cache = make_cache(Versions())
+    sample = pd.DataFrame({"pts": [3]})
+    cache.put(SQL, sample, metadata={"row_count": 5000, "sampled": True}, variant="stream:100")
+    assert cache.get(SQL) is None
+    assert cache.lookup(SQL, variant="stream:200") is None
+    assert cache.lookup(SQL, variant="stream:100")[1]["sampled"]
+    assert cache.get(SQL, variant="stream:100") is None  # get() only returns complete results
+    full = pd.DataFrame({"pts": [1, 2, 3]})
+    cache.put(SQL, full)
+    pd.testing.assert_frame_equal(cache.get(SQL), full)
@@ -0,0 +1,86 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rollups import ROLLUPS, RollupRewriter
+
+duckdb = pytest.importorskip("duckdb")
+
+ROLLUP_SOURCES = [rollup for rollup in ROLLUPS if rollup.rewritable]
+
+
+@pytest.fixture(scope="module")
+def database():
+    """player_stats/team_stats with a few seasons of random rows, plus every rewritable rollup materialized over them."""
+    rng = np.random.default_rng(7)
+    rows = 600
+    players = rng.integers(0, 40, rows)
+    player_stats = pd.DataFrame({
+        "player_id": players,
+        "player_name": [f"Player {p}" for p in players],
+        "team_abbreviation": rng.choice(["BOS", "LAL", "GSW"], rows),
+        "season": rng.choice(["2021-22", "2022-23", "2023-24"], rows),
+        "season_type": rng.choice(["Regular Season", "Playoffs"], rows),
+        "per_mode": rng.choice(["PerGame", "Totals"], rows),
+        "gp": rng.integers(1, 82, rows),
+        "pts": rng.normal(12, 6, rows).round(1),
+        "ast": np.where(rng.random(rows) < 0.1, np.nan, rng.normal(3, 2, rows).round(1)),
+        "fgm": rng.normal(4, 2, rows).round(1),
+        "fga": rng.normal(9, 3, rows).round(1),
+    })
+    team_stats = pd.DataFrame({
+        "team_id": [1, 2, 3] * 4, "team_name": ["Celtics", "Lakers", "Warriors"] * 4,
+        "season": ["2022-23"] * 6 + ["2023-24"] * 6, "season_type": "Regular Season", "per_mode": "PerGame",
+        "gp": 82, "pts": rng.normal(112, 5, 12).round(1), "w": rng.integers(20, 60, 12),
+    })
+    conn = duckdb.connect()
+    conn.register("player_source", player_stats)
+    conn.register("team_source", team_stats)
+    conn.execute("CREATE TABLE player_stats AS SELECT * FROM player_source")
+    conn.execute("CREATE TABLE team_stats AS SELECT * FROM team_source")
+    columns = {}
+    for rollup in ROLLUP_SOURCES:
+        source = set(conn.execute(f"SELECT * FROM {rollup.source_table} LIMIT 0").df().columns)
+        conn.execute(f"CREATE TABLE {rollup.name} AS {rollup.select_sql(source)}")
+        columns[rollup.name] = set(conn.execute(f"SELECT * FROM {rollup.name} LIMIT 0").df().columns)
+    yield conn, RollupRewriter(columns)
+    conn.close()
+
+
+def _rows(conn, sql_query):
+    df = conn.execute(sql_query).df()
+    return sorted(tuple(None if pd.isna(v) else round(float(v), 6) if isinstance(v, (int, float, np.number)) else v
+                        for v in row) for row in df.itertuples(index=False))
+
+
+@pytest.mark.parametrize("sql_query, rollup", [
+    ("SELECT player_name, SUM(pts) AS total FROM player_stats WHERE season_type = 'Regular Season' "
+     "AND per_mode = 'Totals' GROUP BY player_name ORDER BY total DESC LIMIT 10", "rollup_player_career"),
+    ("select p.season, avg(p.ast), count(*) from player_stats p where p.season >= '2022-23' "
+     "group by p.season having count(*) > 5 order by 1", "rollup_player_season"),
+    ("SELECT player_id, MIN(pts), MAX(fga), COUNT(ast) FROM player_stats GROUP BY player_id", "rollup_player_career"),
+    ("SELECT player_name, round(avg(pts), 1) AS ppg FROM player_stats GROUP BY player_name ORDER BY ppg DESC", "rollup_player_career"),
+    ("SELECT Season, SUM(PTS) FROM PLAYER_STATS WHERE Season_Type = 'Playoffs' GROUP BY Season", "rollup_player_season"),
+    ("SELECT team_name, season, SUM(w) FROM team_stats GROUP BY team_name, season", "rollup_team_season"),
+])
+def test_rewrites_give_the_same_result(database, sql_query, rollup):
+    conn, rewriter = database
+    rewritten, used = rewriter.rewrite(sql_query)
+    assert used == rollup and re.search(rf"\bFROM {rollup}\b", rewritten)
+    assert _rows(conn, rewritten) == _rows(conn, sql_query)
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT player_name, pts FROM player_stats",
+    "SELECT player_name, SUM(pts) FROM player_stats WHERE team_abbreviation = 'LAL' GROUP BY player_name",
+    "SELECT player_name, MAX(pts) FROM player_stats GROUP BY player_name HAVING MAX(fg_pct) > 0.5",
+    "SELECT COUNT(DISTINCT player_id) FROM player_stats",
+    "SELECT p.player_name, SUM(t.w) FROM player_stats p JOIN team_stats t ON p.season = t.season GROUP BY p.player_name",
+    "SELECT player_name, SUM(pts) FROM player_stats WHERE season IN (SELECT season FROM team_stats) GROUP BY player_name",
+    "SELECT player_name, SUM(pts) OVER (PARTITION BY season) FROM player_stats",
+])
+def test_leaves_other_queries_alone(database, sql_query):
+    _, rewriter = database
+    assert rewriter.rewrite(sql_query) == (sql_query, None)
@@ -0,0 +1,198 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Work:
+    """A computation that blocks until released, counting how often it ran."""
+
+    def __init__(self, result="done", error: Exception | None = None):
+        self.result = result
+        self.error = error
+        self.runs = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.cancelled = False
+
+    def __call__(self):
+        self.runs += 1
+        self.started.set()
+        assert self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    async def run_async(self):
+        self.runs += 1
+        self.started.set()
+        try:
+            while not self.release.is_set():
+                await asyncio.sleep(0.005)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def wait_for_waiters(flight: SingleFlight, coalesced: int):
+    deadline = time.monotonic() + 5
+    while flight.stats()["coalesced"] < coalesced:
+        assert time.monotonic() < deadline, flight.stats()
+        time.sleep(0.002)
+
+
+def test_threaded_callers_share_one_run():
+    flight, work = SingleFlight("test"), Work()
+    with ThreadPoolExecutor(8) as pool:
+        futures = [pool.submit(flight.do, "key", work) for _ in range(8)]
+        wait_for_waiters(flight, 7)
+        work.release.set()
+        assert [f.result() for f in futures] == ["done"] * 8
+    assert work.runs == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 7, "timeouts": 0, "in_flight": 0}
+
+
+def test_different_keys_and_later_calls_run_again():
+    flight, work = SingleFlight("test"), Work()
+    work.release.set()
+    assert flight.do("a", work) == flight.do("a", work) == flight.do("b", work) == "done"
+    assert work.runs == 3
+
+
+def test_errors_reach_every_waiter():
+    flight, error = SingleFlight("test"), ValueError("bad SQL")
+    work = Work(error=error)
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(flight.do, "key", work) for _ in range(4)]
+        wait_for_waiters(flight, 3)
+        work.release.set()
+        for future in futures:
+            with pytest.raises(ValueError) as raised:
+                future.result()
+            assert raised.value is error
+    assert work.runs == 1 and flight.stats()["in_flight"] == 0
+
+
+def test_thread_waiter_timeout_leaves_leader_running():
+    flight, work = SingleFlight("test"), Work()
+    with ThreadPoolExecutor(1) as pool:
+        leader = pool.submit(flight.do, "key", work)
+        assert work.started.wait(5)
+        with pytest.raises(TimeoutError):
+            flight.do("key", work, timeout=0.01)
+        work.release.set()
+        assert leader.result() == "done"
+    assert flight.stats()["timeouts"] == 1 and work.runs == 1
+
+
+def test_async_callers_share_one_run_and_errors():
+    flight = SingleFlight("test")
+
+    async def main():
+        work = Work()
+        callers = [asyncio.ensure_future(flight.do_async("key", work.run_async)) for _ in range(5)]
+        await asyncio.sleep(0.02)
+        work.release.set()
+        assert await asyncio.gather(*callers) == ["done"] * 5
+        assert work.runs == 1
+
+        failing = Work(error=KeyError("missing"))
+        callers = [asyncio.ensure_future(flight.do_async("other", failing.run_async)) for _ in range(3)]
+        await asyncio.sleep(0.02)
+        failing.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert all(isinstance(result, KeyError) for result in results) and failing.runs == 1
+
+    asyncio.run(main())
+
+
+def test_leader_timeout_keeps_running_for_surviving_waiter():
+    flight, work = SingleFlight("test"), Work()
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("key", work.run_async, timeout=0.05))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.ensure_future(flight.do_async("key", work.run_async))
+        with pytest.raises(asyncio.TimeoutError):
+            await leader
+        assert not work.cancelled
+        work.release.set()
+        assert await waiter == "done"
+
+    asyncio.run(main())
+    assert work.runs == 1 and not work.cancelled
+    assert flight.stats() == {"leaders": 1, "coalesced": 1, "timeouts": 1, "in_flight": 0}
+
+
+def test_abandoned_call_is_cancelled_and_restarted():
+    flight, work = SingleFlight("test"), Work()
+
+    async def main():
+        callers = [asyncio.ensure_future(flight.do_async("key", work.run_async, timeout=0.03)) for _ in range(3)]
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+        await asyncio.sleep(0.02)  # Let the cancellation reach the computation
+        assert work.cancelled and flight.stats()["in_flight"] == 0
+        work.release.set()
+        assert await flight.do_async("key", work.run_async) == "done"
+
+    asyncio.run(main())
+    assert work.runs == 2 and flight.stats()["leaders"] == 2
+
+
+def test_cancelled_waiter_does_not_cancel_the_call():
+    flight, work = SingleFlight("test"), Work()
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("key", work.run_async))
+        waiter = asyncio.ensure_future(flight.do_async("key", work.run_async))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.sleep(0.01)
+        work.release.set()
+        assert await leader == "done"
+        assert waiter.cancelled()
+
+    asyncio.run(main())
+    assert not work.cancelled and work.runs == 1
+
+
+def test_threads_join_an_async_call_and_loops_join_a_threaded_call():
+    flight = SingleFlight("test")
+    async_work, thread_work = Work("from loop"), Work("from thread")
+
+    async def async_leader():
+        return await flight.do_async("a", async_work.run_async)
+
+    loop_thread = ThreadPoolExecutor(1)
+    leader = loop_thread.submit(asyncio.run, async_leader())
+    assert async_work.started.wait(5)
+    with ThreadPoolExecutor(3) as pool:
+        thread_waiters = [pool.submit(flight.do, "a", async_work) for _ in range(3)]
+        wait_for_waiters(flight, 3)
+        async_work.release.set()
+        assert [f.result() for f in thread_waiters] == ["from loop"] * 3
+    assert leader.result() == "from loop"
+    loop_thread.shutdown()
+
+    with ThreadPoolExecutor(1) as pool:
+        thread_leader = pool.submit(flight.do, "b", thread_work)
+        assert thread_work.started.wait(5)
+
+        async def async_waiters():
+            callers = asyncio.gather(*[flight.do_async("b", thread_work.run_async) for _ in range(2)])
+            await asyncio.sleep(0.01)
+            thread_work.release.set()
+            return await callers
+
+        assert asyncio.run(async_waiters()) == ["from thread"] * 2
+        assert thread_leader.result() == "from thread"
+    assert async_work.runs == thread_work.runs == 1
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,52 @@
+import pytest
+
+from sql_preflight import apply_row_limit, has_top_level_limit, preflight, validate_sql
+
+COLUMNS = {"player_stats": {"player_name", "season", "pts", "team_id", "game_date"}, "team_stats": {"team_id", "team_name", "w"}}
+
+
+@pytest.mark.parametrize("sql_query", [
+    "SELECT player_name, pts FROM player_stats WHERE season = '2023-24' ORDER BY pts DESC",
+    "SELECT p.player_name, t.team_name FROM public.player_stats p JOIN public.team_stats AS t ON p.team_id = t.team_id",
+    "SELECT ps.pts FROM public.player_stats ps",
+    "WITH best AS (SELECT season, MAX(pts) AS top FROM player_stats GROUP BY season) SELECT season, top FROM best",
+    "SELECT EXTRACT(year FROM now()) AS y, COUNT(*) total FROM team_stats",
+    "SELECT player_name FROM player_stats WHERE game_date > CURRENT_DATE - INTERVAL '30 days'",
+    "SELECT current_timestamp AS asked_at, localtimestamp, LOCALTIME, current_time, pts FROM player_stats",
+    "SELECT CURRENT_DATE today, pts FROM player_stats WHERE game_date <= today",
+])
+def test_accepts_read_only_queries(sql_query):
+    assert validate_sql(sql_query, COLUMNS) is None
+
+
+@pytest.mark.parametrize("sql_query, reason", [
+    ("SELECT 1; DROP TABLE player_stats", "single SQL statement"),
+    ("DELETE FROM player_stats", "read-only SELECT"),
+    ("SELECT * FROM player_stats FOR UPDATE", "FOR UPDATE"),
+    ("SELECT pg_sleep(10)", "pg_sleep()"),
+    ("SELECT * FROM salaries", "Unknown table(s): salaries"),
+    ("SELECT * FROM other.player_stats", "Unknown table(s): other.player_stats"),
+    ("SELECT p.rebounds FROM public.player_stats p", "p.rebounds"),
+    ("SELECT assists FROM player_stats", "assists"),
+])
+def test_rejects(sql_query, reason):
+    assert reason in validate_sql(sql_query, COLUMNS)
+
+
+def test_row_limit_keeps_existing_paging():
+    assert apply_row_limit("SELECT * FROM player_stats ORDER BY pts;", 10) == "SELECT * FROM player_stats ORDER BY pts LIMIT 10"
+    wrapped = apply_row_limit("SELECT * FROM player_stats LIMIT 500", 10)
+    assert wrapped.endswith("AS preflight_limited LIMIT 10")
+    assert not has_top_level_limit("SELECT * FROM (SELECT * FROM player_stats LIMIT 5) s")
+
+
+def test_preflight_limits_large_results_with_a_probe_row():
+    def explain(sql_text):
+        return {"total_cost": 100.0, "plan_rows": 11 if sql_text.endswith("LIMIT 11") else 5000}
+
+    sql_query, info, rejection = preflight("SELECT * FROM player_stats", COLUMNS, explain, max_cost=1000, max_rows=10)
+    assert (sql_query, info["row_limit"], rejection) == ("SELECT * FROM player_stats LIMIT 11", 10, None)
+    _, _, rejection = preflight("SELECT * FROM player_stats", COLUMNS, explain, 1000, 10, row_limit_action="reject")
+    assert "about 5,000 rows" in rejection
+    _, _, rejection = preflight("SELECT * FROM player_stats", COLUMNS, explain, max_cost=50, max_rows=0)
+    assert "too expensive" in rejection
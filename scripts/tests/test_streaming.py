@@ -0,0 +1,34 @@
+import pandas as pd
+
+from dtype_inference import DtypeInferenceEngine
+from streaming import StreamingResultCollector
+
+SQL = "SELECT p.season, t.season, p.pts FROM player_stats p JOIN team_stats t ON p.team_id = t.team_id"
+
+
+def chunks():
+    # Numbers and dates fetched as text, as the ingest stores some columns; two columns share a name.
+    rows = [[f"{2000 + i}", f"{2000 + i}-10-01", f" {i * 1.5} "] for i in range(10)]
+    frame = pd.DataFrame(rows, columns=["season", "season", "pts"])
+    return [frame.iloc[start:start + 4] for start in range(0, len(frame), 4)]
+
+
+def test_chunks_are_coerced_before_summary_stats():
+    engine = DtypeInferenceEngine()
+    collector = StreamingResultCollector(preview_rows=3, sample_rows=5, coerce=lambda chunk: engine.coerce(chunk, sql_query=SQL))
+    for chunk in chunks():
+        collector.add_chunk(chunk)
+    stats = collector.summary_stats()
+    assert list(stats) == ["season", "season_2", "pts"]
+    assert stats["season"]["type"] == "numeric" and stats["season"]["max"] == 2009
+    assert stats["season_2"]["type"] == "datetime"
+    assert stats["pts"]["type"] == "numeric" and stats["pts"]["mean"] == 6.75
+    assert pd.api.types.is_float_dtype(collector.sample.iloc[:, 2]) and collector.row_count == 10
+    assert engine.schema_cache_misses == 1
+
+
+def test_without_coerce_text_stays_text():
+    collector = StreamingResultCollector()
+    for chunk in chunks():
+        collector.add_chunk(chunk)
+    assert collector.summary_stats()["pts"]["type"] != "numeric"
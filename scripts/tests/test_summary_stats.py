@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from summary_stats import SummaryStatsAccumulator, unique_labels
+
+
+def test_duplicate_column_names_are_summarized_separately():
+    # SELECT p.season, t.season ... FROM player_stats p JOIN team_stats t: two columns named "season".
+    df = pd.DataFrame([[2020, "2019-20", 10.0], [2021, "2020-21", 20.0]], columns=["season", "season", "pts"])
+    accumulator = SummaryStatsAccumulator()
+    accumulator.update(df.iloc[:1])
+    accumulator.update(df.iloc[1:])
+    stats = accumulator.to_dict()
+    assert list(stats) == ["season", "season_2", "pts"]
+    assert stats["season"]["type"] == "numeric" and stats["season"]["max"] == 2021
+    assert stats["season_2"]["type"] != "numeric" and stats["season_2"]["count"] == 2
+
+
+def test_unique_labels_skip_real_column_names():
+    assert unique_labels(["a", "a_2", "a", "a"]) == ["a", "a_2", "a_3", "a_4"]
+
+
+def test_chunked_updates_match_one_pass():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({"pts": rng.normal(20, 5, 1000), "team": rng.choice(["BOS", "LAL", "GSW"], 1000)})
+    whole = SummaryStatsAccumulator()
+    whole.update(df)
+    chunked = SummaryStatsAccumulator()
+    for start in range(0, len(df), 128):
+        chunked.update(df.iloc[start:start + 128])
+    for key in ("count", "mean", "std", "min", "max"):
+        assert np.isclose(chunked.to_dict()["pts"][key], whole.to_dict()["pts"][key])
+    assert chunked.to_dict()["team"]["count"] == 1000